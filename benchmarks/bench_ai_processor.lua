@@ -0,0 +1,97 @@
+-- ================================
+-- ai_processor.lua 每次按键开销的微基准测试
+--
+-- 用桩对象模拟 Rime 的 key / context / engine，不需要 Rime 或 librime-lua，
+-- 测量不同输入状态下 M.func 处理一次按键的平均耗时。
+--
+-- 用法（在项目根目录运行）:
+--   lua benchmarks/bench_ai_processor.lua [每轮按键次数，默认200000] [processor 文件路径]
+--
+-- 指定旧版本的 processor 文件可以对比修改前后的开销，例如:
+--   git show HEAD~1:rime_config/lua/ai_processor.lua > /tmp/old_ai_processor.lua
+--   lua benchmarks/bench_ai_processor.lua 200000 /tmp/old_ai_processor.lua
+-- ================================
+
+local script_dir = (arg and arg[0] or ""):match("^(.*)/[^/]*$") or "."
+local lua_dir = script_dir .. "/../rime_config/lua"
+package.path = lua_dir .. "/?.lua;" .. package.path
+
+local iterations = tonumber(arg and arg[1]) or 200000
+local processor_path = (arg and arg[2]) or (lua_dir .. "/ai_processor.lua")
+
+-- 日志写到临时文件，不影响 /tmp/rime_ai.log（旧版本自带的日志函数仍会写 /tmp/rime_ai.log）
+local ai_log = require("ai_log")
+ai_log.PATH = os.tmpname()
+
+local function make_key(repr, keycode)
+    return { keycode = keycode, repr = function() return repr end }
+end
+
+-- context 桩：push_input / pop_input 不改变输入，保证每次按键测量的是同一个状态
+local function make_context(input)
+    local ctx = { input = input }
+    function ctx:is_composing() return self.input ~= "" end
+    function ctx:has_menu() return false end
+    function ctx:push_input(s) end
+    function ctx:pop_input(n) end
+    function ctx:clear() end
+    function ctx:refresh_non_confirmed_composition() end
+    return ctx
+end
+
+-- 使用 spawn 投递：默认的 daemon 会在 init 时拉起 ~/Library/Rime/ai_daemon.py
+local config = {}
+function config:get_bool(path) return nil end
+function config:get_int(path) return nil end
+function config:get_string(path)
+    if path == "ai_streamer/dispatch" then return "spawn" end
+    return nil
+end
+
+-- 基准测试不启动任何进程（旧版本的 processor 可能不读取 dispatch 配置）
+os.execute = function(cmd) return true end
+
+local function make_env(input)
+    local engine = { context = make_context(input), schema = { config = config } }
+    function engine:commit_text(text) end
+    return { engine = engine }
+end
+
+local processor = dofile(processor_path)
+
+local scenarios = {
+    { name = "未输入（空 input）",      input = "",         key = make_key("n", 110) },
+    { name = "拼音输入 nihao",          input = "nihao",    key = make_key("h", 104) },
+    { name = "与命令同首字母 ai",       input = "ai",       key = make_key("x", 120) },
+    { name = "AI 命令输入 ai:hello",    input = "ai:hello", key = make_key("x", 120) },
+}
+
+local ROUNDS = 5  -- 每个场景测量多轮取最小值，减少垃圾回收带来的波动
+
+local function run(scenario)
+    local env = make_env(scenario.input)
+    processor.init(env)
+    local func, key = processor.func, scenario.key
+    local result = func(key, env)
+    local best = math.huge
+    for _ = 1, ROUNDS do
+        collectgarbage("collect")
+        local start = os.clock()
+        for _ = 1, iterations do
+            func(key, env)
+        end
+        best = math.min(best, os.clock() - start)
+    end
+    if processor.fini then processor.fini(env) end
+    return best / iterations * 1e9, result
+end
+
+print(string.format("ai_processor 每次按键耗时（%s，%d 次）", processor_path, iterations))
+print(string.rep("=", 60))
+for _, scenario in ipairs(scenarios) do
+    local ns, result = run(scenario)
+    print(string.format("  %-28s %10.1f ns/键  (返回 %s)", scenario.name, ns, tostring(result)))
+end
+
+ai_log.flush()
+os.remove(ai_log.PATH)
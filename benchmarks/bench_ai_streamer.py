@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ai_streamer 端到端延迟基准测试
+
+启动本地模拟 OpenAI 服务器（mock_openai_server.py），以子进程方式运行
+ai_streamer.py（与 Lua 端启动方式相同），输出目标替换为内存 sink（MemorySink），
+从指标文件中汇总启动耗时、首 token、首字上屏和输出速度。
+不需要 API Key、网络或辅助功能权限，可在无界面的 Linux 上运行。
+
+用法:
+    python3 benchmarks/bench_ai_streamer.py [选项]
+
+选项:
+    --runs=N               运行次数（默认 20）
+    --cmd=CMD              命令（默认 ai）
+    --first-token-ms=N     模拟服务器首 token 延迟（默认 300）
+    --tokens-per-sec=N     模拟服务器每秒 chunk 数（默认 50，0 不限速）
+    --chunk-chars=N        每个 chunk 的字符数（默认 2）
+    --error-rate=F         注入错误的概率（默认 0）
+    --error-mode=MODE      http429 / http500 / drop
+    --cache                开启响应缓存（第一次之后全部命中缓存）
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+RIME_CONFIG_DIR = BENCH_DIR.parent / "rime_config"
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(RIME_CONFIG_DIR))
+
+from mock_openai_server import MockConfig, start_server  # noqa: E402
+import ai_metrics  # noqa: E402
+
+# 子进程入口：把输出目标替换为 MemorySink 后运行 ai_streamer.main()，结束时把输出写到 stdout
+LAUNCHER = """
+import sys
+import ai_sinks
+import ai_streamer
+
+sink = ai_sinks.MemorySink()
+ai_streamer.create_sink = lambda *args, **kwargs: sink
+sys.argv = ["ai_streamer.py"] + sys.argv[1:]
+try:
+    ai_streamer.main()
+finally:
+    sys.stdout.write(sink.text)
+    sys.stdout.flush()
+"""
+
+
+def run_once(cmd, query, env, request_id, tmp_dir):
+    """运行一次 ai_streamer 子进程，返回 (墙钟耗时 ms, 输出文本)"""
+    marker = Path(tmp_dir) / f"spawn_{request_id}"
+    marker.touch()
+    run_env = dict(env, AI_SPAWN_MARKER=str(marker), AI_REQUEST_ID=request_id)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", LAUNCHER, cmd, query],
+        cwd=RIME_CONFIG_DIR, env=run_env,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, result.stdout.decode("utf-8", errors="replace")
+
+
+def main():
+    options = {}
+    flags = set()
+    for arg in sys.argv[1:]:
+        if arg in ("-h", "--help"):
+            print(__doc__)
+            return
+        if arg.startswith("--") and "=" in arg:
+            key, value = arg[2:].split("=", 1)
+            options[key] = value
+        elif arg.startswith("--"):
+            flags.add(arg[2:])
+
+    runs = int(options.get("runs", 20))
+    cmd = options.get("cmd", "ai")
+    config = MockConfig(
+        first_token_ms=float(options.get("first-token-ms", 300)),
+        tokens_per_sec=float(options.get("tokens-per-sec", 50)),
+        chunk_chars=int(options.get("chunk-chars", 2)),
+        error_rate=float(options.get("error-rate", 0)),
+        error_mode=options.get("error-mode", "http500"),
+        seed=0,
+    )
+    server, base_url = start_server(config)
+    expected = config.text.replace("\n", "\r")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        metrics_file = Path(tmp_dir) / "metrics.jsonl"
+        env = dict(
+            os.environ,
+            HOME=tmp_dir,
+            OPENAI_BASE_URL=base_url,
+            OPENAI_API_KEY="sk-mock",
+            AI_CACHE="1" if "cache" in flags else "0",
+            AI_METRICS_FILE=str(metrics_file),
+        )
+
+        print("ai_streamer 端到端基准测试")
+        print("=" * 60)
+        print(f"模拟服务器: {base_url}")
+        print(f"  首 token 延迟 {config.first_token_ms:.0f} ms, {config.tokens_per_sec:g} chunk/s, "
+              f"每 chunk {config.chunk_chars} 字, 共 {len(config.text)} 字, 错误率 {config.error_rate:g}")
+        print(f"命令: {cmd}, 运行 {runs} 次, 缓存: {'开' if 'cache' in flags else '关'}")
+
+        # 预热一次：写入依赖环境记录，避免首次检查依赖的耗时计入结果
+        run_once(cmd, "warmup", env, "warmup", tmp_dir)
+        metrics_file.unlink(missing_ok=True)
+
+        wall = []
+        correct = 0
+        for i in range(runs):
+            elapsed, output = run_once(cmd, "台湾在哪里", env, f"bench-{i}", tmp_dir)
+            wall.append(elapsed)
+            if output == expected:
+                correct += 1
+
+        records = ai_metrics.load_records(0, str(metrics_file))
+
+    server.shutdown()
+
+    print(f"\n输出与预期一致: {correct}/{runs}")
+    print(f"进程总耗时 (ms): p50 {statistics.median(wall):.1f}, 最大 {max(wall):.1f}")
+    print()
+    ai_metrics.print_summary(records, "ai_streamer")
+
+    result_line = {
+        "runs": runs,
+        "wall_p50_ms": round(statistics.median(wall), 1),
+        "summary": {k: v[1] for k, v in ai_metrics.summarize(records).items()},
+    }
+    print("\nJSON:", json.dumps(result_line, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词库转换流程基准测试
+
+用 gen_sogou_bin.py 生成不同大小的合成搜狗词库，分别测量转换流程的每个步骤
+和完整的 convert.py，记录墙钟时间、峰值内存（RSS）和每秒处理的词条数，
+结果写入 JSON 文件，便于比较不同提交之间的性能。
+
+每个步骤在单独的子进程中运行，峰值内存只包含该步骤（及它依赖的前置数据）：
+    parse     parse_sogou_bin_with_freq 解析 .bin
+    export    export_with_freq 导出带词频词库（计时不含解析）
+    filter    filter_dict_with_freq 过滤（计时不含加载常用词）
+    rime      convert_to_rime_format 导入 Rime 格式（需要 pypinyin，未安装时跳过）
+    pipeline  完整运行 convert.py（--no-backup，含解释器启动；有 pypinyin 时包括导入 Rime）
+
+用法:
+    python3 benchmarks/bench_convert.py [选项]
+
+选项:
+    --sizes=N,...        词条数（默认 10000,100000,1000000,5000000）
+    --stages=S,...       运行的步骤（默认全部）
+    --runs=N             每个步骤运行次数，取中位数（默认 1）
+    --seed=N             生成词库的随机种子（默认 0）
+    --data-dir=DIR       生成的词库缓存目录，同样大小和种子的词库只生成一次（默认系统临时目录）
+    --output=FILE        结果文件（默认 benchmarks/results/bench_convert_{提交}.json）
+    --compare=FILE       与之前的结果文件比较
+"""
+
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(PROJECT_DIR))
+
+from gen_sogou_bin import generate_sogou_bin  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000, 5000000]
+STAGES = ['parse', 'export', 'filter', 'rime', 'pipeline']
+
+# 子进程中各步骤的输入输出文件（相对工作目录）
+BIN_NAME = "bench.bin"
+COMMON_NAME = "common.txt"
+FULL_NAME = "bench_带词频.txt"
+FINAL_NAME = "bench_final_带词频.txt"
+RIME_NAME = "custom_phrase.txt"
+
+
+def run_stage(stage, workdir):
+    """在当前进程中运行一个步骤，返回 {seconds, skipped}（由子进程调用）"""
+    workdir = Path(workdir)
+    with redirect_stdout(io.StringIO()):
+        if stage == 'parse':
+            from sogou_export_with_freq import parse_sogou_bin_with_freq
+            start = time.perf_counter()
+            parse_sogou_bin_with_freq(str(workdir / BIN_NAME))
+        elif stage == 'export':
+            from sogou_export_with_freq import export_with_freq, parse_sogou_bin_with_freq
+            words_with_freq = parse_sogou_bin_with_freq(str(workdir / BIN_NAME))
+            start = time.perf_counter()
+            export_with_freq(words_with_freq, str(workdir / FULL_NAME))
+        elif stage == 'filter':
+            from convert import FILTER_OPTIONS
+            from filter_dict import filter_dict_with_freq, load_common_words_from_file
+            common_words = load_common_words_from_file(str(workdir / COMMON_NAME))
+            start = time.perf_counter()
+            filter_dict_with_freq(str(workdir / FULL_NAME), str(workdir / FINAL_NAME),
+                                  dict(FILTER_OPTIONS), common_words)
+        elif stage == 'rime':
+            import import_to_rime
+            if not import_to_rime.PYPINYIN_AVAILABLE:
+                return {'skipped': 'pypinyin 未安装'}
+            start = time.perf_counter()
+            import_to_rime.convert_to_rime_format(str(workdir / FINAL_NAME), str(workdir / RIME_NAME))
+        else:
+            raise ValueError(f"未知的步骤: {stage}")
+    return {'seconds': time.perf_counter() - start}
+
+
+def _maxrss_mb(rusage):
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return rusage.ru_maxrss / scale
+
+
+def run_child(cmd, cwd, env=None):
+    """运行子进程，返回 (退出码, 墙钟秒数, 峰值 RSS MB, stdout)；用 wait4 取得该子进程自己的 rusage"""
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as out:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=out, stderr=subprocess.STDOUT)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        out.seek(0)
+        return proc.returncode, wall, _maxrss_mb(rusage), out.read()
+
+
+def measure(stage, workdir, home):
+    """在子进程中运行一个步骤，返回 {seconds, peak_rss_mb} 或 {skipped} / {error}"""
+    if stage == 'pipeline':
+        cmd = [sys.executable, str(PROJECT_DIR / "convert.py"), "--no-backup",
+               f"--data-dir={workdir}", f"--dict={Path(workdir) / COMMON_NAME}"]
+        # HOME 指向临时目录：有 pypinyin 时 Rime 词库写到临时目录，不改动用户的 Rime 配置
+        code, wall, rss, output = run_child(cmd, workdir, dict(os.environ, HOME=str(home)))
+        if code != 0:
+            return {'error': output.strip().splitlines()[-1] if output.strip() else f"退出码 {code}"}
+        return {'seconds': wall, 'peak_rss_mb': rss}
+
+    cmd = [sys.executable, str(Path(__file__).resolve()), f"--stage={stage}", f"--workdir={workdir}"]
+    code, _, rss, output = run_child(cmd, workdir)
+    lines = output.strip().splitlines()
+    if code != 0 or not lines:
+        return {'error': lines[-1] if lines else f"退出码 {code}"}
+    result = json.loads(lines[-1])
+    if 'skipped' not in result:
+        result['peak_rss_mb'] = rss
+    return result
+
+
+def prepare_data(data_dir, size, seed):
+    """生成（或复用缓存的）合成词库和常用词词典，返回 (bin 文件, 常用词文件)"""
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    bin_file = data_dir / f"sogou_{size}_{seed}.bin"
+    common_file = data_dir / f"common_{size}_{seed}.txt"
+    if not (bin_file.exists() and common_file.exists()):
+        print(f"  生成 {size:,} 个词条的合成词库...", flush=True)
+        tmp_bin = bin_file.with_name(bin_file.name + '.tmp')
+        generate_sogou_bin(tmp_bin, size, seed=seed, common_file=common_file)
+        os.replace(tmp_bin, bin_file)
+    return bin_file, common_file
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                                capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_DIR,
+                               capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+    commit = result.stdout.strip() or None
+    return f"{commit}-dirty" if commit and dirty else commit
+
+
+def run_benchmark(sizes, stages, runs, seed, data_dir):
+    """运行所有大小和步骤，返回 {词条数: {步骤: 结果}}"""
+    results = {}
+    for size in sizes:
+        print(f"\n{size:,} 个词条")
+        print("-" * 60)
+        bin_file, common_file = prepare_data(data_dir, size, seed)
+        size_results = {}
+        with tempfile.TemporaryDirectory(prefix="bench_convert_") as tmp:
+            workdir = Path(tmp) / "data"
+            home = Path(tmp) / "home"
+            workdir.mkdir()
+            (home / "Library" / "Rime").mkdir(parents=True)
+            os.symlink(bin_file, workdir / BIN_NAME)
+            os.symlink(common_file, workdir / COMMON_NAME)
+            for stage in stages:
+                samples = [measure(stage, workdir, home) for _ in range(runs)]
+                failed = next((s for s in samples if 'seconds' not in s), None)
+                if failed:
+                    result = failed
+                else:
+                    seconds = statistics.median(s['seconds'] for s in samples)
+                    result = {
+                        'seconds': round(seconds, 4),
+                        'peak_rss_mb': round(max(s['peak_rss_mb'] for s in samples), 1),
+                        'entries_per_sec': round(size / seconds) if seconds else None,
+                    }
+                size_results[stage] = result
+                print(f"  {format_result(stage, result)}", flush=True)
+        results[str(size)] = size_results
+    return results
+
+
+def format_result(stage, result):
+    if 'skipped' in result:
+        return f"{stage:<9} 跳过（{result['skipped']}）"
+    if 'error' in result:
+        return f"{stage:<9} ❌ {result['error']}"
+    return (f"{stage:<9} {result['seconds']:9.3f}s  峰值内存 {result['peak_rss_mb']:8.1f} MB  "
+            f"{result['entries_per_sec']:>12,} 词条/秒")
+
+
+def print_comparison(old, new):
+    """按步骤比较两份结果的耗时和峰值内存"""
+    print(f"\n与 {old.get('commit')} 比较（耗时、峰值内存，负数为改进）:")
+    for size, stages in new['results'].items():
+        for stage, result in stages.items():
+            before = old.get('results', {}).get(size, {}).get(stage)
+            if not before or 'seconds' not in before or 'seconds' not in result:
+                continue
+            dt = (result['seconds'] / before['seconds'] - 1) * 100 if before['seconds'] else 0
+            dm = (result['peak_rss_mb'] / before['peak_rss_mb'] - 1) * 100 if before['peak_rss_mb'] else 0
+            print(f"  {int(size):>10,}  {stage:<9} {dt:+7.1f}%  {dm:+7.1f}%")
+
+
+# 可用的选项（stage / workdir 供子进程内部使用）
+OPTIONS = {'sizes', 'stages', 'runs', 'seed', 'data-dir', 'output', 'compare', 'stage', 'workdir'}
+
+
+def main():
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg in ('-h', '--help'):
+            print(__doc__)
+            return
+        key, sep, value = arg[2:].partition('=') if arg.startswith('--') else ('', '', '')
+        # 不认识的参数直接报错，避免拼错选项时静默运行耗时很长的默认基准测试
+        if not sep or key not in OPTIONS:
+            print(f"❌ 错误: 未知的参数: {arg}（python3 benchmarks/bench_convert.py --help 查看用法）")
+            sys.exit(1)
+        options[key] = value
+
+    # 子进程：运行单个步骤，结果以一行 JSON 输出
+    if 'stage' in options:
+        print(json.dumps(run_stage(options['stage'], options['workdir'])))
+        return
+
+    sizes = [int(s) for s in options['sizes'].split(',')] if 'sizes' in options else DEFAULT_SIZES
+    stages = options['stages'].split(',') if 'stages' in options else STAGES
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"❌ 错误: 未知的步骤: {', '.join(unknown)}（可选 {', '.join(STAGES)}）")
+        sys.exit(1)
+    runs = int(options.get('runs', 1))
+    seed = int(options.get('seed', 0))
+    data_dir = Path(options.get('data-dir', Path(tempfile.gettempdir()) / "rime_ai_bench"))
+    commit = git_commit()
+    output_file = Path(options.get('output', BENCH_DIR / "results" / f"bench_convert_{commit or 'unknown'}.json"))
+
+    print("词库转换流程基准测试")
+    print("=" * 60)
+    print(f"提交: {commit}  Python {platform.python_version()}  {platform.platform()}")
+    print(f"词库缓存目录: {data_dir}")
+
+    report = {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'runs': runs,
+        'results': run_benchmark(sizes, stages, runs, seed, data_dir),
+    }
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存: {output_file}")
+
+    if 'compare' in options:
+        with open(options['compare'], 'r', encoding='utf-8') as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ai_streamer 启动耗时基准测试
+
+用 `python -X importtime` 统计导入 ai_streamer 的耗时（以及它顺带导入了哪些模块），
+并多次启动子进程测量"导入 + 依赖检查"的墙钟时间。
+
+用法: python3 benchmarks/bench_startup.py [运行次数，默认20]
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+RIME_CONFIG_DIR = Path(__file__).resolve().parent.parent / "rime_config"
+
+# 子进程中执行的启动代码：导入模块并完成依赖检查（与 main() 开头一致）
+STARTUP_CODE = "import ai_streamer; ai_streamer.bootstrap_dependencies()"
+
+
+def run_importtime():
+    """运行一次 -X importtime，返回 [(模块名, self_us, cumulative_us)]"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ai_streamer"],
+        cwd=RIME_CONFIG_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # 格式: import time:       self [us] |  cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+        except ValueError:
+            continue
+    return rows
+
+
+def time_startup(runs, env):
+    """多次启动子进程，返回每次的墙钟时间（毫秒）"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STARTUP_CODE], cwd=RIME_CONFIG_DIR, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def time_bare_interpreter(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print("ai_streamer 启动耗时")
+    print("=" * 60)
+
+    rows = run_importtime()
+    total = next((cum for name, _, cum in rows if name == "ai_streamer"), None)
+    if total is not None:
+        print(f"import ai_streamer 累计耗时: {total / 1000:.2f} ms")
+    loaded = {name.split(".")[0] for name, _, _ in rows}
+    for package in ("requests", "pynput", "urllib3", "subprocess"):
+        print(f"  导入时加载 {package}: {'是' if package in loaded else '否'}")
+
+    print("\n自身耗时最高的 10 个模块:")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[1], reverse=True)[:10]:
+        print(f"  {self_us / 1000:8.2f} ms  (累计 {cum_us / 1000:8.2f} ms)  {name}")
+
+    # 用临时 HOME，避免读写真实的环境记录
+    import tempfile
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home)
+        first = time_startup(1, env)[0]
+        warm = time_startup(runs, env)
+    bare = time_bare_interpreter(runs)
+
+    print(f"\n子进程启动（{runs} 次，单位 ms）:")
+    print(f"  空解释器 python -c pass:     中位数 {statistics.median(bare):7.2f}")
+    print(f"  首次运行（无环境记录）:       {first:7.2f}")
+    print(f"  后续运行（命中环境记录）:     中位数 {statistics.median(warm):7.2f}  "
+          f"最小 {min(warm):7.2f}  最大 {max(warm):7.2f}")
+
+
+if __name__ == '__main__':
+    main()
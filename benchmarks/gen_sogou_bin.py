@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成合成的搜狗词库 .bin（SGPU）文件
+
+文件布局与 sogou_export_with_freq.parse_sogou_bin_with_freq 读取的一致，
+用于在没有真实备份的环境下测试和测量转换流程（见 bench_convert.py）。
+同样的参数和种子总是生成同样的文件。
+
+文件布局（小端）:
+    0       "SGPU", 版本(u32), 日期(u32), 保留(u32), 文件大小(u32)
+    20      36 字节保留
+    56      索引开始(u32), 索引大小(u32), 词条数(u32), 数据开始(u32), 数据总大小(u32), 数据有效大小(u32)
+    索引    N 个 u32：每个词条相对数据开始的偏移
+    词条    词频(i16), 2 字节未知, 5 字节未知, 拼音字节数(u16), 拼音(UTF-16LE),
+            词条字节数(u16), 词条字节数(u16), 词条(UTF-16LE)
+
+用法:
+    python3 benchmarks/gen_sogou_bin.py <输出.bin> [选项]
+
+选项:
+    --count=N              词条数（默认 100000）
+    --seed=N               随机种子（默认 0）
+    --lengths=L:W,...      词长分布，词长:权重（默认 1:5,2:50,3:25,4:20）
+    --freq=pareto|uniform  词频分布（默认 pareto：大部分词条词频很低，少数很高）
+    --alpha=F              pareto 分布的参数（默认 1.0，越小高频词越多）
+    --common=FILE          同时写出常用词词典（从生成的词条中抽样）
+    --common-ratio=F       抽入常用词词典的比例（默认 0.1）
+"""
+
+import random
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+HEADER_SIZE = 80
+FREQ_MAX = 32767
+DEFAULT_LENGTHS = {1: 5, 2: 50, 3: 25, 4: 20}
+
+# 常用汉字区间，拼音按字的编码从音节表中取（只用于填充格式，不是真实读音）
+CJK_FIRST, CJK_LAST = 0x4E00, 0x9FA5
+SYLLABLES = (
+    "a ai an ang ba bai ban bang bao bei ben bi bian biao bie bin bo bu ca cai can cao ce cha chai chan "
+    "chang chao che chen cheng chi chong chu chuan chui chun ci cong cu cui cun cuo da dai dan dang dao de "
+    "deng di dian diao die ding dong dou du duan dui dun duo e en er fa fan fang fei fen feng fo fou fu ga "
+    "gai gan gang gao ge gei gen geng gong gou gu gua guai guan guang gui gun guo ha hai han hang hao he "
+    "hei hen heng hong hou hu hua huai huan huang hui hun huo ji jia jian jiang jiao jie jin jing jiong jiu "
+    "ju juan jue jun ka kai kan kang kao ke ken keng kong kou ku kua kuai kuan kuang kui kun kuo la lai lan "
+    "lang lao le lei leng li lian liang liao lie lin ling liu long lou lu luan lun luo lv ma mai man mang "
+    "mao me mei men meng mi mian miao mie min ming miu mo mou mu na nai nan nang nao ne nei nen neng ni "
+    "nian niang niao nie nin ning niu nong nu nuan nuo nv ou pa pai pan pang pao pei pen peng pi pian piao "
+    "pie pin ping po pou pu qi qia qian qiang qiao qie qin qing qiong qiu qu quan que qun ran rang rao re "
+    "ren reng ri rong rou ru ruan rui run ruo sa sai san sang sao se sen seng sha shai shan shang shao she "
+    "shen sheng shi shou shu shua shuai shuan shuang shui shun shuo si song sou su suan sui sun suo ta tai "
+    "tan tang tao te teng ti tian tiao tie ting tong tou tu tuan tui tun tuo wa wai wan wang wei wen weng "
+    "wo wu xi xia xian xiang xiao xie xin xing xiong xiu xu xuan xue xun ya yan yang yao ye yi yin ying yo "
+    "yong you yu yuan yue yun za zai zan zang zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhen zheng "
+    "zhi zhong zhou zhu zhua zhuai zhuan zhuang zhui zhun zhuo zi zong zou zu zuan zui zun zuo"
+).split()
+
+ENTRY_HEAD = struct.Struct('<hH5sH')
+WORD_HEAD = struct.Struct('<HH')
+
+
+def parse_lengths(spec):
+    """解析 "1:5,2:50" 为 {词长: 权重}"""
+    lengths = {}
+    for part in spec.split(','):
+        length, weight = part.split(':')
+        lengths[int(length)] = float(weight)
+    return lengths
+
+
+def encode_entry(word, freq, pinyin):
+    """编码一个词条（不含索引）"""
+    py_bytes = pinyin.encode('utf-16le')
+    word_bytes = word.encode('utf-16le')
+    return b''.join((
+        ENTRY_HEAD.pack(freq, 0, b'\0' * 5, len(py_bytes)),
+        py_bytes,
+        WORD_HEAD.pack(len(word_bytes), len(word_bytes)),
+        word_bytes,
+    ))
+
+
+def generate_entries(count, seed=0, lengths=None, freq='pareto', alpha=1.0):
+    """按顺序产出 count 个 (词条, 词频, 拼音)"""
+    rng = random.Random(seed)
+    lengths = lengths or DEFAULT_LENGTHS
+    length_values = list(lengths)
+    length_weights = list(lengths.values())
+    # 预先按批抽取词长，避免每个词条调用一次 choices
+    batch = []
+    for _ in range(count):
+        if not batch:
+            batch = rng.choices(length_values, length_weights, k=4096)
+        n = batch.pop()
+        codes = [rng.randint(CJK_FIRST, CJK_LAST) for _ in range(n)]
+        word = ''.join(map(chr, codes))
+        pinyin = "'".join(SYLLABLES[c % len(SYLLABLES)] for c in codes)
+        if freq == 'uniform':
+            f = rng.randint(1, FREQ_MAX)
+        else:
+            f = min(FREQ_MAX, int(rng.paretovariate(alpha)))
+        yield word, f, pinyin
+
+
+def write_sogou_bin(entries, output_file, count):
+    """
+    写入 SGPU 文件：先按偏移写词条，最后回填索引和文件头（不把全部词条放在内存中）
+
+    Args:
+        entries: (词条, 词频, 拼音) 的迭代器，恰好 count 个
+        output_file: 输出文件路径
+        count: 词条数
+
+    Returns:
+        文件大小（字节）
+    """
+    idx_begin = HEADER_SIZE
+    idx_size = 4 * count
+    dict_begin = idx_begin + idx_size
+    offsets = array('I')
+    dict_size = 0
+    with open(output_file, 'wb') as f:
+        f.seek(dict_begin)
+        chunk = []
+        for word, freq, pinyin in entries:
+            data = encode_entry(word, freq, pinyin)
+            offsets.append(dict_size)
+            dict_size += len(data)
+            chunk.append(data)
+            if len(chunk) >= 8192:
+                f.write(b''.join(chunk))
+                chunk = []
+        f.write(b''.join(chunk))
+        if len(offsets) != count:
+            raise ValueError(f"词条数不符: {len(offsets)} != {count}")
+        # 解析器要求每个词条之后至少还有 20 字节，末尾补零
+        f.write(b'\0' * 20)
+        file_size = f.tell()
+
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        f.seek(0)
+        f.write(b'SGPU')
+        f.write(struct.pack('<IIII', 1, int(time.strftime('%Y%m%d')), 0, file_size))
+        f.write(b'\0' * 36)
+        f.write(struct.pack('<IIIIII', idx_begin, idx_size, count, dict_begin, dict_size, dict_size))
+        offsets.tofile(f)
+    return file_size
+
+
+def generate_sogou_bin(output_file, count, seed=0, lengths=None, freq='pareto', alpha=1.0,
+                       common_file=None, common_ratio=0.1):
+    """
+    生成合成的搜狗词库 .bin 文件，可同时抽样写出常用词词典
+
+    Returns:
+        文件大小（字节）
+    """
+    entries = generate_entries(count, seed, lengths, freq, alpha)
+    if common_file is None:
+        return write_sogou_bin(entries, output_file, count)
+
+    # 常用词抽样使用独立的随机数，不影响词条本身
+    sample_rng = random.Random(seed + 1)
+    with open(common_file, 'w', encoding='utf-8') as common:
+        def sampled():
+            for entry in entries:
+                if sample_rng.random() < common_ratio:
+                    common.write(entry[0] + "\n")
+                yield entry
+        return write_sogou_bin(sampled(), output_file, count)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            options[key] = value
+
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    count = int(options.get('count', 100000))
+    freq = options.get('freq', 'pareto')
+    if freq not in ('pareto', 'uniform'):
+        print(f"❌ 错误: 未知的词频分布: {freq}（可选 pareto / uniform）")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    size = generate_sogou_bin(
+        args[0], count,
+        seed=int(options.get('seed', 0)),
+        lengths=parse_lengths(options['lengths']) if 'lengths' in options else None,
+        freq=freq,
+        alpha=float(options.get('alpha', 1.0)),
+        common_file=options.get('common'),
+        common_ratio=float(options.get('common-ratio', 0.1)),
+    )
+    print(f"✅ 已生成 {count:,} 个词条: {args[0]}（{size / 1024 / 1024:.2f} MB，"
+          f"{time.perf_counter() - start:.1f}s）")
+    if 'common' in options:
+        print(f"   常用词词典: {options['common']}")
+
+
+if __name__ == '__main__':
+    main()
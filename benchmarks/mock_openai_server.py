@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟 OpenAI 流式接口（/v1/chat/completions，SSE）
+
+用于在没有 API Key、没有网络的环境下测量 ai_streamer 的延迟和吞吐量。
+返回格式与 stream_openai_like 解析的格式一致：
+    data: {"choices": [{"delta": {"content": "..."}}]}
+    ...
+    data: [DONE]
+
+用法:
+    python3 benchmarks/mock_openai_server.py [选项]
+
+选项:
+    --port=N               监听端口（默认 8765，0 表示随机端口）
+    --first-token-ms=N     收到请求到发送第一个 token 的延迟（默认 300）
+    --tokens-per-sec=N     之后每秒发送的 chunk 数（默认 50，0 表示不限速）
+    --chunk-chars=N        每个 chunk 包含的字符数（默认 2）
+    --text=TEXT            回答内容（默认一段中文）
+    --error-rate=F         以概率 F 注入错误（默认 0）
+    --error-mode=MODE      错误类型: http429 / http500 / drop（中途断开），默认 http500
+
+然后设置 OPENAI_BASE_URL=http://127.0.0.1:8765/v1 和任意 OPENAI_API_KEY 即可。
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TEXT = (
+    "台湾位于东亚、东海与南海之间，主岛（台湾岛）面积约3.6万平方公里，人口约2300万。"
+    "西隔台湾海峡与福建相望，东临太平洋，北接东海，南界巴士海峡与菲律宾相邻。"
+)
+
+
+class MockConfig:
+    """模拟服务器的行为参数"""
+
+    def __init__(self, first_token_ms=300, tokens_per_sec=50, chunk_chars=2,
+                 text=DEFAULT_TEXT, error_rate=0.0, error_mode="http500", seed=None):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_chars = max(1, chunk_chars)
+        self.text = text
+        self.error_rate = error_rate
+        self.error_mode = error_mode
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def chunks(self):
+        return [self.text[i:i + self.chunk_chars] for i in range(0, len(self.text), self.chunk_chars)]
+
+    def next_error(self):
+        """按 error_rate 决定本次请求是否注入错误，返回错误类型或 None"""
+        with self.lock:
+            self.request_count += 1
+            if self.error_rate > 0 and self.random.random() < self.error_rate:
+                return self.error_mode
+        return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+
+    def log_message(self, format, *args):
+        pass  # 不打印访问日志，避免影响测量
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+
+        config = self.config
+        error = config.next_error()
+        if error == "http429":
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)"}})
+            return
+        if error == "http500":
+            self._send_json(500, {"error": {"message": "Internal server error (mock)"}})
+            return
+
+        # 与真实接口一样使用分块传输编码，客户端可以逐块读到数据
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunks = config.chunks()
+        max_tokens = request.get("max_tokens")
+        if max_tokens:
+            chunks = chunks[:max_tokens]
+        interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec else 0
+
+        try:
+            time.sleep(config.first_token_ms / 1000.0)
+            for i, chunk in enumerate(chunks):
+                if error == "drop" and i == len(chunks) // 2:
+                    self.close_connection = True
+                    return  # 中途断开连接
+                event = {"choices": [{"index": 0, "delta": {"content": chunk}}]}
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                if interval and i < len(chunks) - 1:
+                    time.sleep(interval)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # 客户端取消
+
+    def _write_chunk(self, data):
+        """写入一个 HTTP 分块（空数据表示结束）"""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """
+    在后台线程启动模拟服务器
+
+    Returns:
+        (server, base_url)：调用 server.shutdown() 停止
+    """
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"config": config or MockConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith("--") and "=" in arg:
+            key, value = arg[2:].split("=", 1)
+            options[key] = value
+        elif arg in ("-h", "--help"):
+            print(__doc__)
+            return
+
+    config = MockConfig(
+        first_token_ms=float(options.get("first-token-ms", 300)),
+        tokens_per_sec=float(options.get("tokens-per-sec", 50)),
+        chunk_chars=int(options.get("chunk-chars", 2)),
+        text=options.get("text", DEFAULT_TEXT),
+        error_rate=float(options.get("error-rate", 0)),
+        error_mode=options.get("error-mode", "http500"),
+    )
+    server, base_url = start_server(config, port=int(options.get("port", 8765)))
+    print(f"Mock OpenAI server listening on {base_url}")
+    print(f"  export OPENAI_BASE_URL={base_url} OPENAI_API_KEY=sk-mock")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常用词紧凑查询结构（.cwh）
+常用词集合（几十万个词）作为 Python set 在每个进程中要占几十 MB 内存；
+.cwh 文件用内存映射读取，多个进程共用同一份页缓存，只在查询时按需读入。
+
+查询过程:
+    1. Bloom 过滤器：不是常用词的绝大多数词条在这一步就返回（约 1% 误判）
+    2. 最小完美哈希：词条的哈希值经桶的扰动值（pilot）定位到唯一的位置
+    3. 比较该位置在字符串池中的词，确认是否为常用词
+
+文件布局（小端）:
+    文件头      magic "CWMH", 版本(u16), Bloom 哈希次数 k(u16), 哈希种子(u32), 词数 N(u32),
+                桶数 B(u32), 哈希表大小 M(u32), Bloom 位数(u32), 字符串池大小(u32)
+    Bloom 位图  Bloom 位数 / 8 字节
+    扰动值      B 个 u32
+    重映射      M - N 个 u32（哈希表中 >= N 的位置映射到 < N 的空位，使结果落在 [0, N)）
+    偏移        N+1 个 u32（位置 i 的词为字符串池 [off[i], off[i+1]) 的 UTF-8）
+    字符串池
+
+用法:
+    python3 common_words_hash.py build <常用词词典或索引> [输出.cwh]
+    python3 common_words_hash.py info <常用词.cwh>
+    python3 common_words_hash.py lookup <常用词.cwh> <词>...
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+MAGIC = b'CWMH'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIIIII')
+HASH_SUFFIX = '.cwh'
+
+BLOOM_BITS_PER_KEY = 10   # 约 1% 误判
+BLOOM_HASHES = 7
+BUCKET_SIZE = 4           # 平均每个桶的词数
+LOAD_FACTOR = 0.85        # 哈希表的装载率（>= N 的位置由重映射表补回，装载率越高构造越慢）
+MAX_PILOT = 1 << 20
+
+_NATIVE_LITTLE = sys.byteorder == 'little'
+
+
+def _hash(data, salt):
+    """64 位哈希，拆为两个 32 位值 (h1, h2)"""
+    value = int.from_bytes(hashlib.blake2b(data, digest_size=8, salt=salt).digest(), 'little')
+    return value & 0xFFFFFFFF, value >> 32
+
+
+def _mix(pilot):
+    return (pilot * 0x9E3779B1 + 0x7F4A7C15) & 0xFFFFFFFF
+
+
+def _salt(seed):
+    return seed.to_bytes(16, 'little')
+
+
+def is_hash_file(path):
+    """判断文件是否为 .cwh（按文件头判断）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _try_build(keys, seed):
+    """用给定的种子构造完美哈希，某个桶找不到扰动值时返回 None"""
+    n = len(keys)
+    num_buckets = max(1, math.ceil(n / BUCKET_SIZE))
+    m = max(1, math.ceil(n / LOAD_FACTOR))
+    salt = _salt(seed)
+
+    hashes = [_hash(key, salt) for key in keys]
+    buckets = [[] for _ in range(num_buckets)]
+    for i, (h1, _) in enumerate(hashes):
+        buckets[h1 % num_buckets].append(i)
+
+    pilots = [0] * num_buckets
+    slot_key = [-1] * m
+    # 大桶先放，表越空越容易找到扰动值
+    for b in sorted(range(num_buckets), key=lambda b: len(buckets[b]), reverse=True):
+        members = buckets[b]
+        if not members:
+            break
+        h2s = [hashes[i][1] for i in members]
+        for pilot in range(MAX_PILOT):
+            mixed = _mix(pilot)
+            slots = [(h2 ^ mixed) % m for h2 in h2s]
+            if len(set(slots)) == len(slots) and all(slot_key[s] < 0 for s in slots):
+                break
+        else:
+            return None
+        pilots[b] = pilot
+        for i, s in zip(members, slots):
+            slot_key[s] = i
+
+    # >= N 的位置依次映射到 < N 的空位，最终位置恰好是 [0, N)
+    free = (s for s in range(n) if slot_key[s] < 0)
+    remap = [0] * (m - n)
+    order = [-1] * n
+    for s in range(m):
+        i = slot_key[s]
+        if i < 0:
+            continue
+        if s >= n:
+            remap[s - n] = next(free)
+            s = remap[s - n]
+        order[s] = i
+    return hashes, pilots, remap, order, m
+
+
+def _array(typecode, values):
+    arr = array(typecode, values)
+    if not _NATIVE_LITTLE:
+        arr.byteswap()
+    return arr
+
+
+def build_hash_file(words, output_file):
+    """
+    把常用词写入 .cwh 文件（先写临时文件再替换）
+
+    Returns:
+        写入的词数
+    """
+    keys = sorted({w.encode('utf-8') for w in words if w})
+    n = len(keys)
+    for seed in range(16):
+        built = _try_build(keys, seed)
+        if built is not None:
+            break
+    else:
+        raise ValueError("无法构造完美哈希（哈希冲突过多）")
+    hashes, pilots, remap, order, m = built
+
+    bloom_bits = max(64, math.ceil(n * BLOOM_BITS_PER_KEY / 64) * 64)
+    bloom = bytearray(bloom_bits // 8)
+    for h1, h2 in hashes:
+        for j in range(BLOOM_HASHES):
+            pos = (h1 + j * h2) % bloom_bits
+            bloom[pos >> 3] |= 1 << (pos & 7)
+
+    offsets = [0] * (n + 1)
+    total = 0
+    for s, i in enumerate(order, 1):
+        total += len(keys[i])
+        offsets[s] = total
+
+    output_path = Path(output_file)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BLOOM_HASHES, seed, n, len(pilots), m, bloom_bits, total))
+        f.write(bloom)
+        _array('I', pilots).tofile(f)
+        _array('I', remap).tofile(f)
+        _array('I', offsets).tofile(f)
+        for i in order:
+            f.write(keys[i])
+    os.replace(tmp_path, output_path)
+    return n
+
+
+class CommonWordsHash:
+    """
+    内存映射的常用词集合，支持 in、len() 和迭代，可以代替 set 传给 filter_dict
+
+    pickle 时只传文件路径（进程池的子进程重新映射同一个文件，不复制词表）
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"不是有效的常用词哈希文件: {path}")
+        self._views = []
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"不是有效的常用词哈希文件: {self.path}")
+        (magic, version, self._k, seed, self.count, num_buckets,
+         self._m, self._bloom_bits, pool_size) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"无效的文件头: {magic}, 期望: {MAGIC}")
+        if version != VERSION:
+            raise ValueError(f"不支持的常用词哈希文件版本: {version}")
+        self._salt = _salt(seed)
+
+        offset = HEADER.size
+        self._bloom = offset
+        offset += self._bloom_bits // 8
+        self._pilots = self._column(offset, num_buckets)
+        offset += 4 * num_buckets
+        self._remap = self._column(offset, self._m - self.count)
+        offset += 4 * (self._m - self.count)
+        self._offsets = self._column(offset, self.count + 1)
+        offset += 4 * (self.count + 1)
+        self._pool = offset
+        if self._pool + pool_size > len(self._mm):
+            raise ValueError(f"常用词哈希文件已截断: {self.path}")
+
+    def _column(self, offset, n):
+        if offset + 4 * n > len(self._mm):
+            raise ValueError(f"常用词哈希文件已截断: {self.path}")
+        if _NATIVE_LITTLE:
+            view = memoryview(self._mm)[offset:offset + 4 * n].cast('I')
+            self._views.append(view)
+            return view
+        arr = array('I', self._mm[offset:offset + 4 * n])
+        arr.byteswap()
+        return arr
+
+    def __contains__(self, word):
+        if not isinstance(word, str) or not self.count:
+            return False
+        data = word.encode('utf-8')
+        h1, h2 = _hash(data, self._salt)
+        mm, bloom, bits = self._mm, self._bloom, self._bloom_bits
+        for j in range(self._k):
+            pos = (h1 + j * h2) % bits
+            if not mm[bloom + (pos >> 3)] >> (pos & 7) & 1:
+                return False
+        s = (h2 ^ _mix(self._pilots[h1 % len(self._pilots)])) % self._m
+        if s >= self.count:
+            s = self._remap[s - self.count]
+        offsets = self._offsets
+        return mm[self._pool + offsets[s]:self._pool + offsets[s + 1]] == data
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        pool, offsets = self._pool, self._offsets
+        for s in range(self.count):
+            yield self._mm[pool + offsets[s]:pool + offsets[s + 1]].decode('utf-8')
+
+    def __reduce__(self):
+        return (CommonWordsHash, (str(self.path),))
+
+    def close(self):
+        # memoryview 必须先释放，否则 mmap 无法关闭
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    commands = ('build', 'info', 'lookup')
+    if len(sys.argv) < 3 or sys.argv[1] not in commands or (sys.argv[1] == 'lookup' and len(sys.argv) < 4):
+        print(__doc__)
+        sys.exit(1)
+
+    command, input_file = sys.argv[1], sys.argv[2]
+    if not os.path.exists(input_file):
+        print(f"错误: 文件不存在: {input_file}")
+        sys.exit(1)
+
+    if command == 'build':
+        from filter_dict import load_common_words_from_file
+        output_file = sys.argv[3] if len(sys.argv) > 3 else str(Path(input_file).with_suffix(HASH_SUFFIX))
+        count = build_hash_file(load_common_words_from_file(input_file), output_file)
+        print(f"✅ 已写入 {count:,} 个常用词: {output_file}（{os.path.getsize(output_file) / 1024 / 1024:.2f} MB）")
+    elif command == 'info':
+        with CommonWordsHash(input_file) as words:
+            print(f"文件: {input_file}")
+            print(f"常用词数: {len(words):,}")
+            print(f"文件大小: {os.path.getsize(input_file) / 1024 / 1024:.2f} MB")
+    else:
+        with CommonWordsHash(input_file) as words:
+            for word in sys.argv[3:]:
+                print(f"  {'✅' if word in words else '❌'} {word}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常用词索引
+把 data/dicts 下的常用词词典（编码各异、格式各异的原始文本）统一规范化、去重，
+编译为一个索引文件 data/dicts/common_words.index，filter_dict.py 直接加载，
+不需要每次过滤时重新识别编码、解析和合并所有词典。
+
+文件格式（UTF-8）:
+    第一行    JSON 文件头：format, version, count, built, sources（每个来源的文件名、大小、
+              修改时间、SHA-256、贡献的词数，以及下载时记录的 URL / ETag / Last-Modified）
+    其余各行  规范化后的常用词，排序、去重，每行一个
+
+索引由 download_dict.py 下载完成后自动重建，也可以手动重建:
+    python3 download_dict.py build-index
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+INDEX_FORMAT = "rime-ai-common-words"
+INDEX_VERSION = 1
+INDEX_NAME = "common_words.index"
+
+# 依次尝试的编码
+ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'utf-16', 'utf-16-le', 'utf-16-be']
+
+_CHINESE_RE = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def index_path(dict_dir):
+    return Path(dict_dir) / INDEX_NAME
+
+
+def read_word_lines(path):
+    """按 ENCODINGS 依次尝试解码词典文件，返回所有行；都无法解码时返回 None"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    for enc in ENCODINGS:
+        try:
+            return raw.decode(enc).splitlines()
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+    return None
+
+
+def normalize_word(line):
+    """
+    从词典的一行中取出常用词，无效行返回 None
+
+    支持的格式：
+    1. 词条\\t其他信息
+    2. 词条 拼音（如：是的de这zhe个，取第一个连续的中文部分）
+    3. 纯词条（英文词至少2个字母，转为小写）
+    """
+    word = line.strip()
+    if not word or word.startswith('#'):
+        return None
+    word = word.split('\t')[0].strip()
+    if not word:
+        return None
+    chinese_chars = _CHINESE_RE.findall(word)
+    if chinese_chars:
+        return chinese_chars[0]
+    word_parts = word.split()
+    word = word_parts[0] if word_parts else ''
+    if len(word) >= 2 and word.isalpha():
+        return word.lower()
+    return None
+
+
+def list_dict_files(dict_dir):
+    """
+    目录中参与合并的词典文件（排除 README 和下载指南）
+
+    包含"常用"/"common"/"merged"/"dict"的文件排在前面；有 merged 词典时只使用它
+    """
+    dict_dir = Path(dict_dir)
+    if not dict_dir.exists():
+        return []
+    dict_files = [f for f in dict_dir.glob("*.txt")
+                  if not any(kw in f.name.lower() for kw in ['readme', '指南', 'md'])]
+    dict_files.sort(key=lambda x: (
+        0 if any(kw in x.name.lower() for kw in ['常用', 'common', 'merged', 'dict']) else 1,
+        x.name
+    ))
+    merged_file = next((f for f in dict_files if 'merged' in f.name.lower()), None)
+    return [merged_file] if merged_file else dict_files
+
+
+def _download_meta(path):
+    """download_dict.py 保存的下载信息（URL、ETag、SHA-256），没有时返回空 dict"""
+    try:
+        with open(path.with_name(path.name + '.meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_key(path):
+    stat = path.stat()
+    return {'name': path.name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_index(dict_dir, output_file=None):
+    """
+    合并目录中的词典，写入索引文件（先写临时文件再替换）
+
+    Returns:
+        (索引文件路径, 文件头)；目录中没有词典时返回 (None, None)
+    """
+    dict_dir = Path(dict_dir)
+    output_path = Path(output_file) if output_file else index_path(dict_dir)
+    words = set()
+    sources = []
+    for path in list_dict_files(dict_dir):
+        lines = read_word_lines(path)
+        if lines is None:
+            print(f"  ⚠️  无法识别文件编码，跳过: {path.name}")
+            continue
+        before = len(words)
+        for line in lines:
+            word = normalize_word(line)
+            if word:
+                words.add(word)
+        meta = _download_meta(path)
+        source = _source_key(path)
+        source.update(sha256=meta.get('sha256') if meta.get('size') == source['size'] else None,
+                      words=len(words) - before, url=meta.get('url'),
+                      etag=meta.get('etag'), last_modified=meta.get('last_modified'))
+        if not source['sha256']:
+            source['sha256'] = _file_sha256(path)
+        sources.append(source)
+
+    if not sources:
+        return None, None
+
+    header = {
+        'format': INDEX_FORMAT,
+        'version': INDEX_VERSION,
+        'count': len(words),
+        'built': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'sources': sources,
+    }
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        f.write("\n".join(sorted(words)))
+        f.write("\n")
+    os.replace(tmp_path, output_path)
+    return output_path, header
+
+
+def read_header(path):
+    """读取索引文件头，不是当前版本的索引时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get('format') != INDEX_FORMAT \
+            or header.get('version') != INDEX_VERSION:
+        return None
+    return header
+
+
+def is_index_file(path):
+    return read_header(path) is not None
+
+
+def is_fresh(dict_dir, header):
+    """索引中的来源与目录中当前的词典文件（文件名、大小、修改时间）一致"""
+    try:
+        current = [_source_key(path) for path in list_dict_files(dict_dir)]
+    except OSError:
+        return False
+    recorded = [{k: s[k] for k in ('name', 'size', 'mtime_ns')} for s in header['sources']]
+    return current == recorded
+
+
+def load_index(path):
+    """加载索引，返回 (常用词集合, 文件头)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        words = set(f.read().split("\n"))
+    words.discard('')
+    return words, header
@@ -4,6 +4,19 @@
 一键转换脚本
 自动查找最新的bin文件，执行完整转换流程：
 bin -> 带词频 -> final / final_带词频
+
+用法:
+    python3 convert.py [--db[=data/dict.db]] [--backup-dir=DIR] [--backup-mode=copy|cas] [--no-backup]
+                       [--data-dir=DIR] [--dict=FILE]
+
+--db: 同时把完整词库、过滤结果和常用词写入词库数据库（见 dict_store.py），
+      便于合并多份备份、按词条或词频范围查询
+--backup-dir: 备份目录（默认 SOGOU_BACKUP_DIR 环境变量，否则为 iCloud Backup/sogou_dict）
+--backup-mode: copy 按原文件名覆盖复制（默认）；cas 按内容寻址保存每次备份的历史版本，
+               未变化的文件不重复复制（见 dict_backup.py）
+--no-backup: 不备份
+--data-dir: 查找 bin 文件和输出结果的目录（默认 data）
+--dict: 常用词词典文件（默认 data/常用词词典.txt，见 filter_dict.py）
 """
 
 import os
@@ -15,6 +28,9 @@ from datetime import datetime
 # 导入其他模块的函数
 from sogou_export_with_freq import parse_sogou_bin_with_freq, export_with_freq
 from filter_dict import filter_dict_with_freq, load_common_words_from_file
+from dict_binary import load_entries
+from dict_store import DEFAULT_DB, DictStore
+from dict_backup import BackupStore
 
 # 尝试导入 Rime 导入功能（可选）
 try:
@@ -24,6 +40,19 @@ except (ImportError, AttributeError):
     RIME_AVAILABLE = False
 
 
+# 一键转换使用的过滤规则（convert_batch.py 中的任务可以逐项覆盖）
+FILTER_OPTIONS = {
+    'min_freq': 10,
+    'filter_single_char': True,
+    'filter_common_words': True,
+    'filter_repeated': True,
+    'filter_interjection': True,
+    'filter_numbers': True,
+    'filter_punctuation': True,
+    'filter_english': False,
+}
+
+
 def find_latest_bin_file(data_dir):
     """查找data目录下最新的bin文件"""
     data_path = Path(data_dir)
@@ -45,22 +74,37 @@ def get_icloud_backup_dir():
     return icloud_backup
 
 
-def backup_to_icloud(source_files, backup_subdir="sogou_dict"):
+def backup_to_icloud(source_files, backup_subdir="sogou_dict", backup_dir=None, mode="copy"):
     """
-    将文件备份到iCloud Backup目录
+    将文件备份到iCloud Backup目录（或指定的备份目录）
     
     Args:
         source_files: 要备份的文件路径列表（Path对象或字符串）
         backup_subdir: Backup目录下的子目录名
+        backup_dir: 备份目录，默认为 SOGOU_BACKUP_DIR 环境变量，否则为 iCloud Backup 下的 backup_subdir
+        mode: copy（按原文件名覆盖复制）或 cas（按内容寻址保存历史版本，未变化的文件不重复复制，见 dict_backup.py）
     """
-    icloud_backup = get_icloud_backup_dir()
-    if not icloud_backup.exists():
-        print(f"⚠️  警告: iCloud Backup目录不存在: {icloud_backup}")
-        print("   跳过自动备份")
-        return False
+    if backup_dir is None and os.getenv("SOGOU_BACKUP_DIR"):
+        backup_dir = os.getenv("SOGOU_BACKUP_DIR")
+    if backup_dir is not None:
+        backup_dir = Path(backup_dir).expanduser()
+    else:
+        icloud_backup = get_icloud_backup_dir()
+        if not icloud_backup.exists():
+            print(f"⚠️  警告: iCloud Backup目录不存在: {icloud_backup}")
+            print("   跳过自动备份（可用 --backup-dir 或 SOGOU_BACKUP_DIR 指定备份目录）")
+            return False
+        backup_dir = icloud_backup / backup_subdir
+    
+    if mode == "cas":
+        store = BackupStore(backup_dir)
+        manifest_path, stored, stored_bytes = store.backup(source_files)
+        print(f"\n📦 备份完成: {manifest_path.name}（新写入 {stored} 个文件，{stored_bytes / 1024 / 1024:.2f} MB，"
+              f"未变化的文件已跳过）")
+        print(f"   备份位置: {backup_dir}")
+        return True
     
     # 创建子目录
-    backup_dir = icloud_backup / backup_subdir
     backup_dir.mkdir(parents=True, exist_ok=True)
     
     backed_up_files = []
@@ -79,22 +123,58 @@ def backup_to_icloud(source_files, backup_subdir="sogou_dict"):
         print(f"  ✅ 已备份: {source_path.name} -> {dest_path}")
     
     if backed_up_files:
-        print(f"\n📦 备份完成: {len(backed_up_files)} 个文件已备份到 iCloud")
+        print(f"\n📦 备份完成: {len(backed_up_files)} 个文件已备份")
         print(f"   备份位置: {backup_dir}")
         return True
     
     return False
 
 
+def save_to_store(db_path, base_name, words_with_freq, final_with_freq, common_words):
+    """把完整词库、过滤结果和常用词写入词库数据库"""
+    with DictStore(db_path) as store:
+        count = store.add_entries(base_name, words_with_freq, kind='backup')
+        print(f"  ✅ 完整词库: {count:,} 个词条（来源: {base_name}）")
+        if final_with_freq.exists():
+            final_source = f"{base_name}_final"
+            count = store.add_entries(final_source, load_entries(final_with_freq), kind='filtered')
+            print(f"  ✅ 过滤结果: {count:,} 个词条（来源: {final_source}）")
+        if common_words:
+            count = store.add_common_words(common_words)
+            print(f"  ✅ 常用词: {count:,} 个")
+        print(f"  数据库: {store.path}")
+
+
 def main():
     print("=" * 60)
     print("搜狗词库一键转换工具")
     print("=" * 60)
     print()
     
-    # 获取脚本所在目录
-    script_dir = Path(__file__).parent
-    data_dir = script_dir / "data"
+    # 解析选项
+    db_path = None
+    backup_dir = None
+    backup_mode = os.getenv("SOGOU_BACKUP_MODE", "copy")
+    do_backup = '--no-backup' not in sys.argv
+    data_dir = Path(__file__).parent / "data"
+    common_dict_file = None
+    for arg in sys.argv[1:]:
+        if arg == '--db':
+            db_path = DEFAULT_DB
+        elif arg.startswith('--db='):
+            db_path = Path(arg.split('=', 1)[1])
+        elif arg.startswith('--backup-dir='):
+            backup_dir = arg.split('=', 1)[1]
+        elif arg.startswith('--backup-mode='):
+            backup_mode = arg.split('=', 1)[1]
+        elif arg.startswith('--data-dir='):
+            data_dir = Path(arg.split('=', 1)[1])
+        elif arg.startswith('--dict='):
+            common_dict_file = arg.split('=', 1)[1]
+    if backup_mode not in ('copy', 'cas'):
+        print(f"❌ 错误: 未知的备份模式: {backup_mode}（可选 copy / cas）")
+        sys.exit(1)
+    
     data_dir.mkdir(exist_ok=True)
     
     # 查找最新的bin文件
@@ -133,9 +213,10 @@ def main():
         
         if words_with_freq:
             print(f"\n词频统计:")
-            print(f"  最高词频: {words_with_freq[0][1]:,}")
-            print(f"  最低词频: {words_with_freq[-1][1]:,}")
-            print(f"  平均词频: {sum(f for _, f in words_with_freq) // len(words_with_freq):,}")
+            freqs = [item[1] for item in words_with_freq]
+            print(f"  最高词频: {max(freqs):,}")
+            print(f"  最低词频: {min(freqs):,}")
+            print(f"  平均词频: {sum(freqs) // len(freqs):,}")
     except Exception as e:
         print(f"\n❌ 错误: 导出带词频词库时出错: {e}")
         import traceback
@@ -155,20 +236,11 @@ def main():
     
     try:
         # 准备过滤选项
-        filter_options = {
-            'min_freq': 10,
-            'filter_single_char': True,
-            'filter_common_words': True,
-            'filter_repeated': True,
-            'filter_interjection': True,
-            'filter_numbers': True,
-            'filter_punctuation': True,
-            'filter_english': False,
-        }
+        filter_options = dict(FILTER_OPTIONS)
         
         # 加载常用词词典
         print("正在从外部词典加载常用词...")
-        common_words_dict = load_common_words_from_file(None)
+        common_words_dict = load_common_words_from_file(common_dict_file)
         
         # 执行过滤
         final_count, filtered_stats = filter_dict_with_freq(
@@ -221,26 +293,38 @@ def main():
     print()
     
     # 自动备份到iCloud
-    print(f"\n{'='*60}")
-    print("自动备份到 iCloud")
-    print(f"{'='*60}")
-    
-    files_to_backup = []
-    # 备份原始bin文件
-    if bin_file.exists():
-        files_to_backup.append(bin_file)
-    # 备份最终版本文件
-    if final_with_freq.exists():
-        files_to_backup.append(final_with_freq)
-    if final_file.exists():
-        files_to_backup.append(final_file)
-    
-    if files_to_backup:
-        backup_to_icloud(files_to_backup, backup_subdir="sogou_dict")
-    else:
-        print("⚠️  没有文件需要备份")
+    if do_backup:
+        print(f"\n{'='*60}")
+        print("自动备份到 iCloud" if backup_dir is None else "自动备份")
+        print(f"{'='*60}")
+        
+        files_to_backup = []
+        # 备份原始bin文件
+        if bin_file.exists():
+            files_to_backup.append(bin_file)
+        # 备份最终版本文件
+        if final_with_freq.exists():
+            files_to_backup.append(final_with_freq)
+        if final_file.exists():
+            files_to_backup.append(final_file)
+        
+        if files_to_backup:
+            backup_to_icloud(files_to_backup, backup_subdir="sogou_dict", backup_dir=backup_dir, mode=backup_mode)
+        else:
+            print("⚠️  没有文件需要备份")
+        
+        print()
+    # 写入词库数据库（可选）
+    if db_path is not None:
+        print(f"\n{'='*60}")
+        print("写入词库数据库")
+        print(f"{'='*60}")
+        try:
+            save_to_store(db_path, base_name, words_with_freq, final_with_freq, common_words_dict)
+        except Exception as e:
+            print(f"\n⚠️  写入词库数据库时出错: {e}")
+        print()
     
-    print()
     print("使用建议:")
     print(f"  - 推荐使用: {final_with_freq.name if final_with_freq.exists() else 'N/A'}")
     print(f"  - 导入其他输入法: {final_file.name if final_file.exists() else 'N/A'}")
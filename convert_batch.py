@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量转换脚本（多用户）
+按任务清单并行转换多份搜狗词库备份：bin -> 带词频 -> final_带词频 [-> Rime 词库]
+
+- 任务在进程池中运行，同时在内存中的任务数不超过进程数
+- 常用词词典在主进程中只加载一次，由所有进程共用（--compact 时只传文件路径，各进程内存映射同一个文件）
+- 拼音转换结果在每个进程内缓存（import_to_rime.word_to_pinyin），多个任务之间共用
+- 每个任务完成后输出一行 JSON 汇总（JSON lines），进度信息输出到 stderr
+
+用法:
+    python3 convert_batch.py <任务清单.jsonl> [选项]
+
+选项:
+    --workers=N               并行进程数（默认 CPU 核数）
+    --summary=FILE            汇总写入文件（默认输出到 stdout）
+    --max-tasks-per-child=N   每个进程处理 N 个任务后重启，释放内存（默认不重启）
+    --compact                 常用词使用内存映射的 .cwh 文件（见 common_words_hash.py），
+                              所有进程共用同一份页缓存，不再各自复制一份常用词 set
+
+任务清单每行一个 JSON 对象（也可以是一个 JSON 数组）:
+    {"id": "user1", "input": "backups/user1/搜狗词库备份.bin", "output_dir": "out/user1",
+     "filter": {"min_freq": 20}, "common_words": "data/常用词词典.txt",
+     "rime_output": "out/user1/custom_phrase.txt"}
+
+    input        必填，搜狗词库 .bin（或已导出的带词频词库：文本 / .rdict）
+    id           任务名，默认为 input 的文件名
+    output_dir   输出目录，默认为 input 所在目录
+    filter       覆盖 convert.py 的默认过滤规则（FILTER_OPTIONS）
+    common_words 常用词词典文件，默认 data/常用词词典.txt
+    rime_output  同时导入为 Rime 词库（需要 pypinyin）
+
+汇总字段: id, input, status (ok / error), entries, kept, filtered, outputs, seconds, error
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from convert import FILTER_OPTIONS
+from dict_binary import count_entries
+from filter_dict import filter_dict_with_freq, load_common_words_from_file, load_compact_common_words
+from sogou_export_with_freq import export_with_freq, parse_sogou_bin_with_freq
+
+# 常用词集合：{词典文件: set}，由主进程加载后传给每个工作进程
+_common_words = {}
+
+
+def load_manifest(manifest_file):
+    """读取任务清单（JSON lines 或 JSON 数组）"""
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        jobs = json.loads(content)
+    else:
+        jobs = [json.loads(line) for line in content.splitlines() if line.strip() and not line.startswith('#')]
+    for i, job in enumerate(jobs, 1):
+        if not isinstance(job, dict) or 'input' not in job:
+            raise ValueError(f"任务清单第 {i} 项缺少 input 字段")
+    return jobs
+
+
+def job_filter_options(job):
+    options = dict(FILTER_OPTIONS)
+    options.update(job.get('filter') or {})
+    return options
+
+
+def load_shared_common_words(jobs, compact=False):
+    """加载所有任务用到的常用词词典（每个词典文件只加载一次）"""
+    load = load_compact_common_words if compact else load_common_words_from_file
+    common_words = {}
+    with redirect_stdout(sys.stderr):
+        for job in jobs:
+            if not job_filter_options(job).get('filter_common_words', True):
+                continue
+            dict_file = job.get('common_words')
+            if dict_file not in common_words:
+                common_words[dict_file] = load(dict_file)
+    return common_words
+
+
+def _init_worker(common_words):
+    global _common_words
+    _common_words = common_words
+
+
+def run_job(job):
+    """运行一个转换任务，返回汇总 dict（不抛出异常）"""
+    start = time.monotonic()
+    input_path = Path(job['input'])
+    job_id = job.get('id') or input_path.stem
+    summary = {'id': job_id, 'input': str(input_path), 'status': 'ok'}
+    try:
+        output_dir = Path(job.get('output_dir') or input_path.parent)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        base_name = input_path.stem.replace("_带词频", "")
+        filter_options = job_filter_options(job)
+        common_words = _common_words.get(job.get('common_words'), set())
+
+        # 各步骤的进度输出不混在一起，丢弃
+        with redirect_stdout(io.StringIO()):
+            if input_path.suffix == '.bin':
+                words_with_freq = parse_sogou_bin_with_freq(str(input_path))
+                full_file = output_dir / f"{base_name}_带词频.txt"
+                export_with_freq(words_with_freq, str(full_file))
+                entries = len(words_with_freq)
+                del words_with_freq
+            else:
+                full_file = input_path
+                entries = count_entries(input_path)
+
+            final_with_freq = output_dir / f"{base_name}_final_带词频.txt"
+            kept, filtered = filter_dict_with_freq(
+                str(full_file), str(final_with_freq), filter_options, common_words
+            )
+            outputs = {'full': str(full_file), 'final': str(final_with_freq)}
+
+            if job.get('rime_output'):
+                from import_to_rime import convert_to_rime_format
+                convert_to_rime_format(str(final_with_freq), job['rime_output'])
+                outputs['rime'] = str(job['rime_output'])
+
+        summary.update(entries=entries, kept=kept,
+                       filtered={k: v for k, v in filtered.items() if v}, outputs=outputs)
+    except Exception as e:
+        summary.update(status='error', error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    summary['seconds'] = round(time.monotonic() - start, 3)
+    summary['pid'] = os.getpid()
+    return summary
+
+
+def run_batch(jobs, workers=None, max_tasks_per_child=None, compact=False):
+    """并行运行任务，按完成顺序逐个产出汇总"""
+    common_words = load_shared_common_words(jobs, compact)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(common_words,),
+                              maxtasksperchild=max_tasks_per_child) as pool:
+        # chunksize=1：每个进程一次只取一个任务，同时在内存中的词库不超过进程数
+        yield from pool.imap_unordered(run_job, jobs, chunksize=1)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            options[key] = value
+
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    try:
+        jobs = load_manifest(args[0])
+        workers = int(options['workers']) if 'workers' in options else None
+        max_tasks = int(options['max-tasks-per-child']) if 'max-tasks-per-child' in options else None
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not jobs:
+        print("任务清单为空", file=sys.stderr)
+        return
+
+    summary_file = open(options['summary'], 'w', encoding='utf-8') if 'summary' in options else sys.stdout
+    start = time.monotonic()
+    failed = 0
+    try:
+        for i, summary in enumerate(run_batch(jobs, workers, max_tasks, '--compact' in sys.argv), 1):
+            summary_file.write(json.dumps(summary, ensure_ascii=False) + "\n")
+            summary_file.flush()
+            if summary['status'] != 'ok':
+                failed += 1
+            status = '✅' if summary['status'] == 'ok' else f"❌ {summary['error']}"
+            print(f"[{i}/{len(jobs)}] {summary['id']}: {status} ({summary['seconds']:.1f}s)", file=sys.stderr)
+    finally:
+        if summary_file is not sys.stdout:
+            summary_file.close()
+
+    print(f"\n完成 {len(jobs) - failed}/{len(jobs)} 个任务，耗时 {time.monotonic() - start:.1f}s", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按内容寻址的词库备份
+每次备份只写一个小的清单文件，文件内容按 SHA-256 存放，内容没变的文件不会重复复制，
+保留每一次备份的历史版本。
+
+目录结构（备份目录默认为 iCloud Backup/sogou_dict，可用 --dir 或 SOGOU_BACKUP_DIR 指定）:
+    objects/ab/cdef...             文件内容（文件名为 SHA-256）
+    manifests/20251127-093000-001.json  每次备份的清单：文件名、SHA-256、大小、修改时间
+
+用法:
+    python3 dict_backup.py backup <文件>... [--dir=备份目录]
+    python3 dict_backup.py list [--dir=备份目录]
+    python3 dict_backup.py restore <清单名或 latest> <输出目录> [--dir=备份目录]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+BACKUP_SUBDIR = "sogou_dict"
+
+
+def default_backup_dir():
+    """备份目录：SOGOU_BACKUP_DIR 环境变量，否则为 iCloud Backup 目录下的 sogou_dict"""
+    env_dir = os.getenv("SOGOU_BACKUP_DIR")
+    if env_dir:
+        return Path(env_dir).expanduser()
+    icloud_backup = Path.home() / "Library" / "Mobile Documents" / "com~apple~CloudDocs" / "Backup"
+    return icloud_backup / BACKUP_SUBDIR
+
+
+def file_sha256(path):
+    """流式计算文件的 SHA-256（每次读取 CHUNK_SIZE，不把整个文件读入内存）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BackupStore:
+    """按内容寻址的备份目录"""
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else default_backup_dir()
+        self.objects = self.root / "objects"
+        self.manifests = self.root / "manifests"
+
+    def object_path(self, sha256):
+        return self.objects / sha256[:2] / sha256[2:]
+
+    def list_manifests(self):
+        """按时间顺序返回所有清单文件"""
+        if not self.manifests.exists():
+            return []
+        return sorted(self.manifests.glob("*.json"))
+
+    def load_manifest(self, name='latest'):
+        manifests = self.list_manifests()
+        if name == 'latest':
+            if not manifests:
+                return None
+            path = manifests[-1]
+        else:
+            path = self.manifests / (name if name.endswith('.json') else f"{name}.json")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _known_hashes(self):
+        """上一次备份中的 (文件名, 大小, 修改时间) -> SHA-256，未修改的文件不再重新计算"""
+        latest = self.load_manifest()
+        if not latest:
+            return {}
+        return {(f['name'], f['size'], f['mtime_ns']): f['sha256'] for f in latest['files']}
+
+    def backup(self, source_files):
+        """
+        备份文件，返回 (清单路径, 新写入的对象数, 新写入的字节数)
+
+        同名文件以列表中靠后的为准；不存在的文件跳过
+        """
+        known = self._known_hashes()
+        files = []
+        stored = stored_bytes = 0
+        for source_file in source_files:
+            path = Path(source_file)
+            if not path.exists():
+                print(f"⚠️  警告: 源文件不存在，跳过备份: {path}")
+                continue
+            stat = path.stat()
+            sha256 = known.get((path.name, stat.st_size, stat.st_mtime_ns)) or file_sha256(path)
+            object_path = self.object_path(sha256)
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = object_path.with_name(object_path.name + '.tmp')
+                shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, object_path)
+                stored += 1
+                stored_bytes += stat.st_size
+            files.append({'name': path.name, 'sha256': sha256, 'size': stat.st_size,
+                          'mtime_ns': stat.st_mtime_ns})
+
+        self.manifests.mkdir(parents=True, exist_ok=True)
+        # 同一秒内多次备份时递增序号，文件名排序即时间顺序
+        name = time.strftime('%Y%m%d-%H%M%S')
+        seq = 1
+        while (self.manifests / f"{name}-{seq:03d}.json").exists():
+            seq += 1
+        manifest_path = self.manifests / f"{name}-{seq:03d}.json"
+        manifest = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'files': files}
+        _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+        return manifest_path, stored, stored_bytes
+
+    def restore(self, output_dir, name='latest'):
+        """把某次备份的文件恢复到 output_dir，返回恢复的文件列表"""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            raise FileNotFoundError(f"没有备份: {self.root}")
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        restored = []
+        for f in manifest['files']:
+            dest = output_dir / f['name']
+            shutil.copyfile(self.object_path(f['sha256']), dest)
+            restored.append(dest)
+        return restored
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    root = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--dir='):
+            root = arg.split('=', 1)[1]
+
+    if not args or args[0] not in ('backup', 'list', 'restore'):
+        print(__doc__)
+        sys.exit(1)
+
+    store = BackupStore(root)
+    command = args[0]
+    if command == 'backup':
+        manifest_path, stored, stored_bytes = store.backup(args[1:])
+        print(f"✅ 备份完成: {manifest_path.name}（新写入 {stored} 个文件，{stored_bytes / 1024 / 1024:.2f} MB）")
+        print(f"   备份位置: {store.root}")
+    elif command == 'list':
+        for path in store.list_manifests():
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            names = ', '.join(f['name'] for f in manifest['files'])
+            print(f"  {path.stem}\t{names}")
+    else:
+        if len(args) < 3:
+            print(__doc__)
+            sys.exit(1)
+        for dest in store.restore(args[2], args[1]):
+            print(f"  ✅ 已恢复: {dest}")
+
+
+if __name__ == '__main__':
+    main()
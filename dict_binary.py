@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词库二进制格式（.rdict）
+sogou_export_with_freq / filter_dict / import_to_rime 之间传递词库时使用，
+读取时直接内存映射文件，按列访问，不需要逐行 split 和 int()。
+
+文件布局（小端）:
+    文件头    magic "RDIC", 版本(u16), 标志(u16, bit0=含拼音), 词条数 N(u32),
+              词条字符串池大小(u32), 拼音字符串池大小(u32)
+    词频      N 个 i32
+    词条偏移  N+1 个 u32（词条 i 为字符串池 [off[i], off[i+1] - 1) 的 UTF-8，末尾 1 字节为 \0）
+    拼音偏移  N+1 个 u32（仅含拼音时）
+    词条字符串池（每个字符串以 \0 结尾，整列可以一次解码后 split）
+    拼音字符串池（仅含拼音时）
+
+用法:
+    python3 dict_binary.py to-bin <词库.txt> [输出.rdict]
+    python3 dict_binary.py to-text <词库.rdict> [输出.txt]
+    python3 dict_binary.py info <词库.rdict>
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+MAGIC = b'RDIC'
+VERSION = 1
+FLAG_PINYIN = 1
+HEADER = struct.Struct('<4sHHIII')
+BINARY_SUFFIX = '.rdict'
+
+# 文件中的数组按小端存储，大端机器上读取时需要交换字节序（不能零拷贝）
+_NATIVE_LITTLE = sys.byteorder == 'little'
+
+
+def is_binary_dict(path):
+    """判断文件是否为二进制词库（按文件头判断，不看扩展名）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _array(typecode, values):
+    arr = array(typecode, values)
+    if arr.itemsize != 4:
+        raise ValueError(f"array('{typecode}') 不是 4 字节，无法写入二进制词库")
+    if not _NATIVE_LITTLE:
+        arr.byteswap()
+    return arr
+
+
+def _string_pool(strings):
+    """把字符串编码为以 \0 结尾的 UTF-8 字符串池，返回 (字符串池, 偏移数组)"""
+    encoded = [s.encode('utf-8') + b'\0' for s in strings]
+    offsets = [0] * (len(encoded) + 1)
+    total = 0
+    for i, data in enumerate(encoded, 1):
+        total += len(data)
+        offsets[i] = total
+    return b''.join(encoded), offsets
+
+
+def write_binary_dict(entries, output_file):
+    """
+    写入二进制词库（先写临时文件再替换，读取方不会看到写了一半的文件）
+
+    Args:
+        entries: 词条列表，格式为 (词条, 词频, 拼音) 或 (词条, 词频)
+        output_file: 输出文件路径
+
+    Returns:
+        写入的词条数
+    """
+    entries = entries if isinstance(entries, list) else list(entries)
+    has_pinyin = bool(entries) and all(len(item) >= 3 for item in entries)
+
+    word_pool, word_offsets = _string_pool(item[0] for item in entries)
+    pinyin_pool, pinyin_offsets = _string_pool(item[2] or '' for item in entries) if has_pinyin else (b'', [])
+
+    output_path = Path(output_file)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FLAG_PINYIN if has_pinyin else 0,
+                            len(entries), len(word_pool), len(pinyin_pool)))
+        _array('i', (item[1] for item in entries)).tofile(f)
+        _array('I', word_offsets).tofile(f)
+        if has_pinyin:
+            _array('I', pinyin_offsets).tofile(f)
+        f.write(word_pool)
+        f.write(pinyin_pool)
+    os.replace(tmp_path, output_path)
+    return len(entries)
+
+
+class BinaryDict:
+    """
+    内存映射的二进制词库，打开时只读文件头，词频和偏移数组直接映射为 memoryview
+
+    用法:
+        with BinaryDict(path) as d:
+            len(d), d.freqs[i], d.word(i), d.pinyin(i)
+            for word, freq, pinyin in d: ...   # 无拼音列时为 (词条, 词频)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"不是有效的二进制词库: {path}")
+        self._views = []
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"不是有效的二进制词库: {self.path}")
+        magic, version, flags, count, word_pool_size, pinyin_pool_size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"无效的文件头: {magic}, 期望: {MAGIC}")
+        if version != VERSION:
+            raise ValueError(f"不支持的二进制词库版本: {version}")
+        self.count = count
+        self.has_pinyin = bool(flags & FLAG_PINYIN)
+
+        offset = HEADER.size
+        self.freqs = self._column('i', offset, count)
+        offset += 4 * count
+        self._word_offsets = self._column('I', offset, count + 1)
+        offset += 4 * (count + 1)
+        if self.has_pinyin:
+            self._pinyin_offsets = self._column('I', offset, count + 1)
+            offset += 4 * (count + 1)
+        self._word_pool = offset
+        self._pinyin_pool = offset + word_pool_size
+        if self._pinyin_pool + pinyin_pool_size > len(self._mm):
+            raise ValueError(f"二进制词库已截断: {self.path}")
+
+    def _column(self, typecode, offset, n):
+        if offset + 4 * n > len(self._mm):
+            raise ValueError(f"二进制词库已截断: {self.path}")
+        if _NATIVE_LITTLE:
+            view = memoryview(self._mm)[offset:offset + 4 * n].cast(typecode)
+            self._views.append(view)
+            return view
+        arr = array(typecode, self._mm[offset:offset + 4 * n])
+        arr.byteswap()
+        return arr
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, pool, offsets, i):
+        return self._mm[pool + offsets[i]:pool + offsets[i + 1] - 1].decode('utf-8')
+
+    def _strings(self, pool, offsets):
+        # 整列一次解码再按 \0 切分，不逐个切片解码
+        if self.count == 0:
+            return []
+        return self._mm[pool:pool + offsets[self.count] - 1].decode('utf-8').split('\0')
+
+    def word(self, i):
+        return self._string(self._word_pool, self._word_offsets, i)
+
+    def pinyin(self, i):
+        """第 i 个词条的拼音，无拼音列时返回空串"""
+        if not self.has_pinyin:
+            return ''
+        return self._string(self._pinyin_pool, self._pinyin_offsets, i)
+
+    def words(self):
+        """按顺序解码全部词条"""
+        return self._strings(self._word_pool, self._word_offsets)
+
+    def pinyins(self):
+        """按顺序解码全部拼音，无拼音列时返回空列表"""
+        if not self.has_pinyin:
+            return []
+        return self._strings(self._pinyin_pool, self._pinyin_offsets)
+
+    def __iter__(self):
+        if self.has_pinyin:
+            return iter(zip(self.words(), self.freqs, self.pinyins()))
+        return iter(zip(self.words(), self.freqs))
+
+    def close(self):
+        # memoryview 必须先释放，否则 mmap 无法关闭
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_text_dict(input_file):
+    """
+    读取文本词库（每行 词条\\t词频[\\t拼音]，或每行一个词条，词频默认为 1）
+
+    Returns:
+        词条列表，格式为 (词条, 词频, 拼音) 或 (词条, 词频)
+    """
+    entries = []
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            word = parts[0].strip()
+            if not word:
+                continue
+            try:
+                freq = int(parts[1]) if len(parts) > 1 else 1
+            except ValueError:
+                freq = 1
+            if len(parts) > 2:
+                entries.append((word, freq, parts[2].strip()))
+            else:
+                entries.append((word, freq))
+    return entries
+
+
+def write_text_dict(entries, output_file, include_pinyin=True):
+    """写入文本词库（词条\\t词频[\\t拼音]），返回写入的词条数"""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for item in entries:
+            if include_pinyin and len(item) >= 3 and item[2]:
+                f.write(f"{item[0]}\t{item[1]}\t{item[2]}\n")
+            else:
+                f.write(f"{item[0]}\t{item[1]}\n")
+            count += 1
+    return count
+
+
+def load_entries(input_file):
+    """读取词库（二进制或文本），返回词条列表"""
+    if is_binary_dict(input_file):
+        with BinaryDict(input_file) as d:
+            return list(d)
+    return read_text_dict(input_file)
+
+
+def count_entries(input_file):
+    """词库中的词条数（二进制词库只读文件头，文本词库数非空行）"""
+    if is_binary_dict(input_file):
+        with BinaryDict(input_file) as d:
+            return len(d)
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return sum(1 for line in f if line.strip() and not line.startswith('#'))
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('to-bin', 'to-text', 'info'):
+        print(__doc__)
+        sys.exit(1)
+
+    command, input_file = sys.argv[1], sys.argv[2]
+    if not os.path.exists(input_file):
+        print(f"错误: 文件不存在: {input_file}")
+        sys.exit(1)
+
+    if command == 'info':
+        with BinaryDict(input_file) as d:
+            print(f"文件: {input_file}")
+            print(f"词条数: {len(d):,}")
+            print(f"拼音列: {'有' if d.has_pinyin else '无'}")
+            if len(d):
+                print(f"词频范围: {min(d.freqs):,} - {max(d.freqs):,}")
+                print("\n前10个词条:")
+                for i in range(min(10, len(d))):
+                    print(f"  {i + 1}. {d.word(i)}\t{d.freqs[i]:,}\t{d.pinyin(i)}".rstrip())
+        return
+
+    input_path = Path(input_file)
+    if command == 'to-bin':
+        output_file = sys.argv[3] if len(sys.argv) > 3 else str(input_path.with_suffix(BINARY_SUFFIX))
+        count = write_binary_dict(read_text_dict(input_file), output_file)
+    else:
+        output_file = sys.argv[3] if len(sys.argv) > 3 else str(input_path.with_suffix('.txt'))
+        with BinaryDict(input_file) as d:
+            count = write_text_dict(d, output_file)
+
+    print(f"✅ 已转换 {count:,} 个词条: {input_file} -> {output_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比较两份搜狗词库备份
+找出新增、删除和词频变化的词条（以词条为键做哈希连接，耗时与词库大小成线性关系），
+输出可以直接交给 import_to_rime.py 只导入变化的部分。
+
+支持的输入: 搜狗词库 .bin、二进制词库 .rdict（见 dict_binary.py）、文本词库（词条\\t词频）
+
+Rime 词库由过滤后的词库（filter_dict.py）生成，所以增量也按 convert.py 的过滤规则
+（FILTER_OPTIONS + 常用词）过滤：新增和词频变化的词条只保留通过过滤的；
+原来通过过滤、现在不再通过的词条（如词频降到阈值以下）写入 _removed.txt，合并时删除。
+
+用法:
+    python3 dict_diff.py <旧备份> <新备份> [输出前缀] [选项]
+
+选项:
+    --min-freq=N   最小词频（默认与 convert.py 相同）
+    --dict=FILE    常用词词典文件（默认 data/常用词词典.txt，见 filter_dict.py）
+    --no-common    不过滤常用词
+    --no-filter    不过滤（例如比较两份已经过滤的 _final_带词频.txt）
+
+输出（默认前缀为 data/{新备份文件名}_diff）:
+    {前缀}_delta.txt     新增和词频变化的词条（词条\\t新词频）
+    {前缀}_removed.txt   删除的词条（每行一个）
+
+只导入变化部分:
+    python3 import_to_rime.py {前缀}_delta.txt --merge --remove={前缀}_removed.txt
+"""
+
+import sys
+from pathlib import Path
+
+from convert import FILTER_OPTIONS
+from dict_binary import load_entries
+from filter_dict import load_common_words_from_file, should_keep
+from sogou_export_with_freq import parse_sogou_bin_with_freq
+
+
+def load_freq_map(path):
+    """读取词库为 {词条: 词频}，同一词条出现多次（不同拼音）时取最高词频"""
+    path = Path(path)
+    if path.suffix == '.bin':
+        entries = parse_sogou_bin_with_freq(str(path))
+    else:
+        entries = load_entries(path)
+    freq_map = {}
+    for item in entries:
+        word, freq = item[0], item[1]
+        current = freq_map.get(word)
+        if current is None or freq > current:
+            freq_map[word] = freq
+    return freq_map
+
+
+def diff_freq_maps(old, new):
+    """
+    比较两份 {词条: 词频}
+
+    Returns:
+        (新增, 删除, 词频变化)：新增为 [(词条, 词频)]，删除为 [词条]，
+        词频变化为 [(词条, 旧词频, 新词频)]，均按新词库（删除按旧词库）中的顺序
+    """
+    added = []
+    changed = []
+    for word, freq in new.items():
+        old_freq = old.get(word)
+        if old_freq is None:
+            added.append((word, freq))
+        elif old_freq != freq:
+            changed.append((word, old_freq, freq))
+    removed = [word for word in old if word not in new]
+    return added, removed, changed
+
+
+def filter_delta(old, added, removed, changed, filter_options, common_words):
+    """
+    按过滤规则处理差异，结果与分别过滤两份备份后再比较一致
+
+    Args:
+        old: 旧词库 {词条: 词频}
+        added, removed, changed: diff_freq_maps 的结果
+        filter_options: 过滤规则（见 filter_dict.should_keep）
+        common_words: 常用词集合
+
+    Returns:
+        (新增, 删除, 词频变化)，格式同 diff_freq_maps
+    """
+    def keep(word, freq):
+        return should_keep(word, freq, filter_options, common_words)
+
+    kept_added = [(word, freq) for word, freq in added if keep(word, freq)]
+    kept_removed = [word for word in removed if keep(word, old[word])]
+    kept_changed = []
+    for word, old_freq, freq in changed:
+        was_kept = keep(word, old_freq)
+        if keep(word, freq):
+            if was_kept:
+                kept_changed.append((word, old_freq, freq))
+            else:
+                # 原来被过滤（如词频低于阈值），现在通过过滤：对 Rime 词库而言是新增
+                kept_added.append((word, freq))
+        elif was_kept:
+            kept_removed.append(word)
+    return kept_added, kept_removed, kept_changed
+
+
+def write_delta(added, removed, changed, prefix):
+    """写入 {前缀}_delta.txt 和 {前缀}_removed.txt，返回两个文件路径"""
+    delta_file = Path(f"{prefix}_delta.txt")
+    removed_file = Path(f"{prefix}_removed.txt")
+    with open(delta_file, 'w', encoding='utf-8') as f:
+        for word, freq in added:
+            f.write(f"{word}\t{freq}\n")
+        for word, _, freq in changed:
+            f.write(f"{word}\t{freq}\n")
+    with open(removed_file, 'w', encoding='utf-8') as f:
+        for word in removed:
+            f.write(f"{word}\n")
+    return delta_file, removed_file
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            options[key] = value
+
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    old_file, new_file = Path(args[0]), Path(args[1])
+    for path in (old_file, new_file):
+        if not path.exists():
+            print(f"错误: 文件不存在: {path}")
+            sys.exit(1)
+
+    if len(args) > 2:
+        prefix = args[2]
+    else:
+        data_dir = Path(__file__).parent / "data"
+        data_dir.mkdir(exist_ok=True)
+        prefix = str(data_dir / f"{new_file.stem}_diff")
+
+    do_filter = '--no-filter' not in sys.argv
+    filter_options = dict(FILTER_OPTIONS)
+    if 'min-freq' in options:
+        filter_options['min_freq'] = int(options['min-freq'])
+    if '--no-common' in sys.argv:
+        filter_options['filter_common_words'] = False
+
+    print(f"旧备份: {old_file}")
+    print(f"新备份: {new_file}")
+    print("-" * 50)
+
+    old = load_freq_map(old_file)
+    new = load_freq_map(new_file)
+    added, removed, changed = diff_freq_maps(old, new)
+    raw_counts = (len(added), len(removed), len(changed))
+    if do_filter:
+        common_words = set()
+        if filter_options['filter_common_words']:
+            common_words = load_common_words_from_file(options.get('dict'))
+        added, removed, changed = filter_delta(old, added, removed, changed, filter_options, common_words)
+    delta_file, removed_file = write_delta(added, removed, changed, prefix)
+
+    print(f"\n旧词库: {len(old):,} 个词条")
+    print(f"新词库: {len(new):,} 个词条")
+    if do_filter:
+        print(f"过滤前: 新增 {raw_counts[0]:,}，删除 {raw_counts[1]:,}，词频变化 {raw_counts[2]:,}")
+        print(f"过滤后（最小词频 {filter_options['min_freq']}，"
+              f"{'过滤' if filter_options['filter_common_words'] else '不过滤'}常用词）:")
+    print(f"  新增: {len(added):,}")
+    print(f"  删除: {len(removed):,}")
+    print(f"  词频变化: {len(changed):,}")
+
+    if added:
+        print("\n新增词条（前10个）:")
+        for i, (word, freq) in enumerate(added[:10], 1):
+            print(f"  {i}. {word}\t{freq:,}")
+    if changed:
+        print("\n词频变化最大的词条（前10个）:")
+        top_changed = sorted(changed, key=lambda x: abs(x[2] - x[1]), reverse=True)[:10]
+        for i, (word, old_freq, freq) in enumerate(top_changed, 1):
+            print(f"  {i}. {word}\t{old_freq:,} -> {freq:,}")
+
+    print(f"\n✅ 已保存: {delta_file}")
+    print(f"          {removed_file}")
+    print(f"\n只导入变化部分:")
+    print(f"  python3 import_to_rime.py {delta_file} --merge --remove={removed_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词库数据库（SQLite）
+把搜狗词库备份、过滤结果和常用词词典存入同一个 SQLite 数据库（默认 data/dict.db），
+查询词条、按词频范围导出、合并多份备份都走索引，不需要扫描整个文本文件。
+
+表结构:
+    entries       (source, word, freq, pinyin)  每个来源（备份/过滤结果）的词条，(source, word) 唯一
+    sources       (name, kind, count, updated)  来源列表，kind 为 backup / filtered / import
+    common_words  (word)                        常用词（filter_dict.py 过滤用）
+
+用法:
+    python3 dict_store.py import <词库文件> [--source=名称] [--db=数据库]
+    python3 dict_store.py common <常用词词典.txt> [--db=数据库]
+    python3 dict_store.py lookup <词条> [--db=数据库]
+    python3 dict_store.py export <输出文件> [--source=名称] [--min-freq=N] [--max-freq=N] [--db=数据库]
+    python3 dict_store.py sources [--db=数据库]
+
+不指定 --source 时，export 合并所有来源（同一词条取最高词频）。
+输出文件扩展名为 .rdict 时写入二进制词库（见 dict_binary.py）。
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_DB = Path(__file__).parent / "data" / "dict.db"
+SQLITE_MAGIC = b'SQLite format 3\x00'
+BATCH_SIZE = 50000  # executemany 每批插入的行数
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    source TEXT NOT NULL,
+    word TEXT NOT NULL,
+    freq INTEGER NOT NULL,
+    pinyin TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (source, word)
+);
+CREATE TABLE IF NOT EXISTS common_words (
+    word TEXT PRIMARY KEY
+);
+"""
+
+# 词条表的二级索引：批量写入的行数超过表中已有行数时，先删除索引、写完再重建（比逐行维护快一倍）
+ENTRY_INDEXES = {
+    'idx_entries_word': "CREATE INDEX IF NOT EXISTS idx_entries_word ON entries (word)",
+    'idx_entries_pinyin': "CREATE INDEX IF NOT EXISTS idx_entries_pinyin ON entries (pinyin)",
+    'idx_entries_freq': "CREATE INDEX IF NOT EXISTS idx_entries_freq ON entries (freq)",
+    'idx_entries_source_freq': "CREATE INDEX IF NOT EXISTS idx_entries_source_freq ON entries (source, freq)",
+}
+
+
+def is_store_path(path):
+    """判断文件是否为词库数据库（按 SQLite 文件头判断；不存在的 .db 文件也视为数据库）"""
+    path = Path(path)
+    if not path.exists():
+        return path.suffix == '.db'
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+class DictStore:
+    """
+    词库数据库
+
+    用法:
+        with DictStore() as store:
+            store.add_entries("搜狗词库备份_2025_11_27", words_with_freq)
+            store.lookup("词条")
+            store.entries(min_freq=10)
+    """
+
+    def __init__(self, db_path=None):
+        self.path = Path(db_path or DEFAULT_DB)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        # WAL：批量写入时读取方不被阻塞；NORMAL 同步级别在 WAL 下不会损坏数据库
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._create_indexes()
+
+    def _create_indexes(self):
+        for sql in ENTRY_INDEXES.values():
+            self.conn.execute(sql)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_entries(self, source, entries, kind='backup', replace=True):
+        """
+        写入一个来源的词条（在一个事务中分批 executemany）
+
+        Args:
+            source: 来源名称（如 bin 文件名）
+            entries: 词条列表，格式为 (词条, 词频, 拼音) 或 (词条, 词频)
+            kind: 来源类型：backup / filtered / import
+            replace: 是否先删除该来源已有的词条
+
+        Returns:
+            写入后该来源的词条数
+        """
+        entries = entries if isinstance(entries, list) else list(entries)
+        rows = ((item[0], item[1], item[2] if len(item) > 2 and item[2] else '') for item in entries)
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM entries WHERE source = ?", (source,))
+            existing = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            rebuild_indexes = len(entries) > existing
+            if rebuild_indexes:
+                for name in ENTRY_INDEXES:
+                    self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+            batch = []
+            for word, freq, pinyin in rows:
+                batch.append((source, word, freq, pinyin))
+                if len(batch) >= BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            if batch:
+                self._insert(batch)
+            if rebuild_indexes:
+                self._create_indexes()
+            count = self.conn.execute("SELECT COUNT(*) FROM entries WHERE source = ?", (source,)).fetchone()[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (name, kind, count, updated) VALUES (?, ?, ?, ?)",
+                (source, kind, count, time.strftime('%Y-%m-%d %H:%M:%S')),
+            )
+        return count
+
+    def _insert(self, batch):
+        # 同一来源中重复的词条保留词频较高的一条
+        self.conn.executemany(
+            "INSERT INTO entries (source, word, freq, pinyin) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, word) DO UPDATE SET freq = excluded.freq, pinyin = excluded.pinyin "
+            "WHERE excluded.freq > entries.freq",
+            batch,
+        )
+
+    def add_common_words(self, words):
+        """写入常用词，返回常用词总数"""
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO common_words (word) VALUES (?)", ((w,) for w in words))
+        return self.conn.execute("SELECT COUNT(*) FROM common_words").fetchone()[0]
+
+    def common_words(self):
+        return {row[0] for row in self.conn.execute("SELECT word FROM common_words")}
+
+    def sources(self):
+        """返回 [(名称, 类型, 词条数, 更新时间)]"""
+        return self.conn.execute("SELECT name, kind, count, updated FROM sources ORDER BY updated").fetchall()
+
+    def lookup(self, word):
+        """查询词条在各来源中的词频，返回 [(来源, 词频, 拼音)]"""
+        return self.conn.execute(
+            "SELECT source, freq, pinyin FROM entries WHERE word = ? ORDER BY freq DESC", (word,)
+        ).fetchall()
+
+    def entries(self, source=None, min_freq=None, max_freq=None, limit=None):
+        """
+        按词频降序返回词条 [(词条, 词频, 拼音)]
+
+        不指定 source 时合并所有来源：同一词条取最高词频及对应的拼音
+        """
+        conditions, params = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if min_freq is not None:
+            conditions.append("freq >= ?")
+            params.append(min_freq)
+        if max_freq is not None:
+            conditions.append("freq <= ?")
+            params.append(max_freq)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        if source is not None:
+            sql = f"SELECT word, freq, pinyin FROM entries {where} ORDER BY freq DESC, rowid"
+        else:
+            # 有词频范围时强制使用词频索引（否则会为了 GROUP BY 扫描整个词条索引）
+            has_range = min_freq is not None or max_freq is not None
+            table = "entries INDEXED BY idx_entries_freq" if has_range else "entries"
+            # SQLite 中与 MAX() 同时查询的其他列取自最大值所在的行
+            sql = (f"SELECT word, MAX(freq) AS freq, pinyin FROM {table} {where} "
+                   f"GROUP BY word ORDER BY freq DESC, word")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            options[key] = value
+
+    commands = ('import', 'common', 'lookup', 'export', 'sources')
+    if not args or args[0] not in commands or (args[0] != 'sources' and len(args) < 2):
+        print(__doc__)
+        sys.exit(1)
+
+    command = args[0]
+    with DictStore(options.get('db')) as store:
+        if command == 'import':
+            from dict_binary import load_entries
+            input_file = Path(args[1])
+            if not input_file.exists():
+                print(f"错误: 文件不存在: {input_file}")
+                sys.exit(1)
+            source = options.get('source', input_file.stem)
+            count = store.add_entries(source, load_entries(input_file), kind=options.get('kind', 'import'))
+            print(f"✅ 已导入 {count:,} 个词条，来源: {source}（{store.path}）")
+        elif command == 'common':
+            from filter_dict import load_common_words_from_file
+            count = store.add_common_words(load_common_words_from_file(args[1]))
+            print(f"✅ 常用词共 {count:,} 个（{store.path}）")
+        elif command == 'lookup':
+            rows = store.lookup(args[1])
+            if not rows:
+                print(f"未找到: {args[1]}")
+            for source, freq, pinyin in rows:
+                print(f"  {source}\t{freq:,}\t{pinyin}".rstrip())
+        elif command == 'export':
+            from dict_binary import BINARY_SUFFIX, write_binary_dict, write_text_dict
+            rows = store.entries(
+                source=options.get('source'),
+                min_freq=int(options['min-freq']) if 'min-freq' in options else None,
+                max_freq=int(options['max-freq']) if 'max-freq' in options else None,
+            )
+            output_file = args[1]
+            if Path(output_file).suffix == BINARY_SUFFIX:
+                count = write_binary_dict(rows, output_file)
+            else:
+                count = write_text_dict(rows, output_file)
+            print(f"✅ 已导出 {count:,} 个词条: {output_file}")
+        else:
+            for name, kind, count, updated in store.sources():
+                print(f"  {name}\t{kind}\t{count:,}\t{updated}")
+
+
+if __name__ == '__main__':
+    main()
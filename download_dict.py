@@ -4,13 +4,24 @@
 下载常用词词典的辅助脚本
 """
 
-import urllib.request
-import sys
+import hashlib
+import json
 import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import quote, unquote, urlparse
+
+from common_words_index import build_index
 
 DICT_DIR = Path(__file__).parent / "data" / "dicts"
-DICT_DIR.mkdir(parents=True, exist_ok=True)
+
+DEFAULT_TIMEOUT = 30        # 连接和每次读取的超时（秒）
+CHUNK_SIZE = 64 * 1024      # 每次读取并写入临时文件的大小
+DEFAULT_WORKERS = 4         # all 模式同时下载的文件数
 
 # 一些可用的词典资源
 DICT_SOURCES = {
@@ -33,33 +44,195 @@ DICT_SOURCES = {
     },
 }
 
-def download_dict(url, output_file):
-    """下载词典文件"""
+# 可选：{URL: SHA-256}，下载完成后校验，不一致时丢弃
+DICT_CHECKSUMS = {}
+
+def encode_url(url):
+    """编码URL路径中的中文字符"""
+    if not any(ord(c) > 127 for c in url):
+        return url
+    # 分离基础URL和路径部分
+    parts = url.split('/', 3)
+    if len(parts) < 4:
+        return url
+    base_url = '/'.join(parts[:3])
+    path = parts[3]
+    # 编码路径中的中文字符
+    encoded_path = '/'.join(quote(part, safe='/') for part in path.split('/'))
+    return f"{base_url}/{encoded_path}"
+
+
+def url_filename(url):
+    """URL 对应的默认文件名（路径的最后一段）"""
+    return Path(unquote(urlparse(url).path)).name or "common_words.txt"
+
+
+def _meta_path(path):
+    return path.with_name(path.name + '.meta.json')
+
+
+def _load_meta(path):
+    try:
+        with open(_meta_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(path, meta):
+    meta_path = _meta_path(path)
+    tmp_path = meta_path.with_name(meta_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _validators(response):
+    return {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+
+def fetch(url, output_file, sha256=None, timeout=DEFAULT_TIMEOUT, force=False, log=print):
+    """
+    下载文件，返回 'downloaded' / 'not_modified' / 'failed'
+
+    - 流式写入 output_file.part，完成并校验后原子重命名为 output_file
+    - 已下载过的文件带上 ETag / Last-Modified 发送条件请求，服务器返回 304 时跳过
+    - 上次中断留下的 .part 用 Range 续传（If-Range 保证服务器上的文件没有变化）
+    - sha256 不为空时校验，不一致则丢弃
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    part_file = output_file.with_name(output_file.name + '.part')
+    meta = _load_meta(output_file)
+    part_meta = _load_meta(part_file)
+
+    req = urllib.request.Request(encode_url(url))
+    req.add_header('User-Agent', 'Mozilla/5.0')
+    if not force and output_file.exists() and meta.get('url') == url:
+        if meta.get('etag'):
+            req.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            req.add_header('If-Modified-Since', meta['last_modified'])
+
+    offset = part_file.stat().st_size if part_file.exists() else 0
+    resume_validator = part_meta.get('etag') or part_meta.get('last_modified')
+    if offset and part_meta.get('url') == url and resume_validator:
+        req.add_header('Range', f'bytes={offset}-')
+        req.add_header('If-Range', resume_validator)
+    else:
+        offset = 0
+
     try:
-        print(f"正在从 {url} 下载...")
-        # 处理URL中的中文字符
-        from urllib.parse import quote
-        # 如果URL包含中文字符，需要编码
-        if any(ord(c) > 127 for c in url):
-            # 分离基础URL和路径部分
-            parts = url.split('/', 3)
-            if len(parts) >= 4:
-                base_url = '/'.join(parts[:3])
-                path = '/'.join(parts[3:])
-                # 编码路径中的中文字符
-                encoded_path = '/'.join(quote(part, safe='/') for part in path.split('/'))
-                url = f"{base_url}/{encoded_path}"
-        
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0')
-        with urllib.request.urlopen(req) as response:
-            with open(output_file, 'wb') as f:
-                f.write(response.read())
-        print(f"✅ 下载完成: {output_file}")
-        return True
+        log(f"正在从 {url} 下载...")
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            validators = _validators(response)
+            if response.status == 206:
+                log(f"  从 {offset:,} 字节处续传")
+                digest = _file_sha256(part_file)
+                mode = 'ab'
+            else:
+                digest = hashlib.sha256()
+                mode = 'wb'
+            _save_meta(part_file, {'url': url, **validators})
+            received = 0
+            with open(part_file, mode) as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+            expected = response.headers.get('Content-Length')
+            if expected is not None and received < int(expected):
+                raise ConnectionError(f"连接中断（{received:,}/{int(expected):,} 字节）")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            log(f"✅ 未变化，跳过: {output_file}")
+            return 'not_modified'
+        if e.code == 416:
+            # 续传位置无效（例如服务器上的文件变短了），下次从头下载
+            part_file.unlink(missing_ok=True)
+        log(f"❌ 下载失败: {e}")
+        return 'failed'
     except Exception as e:
-        print(f"❌ 下载失败: {e}")
+        # 已写入的部分保留在 .part 中，下次续传
+        log(f"❌ 下载失败: {e}")
+        return 'failed'
+
+    actual = digest.hexdigest()
+    if sha256 and actual != sha256.lower():
+        part_file.unlink(missing_ok=True)
+        _meta_path(part_file).unlink(missing_ok=True)
+        log(f"❌ SHA-256 校验失败: {output_file}（期望 {sha256}，实际 {actual}）")
+        return 'failed'
+
+    os.replace(part_file, output_file)
+    _meta_path(part_file).unlink(missing_ok=True)
+    _save_meta(output_file, {'url': url, 'sha256': actual, 'size': output_file.stat().st_size, **validators})
+    log(f"✅ 下载完成: {output_file}")
+    return 'downloaded'
+
+
+def download_dict(url, output_file, sha256=None, timeout=DEFAULT_TIMEOUT, force=False):
+    """下载词典文件，成功（包括未变化而跳过）时返回 True"""
+    return fetch(url, output_file, sha256, timeout, force) != 'failed'
+
+
+def download_all(output_dir=DICT_DIR, workers=DEFAULT_WORKERS, force=False):
+    """并行下载 DICT_SOURCES 中的所有词典，返回 {URL: 状态}"""
+    urls = [url for info in DICT_SOURCES.values() for url in info['urls']]
+
+    print_lock = threading.Lock()
+
+    def job(url):
+        # 多个线程同时输出，每行带上文件名，加锁避免两行混在一起
+        name = url_filename(url)
+
+        def log(msg):
+            with print_lock:
+                print(f"[{name}] {msg}", flush=True)
+
+        return url, fetch(url, Path(output_dir) / name, DICT_CHECKSUMS.get(url), force=force, log=log)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(pool.map(job, urls))
+
+
+def print_dict_stats(dict_file):
+    """逐行统计词典内容（不把整个文件读入内存）"""
+    count = 0
+    head = []
+    with open(dict_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            word = line.strip()
+            if not word or word.startswith('#'):
+                continue
+            count += 1
+            if len(head) < 10:
+                head.append(word)
+    print(f"\n词典统计:")
+    print(f"  有效词条: {count:,}")
+    print(f"  前10个词条:")
+    for word in head:
+        print(f"    {word}")
+
+def rebuild_index(dict_dir):
+    """把目录中的词典编译为常用词索引（filter_dict.py 直接加载）"""
+    index_file, header = build_index(dict_dir)
+    if header is None:
+        print(f"⚠️  {dict_dir} 中没有词典文件")
         return False
+    print(f"✅ 常用词索引: {index_file}（{header['count']:,} 个常用词，来自 {len(header['sources'])} 个词典）")
+    for source in header['sources']:
+        print(f"    {source['name']}\t{source['words']:,}\t{source['sha256'][:12]}")
+    return True
+
 
 def list_sources():
     """列出可用的词典资源"""
@@ -72,16 +245,36 @@ def list_sources():
             print(f"    {i}. {url}")
 
 def main():
-    if len(sys.argv) < 2:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            options[key] = value
+    force = '--force' in sys.argv
+    output_dir = Path(options.get('dir', DICT_DIR))
+
+    if not args:
         print("常用词词典下载工具")
         print("=" * 60)
-        print(f"词典保存目录: {DICT_DIR}")
+        print(f"词典保存目录: {output_dir}")
         print()
         list_sources()
         print()
         print("使用方法：")
-        print("  python3 download_dict.py <URL> [文件名]")
+        print("  python3 download_dict.py <URL> [文件名] [--sha256=HASH]")
+        print("  python3 download_dict.py all [--workers=N]  # 并行下载所有资源")
         print("  python3 download_dict.py list  # 列出可用资源")
+        print("  python3 download_dict.py build-index  # 重新编译常用词索引")
+        print()
+        print("选项：")
+        print("  --dir=DIR          保存目录（默认 data/dicts）")
+        print("  --sha256=HASH      下载完成后校验 SHA-256")
+        print("  --timeout=SECONDS  超时（默认 30 秒）")
+        print("  --force            忽略已下载的文件，重新下载")
+        print()
+        print("已下载的文件再次下载时，服务器上没有变化则跳过；中断的下载会从断点续传。")
+        print("下载完成后，目录中的所有词典会编译为常用词索引 common_words.index，供 filter_dict.py 直接加载。")
         print()
         print("示例：")
         print("  # 下载中文常用词")
@@ -91,27 +284,42 @@ def main():
         print("  python3 download_dict.py https://raw.githubusercontent.com/.../words.txt english_common.txt")
         return
     
-    if sys.argv[1] == "list":
+    if args[0] == "list":
         list_sources()
         return
     
-    url = sys.argv[1]
-    filename = sys.argv[2] if len(sys.argv) > 2 else "common_words.txt"
-    output_file = DICT_DIR / filename
+    if args[0] == "build-index":
+        if not rebuild_index(output_dir):
+            sys.exit(1)
+        return
+    
+    if args[0] == "all":
+        results = download_all(output_dir, int(options.get('workers', DEFAULT_WORKERS)), force)
+        print()
+        for url, status in results.items():
+            print(f"  {status:<13} {url}")
+        if any(status == 'downloaded' for status in results.values()):
+            print()
+            rebuild_index(output_dir)
+        if any(status == 'failed' for status in results.values()):
+            sys.exit(1)
+        return
+    
+    url = args[0]
+    filename = args[1] if len(args) > 1 else "common_words.txt"
+    output_file = output_dir / filename
     
-    if download_dict(url, output_file):
+    status = fetch(url, output_file, options.get('sha256'), float(options.get('timeout', DEFAULT_TIMEOUT)), force)
+    if status == 'failed':
+        sys.exit(1)
+    if status == 'downloaded':
         # 检查文件内容
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                lines = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
-            print(f"\n词典统计:")
-            print(f"  总行数: {len(lines):,}")
-            print(f"  有效词条: {len([l for l in lines if l])}")
-            print(f"  前10个词条:")
-            for word in lines[:10]:
-                print(f"    {word}")
+            print_dict_stats(output_file)
         except Exception as e:
             print(f"无法读取文件: {e}")
+        print()
+        rebuild_index(output_dir)
 
 if __name__ == '__main__':
     main()
@@ -10,6 +10,12 @@ import sys
 import os
 from pathlib import Path
 
+from common_words_hash import HASH_SUFFIX, CommonWordsHash, build_hash_file, is_hash_file
+from common_words_index import (build_index, index_path, is_fresh, is_index_file, load_index,
+                                normalize_word, read_header, read_word_lines)
+from dict_binary import BINARY_SUFFIX, BinaryDict, is_binary_dict, write_binary_dict
+from dict_store import DictStore, is_store_path
+
 
 # 常用词汇词典文件路径（默认）
 # 如果文件不存在，脚本会提示用户下载或创建
@@ -19,6 +25,62 @@ COMMON_WORDS_DICT = Path(__file__).parent / "data" / "常用词词典.txt"
 DICT_DIR = Path(__file__).parent / "data" / "dicts"
 
 
+def _candidate_paths(dict_file):
+    """词典文件可能的位置（相对路径依次尝试脚本目录、data 目录和当前目录）"""
+    dict_path = Path(dict_file)
+    if dict_path.is_absolute():
+        return [dict_path]
+    return [
+        Path(__file__).parent / dict_file,
+        Path(__file__).parent / "data" / dict_file,
+        Path(dict_file),
+    ]
+
+
+def _common_words_source(dict_file):
+    """实际加载常用词的文件：找到的词典文件，或 dicts 目录中最新的常用词索引；都没有时返回 None"""
+    path = next((p for p in _candidate_paths(dict_file) if p.exists()), None)
+    if path is not None:
+        return path
+    index_file = index_path(DICT_DIR)
+    header = read_header(index_file)
+    if header is not None and is_fresh(DICT_DIR, header):
+        return index_file
+    return None
+
+
+def load_compact_common_words(dict_file=None):
+    """
+    加载常用词为内存映射的 CommonWordsHash（见 common_words_hash.py）
+    
+    结果缓存在词典旁边的 .cwh 文件中，词典比缓存新时重新构造；
+    多个进程共用同一个 .cwh 文件，每个进程不再各自保存一份常用词 set。
+    没有找到词典时返回空 set
+    """
+    if dict_file is None:
+        dict_file = COMMON_WORDS_DICT
+    source = _common_words_source(dict_file)
+    if source is not None and is_hash_file(source):
+        return load_common_words_from_file(source)
+    if source is not None:
+        cache = source.with_suffix(HASH_SUFFIX)
+        if cache.exists() and cache.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+            common_words = CommonWordsHash(cache)
+            print(f"从常用词哈希文件加载常用词: {len(common_words):,} 个")
+            print(f"  文件: {cache}")
+            return common_words
+
+    common_words = load_common_words_from_file(dict_file)
+    # 加载时可能刚重建了 dicts 目录的索引
+    source = _common_words_source(dict_file)
+    if not common_words or source is None:
+        return common_words
+    cache = source.with_suffix(HASH_SUFFIX)
+    count = build_hash_file(common_words, cache)
+    print(f"已构造常用词哈希文件: {cache}（{count:,} 个常用词）")
+    return CommonWordsHash(cache)
+
+
 def load_common_words_from_file(dict_file=None):
     """
     从外部词典文件加载常用词
@@ -27,86 +89,51 @@ def load_common_words_from_file(dict_file=None):
         dict_file: 词典文件路径，如果为None则使用默认路径
     
     Returns:
-        set: 常用词集合
+        set: 常用词集合（.cwh 文件返回 CommonWordsHash）
     """
     if dict_file is None:
         dict_file = COMMON_WORDS_DICT
     
-    common_words = set()
+    # 词库数据库：直接读取 common_words 表
+    if Path(dict_file).exists() and is_store_path(dict_file):
+        with DictStore(dict_file) as store:
+            common_words = store.common_words()
+        print(f"从词库数据库加载常用词: {len(common_words):,} 个")
+        print(f"  数据库: {dict_file}")
+        return common_words
     
-    dict_path = Path(dict_file)
-    if not dict_path.is_absolute():
-        # 相对路径，尝试多个位置
-        possible_paths = [
-            Path(__file__).parent / dict_file,
-            Path(__file__).parent / "data" / dict_file,
-            Path(dict_file),
-        ]
-    else:
-        possible_paths = [dict_path]
+    common_words = set()
+    possible_paths = _candidate_paths(dict_file)
     
     found = False
     for path in possible_paths:
         if path.exists():
             try:
-                # 尝试不同的编码
-                encodings = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'latin1']
-                content = None
-                for enc in encodings:
-                    try:
-                        with open(path, 'r', encoding=enc) as f:
-                            content = f.readlines()
-                        break
-                    except (UnicodeDecodeError, UnicodeError):
-                        continue
-                
+                # 常用词哈希文件（见 common_words_hash.py）
+                if is_hash_file(path):
+                    common_words = CommonWordsHash(path)
+                    print(f"从常用词哈希文件加载常用词: {len(common_words):,} 个")
+                    print(f"  文件: {path}")
+                    found = True
+                    break
+
+                # 预先编译的常用词索引（见 common_words_index.py）
+                if is_index_file(path):
+                    common_words, header = load_index(path)
+                    print(f"从常用词索引加载常用词: {len(common_words):,} 个（{len(header['sources'])} 个来源，"
+                          f"构建于 {header['built']}）")
+                    print(f"  索引文件: {path}")
+                    found = True
+                    break
+
+                content = read_word_lines(path)
                 if content is None:
-                    # 尝试二进制读取并检测编码
-                    with open(path, 'rb') as f:
-                        raw = f.read()
-                    # 尝试UTF-16
-                    try:
-                        content = raw.decode('utf-16').splitlines()
-                    except:
-                        raise Exception(f"无法识别文件编码: {path}")
+                    raise Exception(f"无法识别文件编码: {path}")
                 
-                import re
                 for line in content:
-                    word = line.strip()
-                    # 跳过空行和注释
-                    if not word or word.startswith('#'):
-                        continue
-                    
-                    # 支持多种格式：
-                    # 1. 词条\t其他信息
-                    # 2. 词条 拼音（如：是的de这zhe个）
-                    # 3. 纯词条
-                    parts = word.split('\t')
-                    if parts and parts[0]:
-                        word = parts[0].strip()
-                    else:
-                        word = word.strip()
-                    
-                    if not word:
-                        continue
-                    
-                    # 处理"词条+拼音"格式（如：是的de这zhe个）
-                    # 提取中文字符部分（连续的中文字符）
-                    chinese_chars = re.findall(r'[\u4e00-\u9fff]+', word)
-                    if chinese_chars:
-                        # 如果有中文字符，取第一个连续的中文部分
-                        word = chinese_chars[0]
-                        # 只保留有效的中文词（至少1个字符，且不全是标点）
-                        if word and len(word) >= 1 and re.search(r'[\u4e00-\u9fff]', word):
-                            common_words.add(word)
-                    else:
-                        # 如果没有中文字符，取第一个单词（英文词）
-                        word_parts = word.split()
-                        if word_parts:
-                            word = word_parts[0]
-                        # 只保留有效的英文词（至少2个字符，纯字母）
-                        if word and len(word) >= 2 and word.isalpha():
-                            common_words.add(word.lower())
+                    word = normalize_word(line)
+                    if word:
+                        common_words.add(word)
                 print(f"从外部词典加载常用词: {len(common_words):,} 个")
                 print(f"  词典文件: {path}")
                 if len(common_words) > 0:
@@ -119,109 +146,21 @@ def load_common_words_from_file(dict_file=None):
                 continue
     
     if not found:
-        # 尝试从dicts目录加载（可以合并多个词典）
-        if DICT_DIR.exists():
-            dict_files = list(DICT_DIR.glob("*.txt"))
-            # 排除README和下载指南
-            dict_files = [f for f in dict_files if not any(kw in f.name.lower() for kw in ['readme', '指南', 'md'])]
-            
-            if dict_files:
-                # 按文件名排序，优先使用包含"常用"或"common"或"merged"的文件
-                dict_files.sort(key=lambda x: (
-                    0 if any(kw in x.name.lower() for kw in ['常用', 'common', 'merged', 'dict']) else 1,
-                    x.name
-                ))
-                
-                # 如果找到合并词典，只使用它；否则合并所有词典
-                merged_file = next((f for f in dict_files if 'merged' in f.name.lower()), None)
-                if merged_file:
-                    dict_files = [merged_file]
-                    print(f"在 {DICT_DIR} 目录找到合并词典: {merged_file.name}")
-                else:
-                    print(f"在 {DICT_DIR} 目录找到 {len(dict_files)} 个词典文件，将合并使用")
-                    print(f"词典文件: {', '.join([f.name for f in dict_files[:5]])}")
-                    if len(dict_files) > 5:
-                        print(f"  ... 还有 {len(dict_files) - 5} 个文件")
-                
-                try:
-                    # 尝试不同的编码
-                    encodings = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'utf-16', 'utf-16-le', 'utf-16-be']
-                    content = None
-                    for enc in encodings:
-                        try:
-                            with open(dict_files[0], 'r', encoding=enc) as f:
-                                content = f.readlines()
-                            break
-                        except (UnicodeDecodeError, UnicodeError):
-                            continue
-                    
-                    if content is None:
-                        raise Exception(f"无法识别文件编码: {dict_files[0]}")
-                    
-                    import re
-                    # 如果只有一个文件，直接处理；否则合并所有文件
-                    files_to_process = dict_files if not merged_file else [merged_file]
-                    
-                    for dict_file in files_to_process:
-                        # 尝试不同的编码
-                        file_encodings = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'utf-16', 'utf-16-le', 'utf-16-be']
-                        file_content = None
-                        for enc in file_encodings:
-                            try:
-                                with open(dict_file, 'r', encoding=enc) as f:
-                                    file_content = f.readlines()
-                                break
-                            except (UnicodeDecodeError, UnicodeError):
-                                continue
-                        
-                        if file_content is None:
-                            print(f"  警告: 无法读取 {dict_file.name}，跳过")
-                            continue
-                        
-                        file_words_count = 0
-                        for line in file_content:
-                            word = line.strip()
-                            if not word or word.startswith('#'):
-                                continue
-                            
-                            # 支持多种格式
-                            parts = word.split('\t')
-                            if parts and parts[0]:
-                                word = parts[0].strip()
-                            else:
-                                word = word.strip()
-                            
-                            if not word:
-                                continue
-                            
-                            # 处理中英文词
-                            chinese_chars = re.findall(r'[\u4e00-\u9fff]+', word)
-                            if chinese_chars:
-                                word = chinese_chars[0]
-                                if word and len(word) >= 1:
-                                    if word not in common_words:
-                                        common_words.add(word)
-                                        file_words_count += 1
-                            else:
-                                word_parts = word.split()
-                                if word_parts:
-                                    word = word_parts[0]
-                                if word and len(word) >= 2 and word.isalpha():
-                                    word_lower = word.lower()
-                                    if word_lower not in common_words:
-                                        common_words.add(word_lower)
-                                        file_words_count += 1
-                        
-                        if len(files_to_process) > 1:
-                            print(f"  从 {dict_file.name} 加载了 {file_words_count:,} 个新词")
-                    
-                    print(f"已加载总计 {len(common_words):,} 个常用词")
-                    if len(common_words) > 0:
-                        sample = sorted(list(common_words))[:10]
-                        print(f"  示例: {', '.join(sample)}")
-                    found = True
-                except Exception as e:
-                    print(f"无法加载 {dict_files[0]}: {e}")
+        # 从dicts目录加载：使用合并所有词典编译出的索引，词典有变化时先重建
+        index_file = index_path(DICT_DIR)
+        header = read_header(index_file)
+        if header is None or not is_fresh(DICT_DIR, header):
+            print(f"正在编译 {DICT_DIR} 中的词典为常用词索引...")
+            index_file, header = build_index(DICT_DIR)
+        if header is not None:
+            common_words, header = load_index(index_file)
+            sources = header['sources']
+            print(f"从常用词索引加载常用词: {len(common_words):,} 个")
+            print(f"  索引文件: {index_file}（构建于 {header['built']}）")
+            print(f"  词典文件: {', '.join(s['name'] for s in sources[:5])}")
+            if len(sources) > 5:
+                print(f"  ... 还有 {len(sources) - 5} 个文件")
+            found = True
         
         if not found:
             print(f"\n⚠️  未找到常用词词典文件")
@@ -329,8 +268,48 @@ def should_keep(word, freq, filter_options, common_words):
     return True
 
 
+def read_freq_entries(input_file, source=None):
+    """
+    逐个读取 (词条, 词频)：二进制词库按列读取，词库数据库按来源查询
+    （不指定 source 时合并所有来源），文本词库解析 词条\t词频
+    """
+    if is_store_path(input_file):
+        with DictStore(input_file) as store:
+            rows = store.entries(source=source)
+        for word, freq, _ in rows:
+            yield word, freq
+        return
+    if is_binary_dict(input_file):
+        with BinaryDict(input_file) as d:
+            yield from zip(d.words(), d.freqs)
+        return
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            
+            # 解析词条和词频（格式：词条\t词频）
+            parts = line.split('\t')
+            if len(parts) >= 2:
+                word = parts[0]
+                try:
+                    freq = int(parts[1])
+                except ValueError:
+                    freq = 1
+            else:
+                word = line
+                freq = 1
+            yield word, freq
+
+
 def filter_dict_with_freq(input_file, output_file, filter_options=None, common_words_dict=None):
-    """过滤带词频的词库文件"""
+    """
+    过滤带词频的词库文件
+
+    输入可以是二进制词库或词库数据库（filter_options['source'] 指定来源）；
+    输出扩展名为 .rdict 时写入二进制词库，为词库数据库时写入 filter_options['output_source'] 来源
+    """
     if filter_options is None:
         filter_options = {
             'min_freq': 10,  # 最小词频
@@ -346,7 +325,10 @@ def filter_dict_with_freq(input_file, output_file, filter_options=None, common_w
     # 如果需要过滤常用词，从外部词典文件加载
     if filter_options.get('filter_common_words', True) and common_words_dict is None:
         dict_file = filter_options.get('common_words_dict_file')
-        common_words_dict = load_common_words_from_file(dict_file)
+        if filter_options.get('compact_common_words'):
+            common_words_dict = load_compact_common_words(dict_file)
+        else:
+            common_words_dict = load_common_words_from_file(dict_file)
     elif common_words_dict is None:
         common_words_dict = set()
     
@@ -362,44 +344,27 @@ def filter_dict_with_freq(input_file, output_file, filter_options=None, common_w
         'english': 0,
     }
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # 解析词条和词频（格式：词条\t词频）
-            parts = line.split('\t')
-            if len(parts) >= 2:
-                word = parts[0]
-                try:
-                    freq = int(parts[1])
-                except ValueError:
-                    freq = 1
-            else:
-                word = line
-                freq = 1
-            
-            if should_keep(word, freq, filter_options, common_words_dict):
-                kept_words.append((word, freq))
-            else:
-                # 统计被过滤的类型
-                if filter_options.get('min_freq', 0) > 0 and freq < filter_options['min_freq']:
-                    filtered_count['low_freq'] += 1
-                elif is_single_char(word):
-                    filtered_count['single_char'] += 1
-                elif word in common_words_dict:
-                    filtered_count['common_words'] += 1
-                elif is_repeated_char(word):
-                    filtered_count['repeated'] += 1
-                elif is_interjection_repeat(word):
-                    filtered_count['interjection'] += 1
-                elif is_pure_number(word):
-                    filtered_count['numbers'] += 1
-                elif is_pure_punctuation(word):
-                    filtered_count['punctuation'] += 1
-                elif is_pure_english(word):
-                    filtered_count['english'] += 1
+    for word, freq in read_freq_entries(input_file, filter_options.get('source')):
+        if should_keep(word, freq, filter_options, common_words_dict):
+            kept_words.append((word, freq))
+        else:
+            # 统计被过滤的类型
+            if filter_options.get('min_freq', 0) > 0 and freq < filter_options['min_freq']:
+                filtered_count['low_freq'] += 1
+            elif is_single_char(word):
+                filtered_count['single_char'] += 1
+            elif word in common_words_dict:
+                filtered_count['common_words'] += 1
+            elif is_repeated_char(word):
+                filtered_count['repeated'] += 1
+            elif is_interjection_repeat(word):
+                filtered_count['interjection'] += 1
+            elif is_pure_number(word):
+                filtered_count['numbers'] += 1
+            elif is_pure_punctuation(word):
+                filtered_count['punctuation'] += 1
+            elif is_pure_english(word):
+                filtered_count['english'] += 1
     
     # 去重但保持原始顺序
     seen = set()
@@ -410,9 +375,15 @@ def filter_dict_with_freq(input_file, output_file, filter_options=None, common_w
             unique_words.append((word, freq))
     
     # 写入输出文件（带词频）
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for word, freq in unique_words:
-            f.write(f"{word}\t{freq}\n")
+    if is_store_path(output_file):
+        with DictStore(output_file) as store:
+            store.add_entries(filter_options.get('output_source') or 'filtered', unique_words, kind='filtered')
+    elif Path(output_file).suffix == BINARY_SUFFIX:
+        write_binary_dict(unique_words, output_file)
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for word, freq in unique_words:
+                f.write(f"{word}\t{freq}\n")
     
     # 如果输出文件在data目录，同时生成不带词频的版本
     output_path = Path(output_file)
@@ -509,10 +480,15 @@ def main():
         print("  --min-freq=N       最小词频（默认10，仅对带词频文件有效）")
         print("  --no-common        不过滤常用词汇")
         print("  --no-single        不过滤单字")
-        print("  --dict=FILE        指定常用词词典文件（默认: data/常用词词典.txt）")
+        print("  --dict=FILE        指定常用词词典文件（默认: data/常用词词典.txt，也可以是词库数据库或 .cwh 文件）")
+        print("  --compact          常用词使用内存映射的 .cwh 文件（见 common_words_hash.py），不在内存中保存 set")
+        print("  --source=NAME      输入为词库数据库时只读取该来源（默认合并所有来源）")
+        print("  --output-source=NAME  输出为词库数据库时写入的来源名称（默认 filtered）")
         print("\n示例:")
         print("  python3 filter_dict.py data/词库_带词频.txt data/词库_过滤.txt")
         print("  python3 filter_dict.py data/词库_带词频.txt --min-freq=10")
+        print("  python3 filter_dict.py data/词库.rdict data/词库_过滤.rdict   # 二进制格式（见 dict_binary.py）")
+        print("  python3 filter_dict.py data/dict.db data/dict.db --output-source=final   # 词库数据库（见 dict_store.py）")
         sys.exit(1)
     
     input_file = sys.argv[1]
@@ -524,24 +500,34 @@ def main():
     # 解析选项
     filter_common = '--no-common' not in sys.argv
     filter_single = '--no-single' not in sys.argv
+    compact = '--compact' in sys.argv
     min_freq = 10
     common_dict_file = None  # 外部常用词词典文件
+    source = None
+    output_source = None
     
     for arg in sys.argv:
         if arg.startswith('--min-freq='):
             min_freq = int(arg.split('=')[1])
         elif arg.startswith('--dict='):
             common_dict_file = arg.split('=', 1)[1]
-    
-    # 检查输入文件是否带词频（包含\t分隔符）
-    has_freq = False
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip()
-            if '\t' in first_line:
-                has_freq = True
-    except:
-        pass
+        elif arg.startswith('--source='):
+            source = arg.split('=', 1)[1]
+        elif arg.startswith('--output-source='):
+            output_source = arg.split('=', 1)[1]
+    
+    # 检查输入文件是否带词频（二进制词库、词库数据库，或包含\t分隔符）
+    is_binary = is_binary_dict(input_file)
+    is_store = is_store_path(input_file)
+    has_freq = is_binary or is_store
+    if not has_freq:
+        try:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                first_line = f.readline().strip()
+                if '\t' in first_line:
+                    has_freq = True
+        except:
+            pass
     
     if len(sys.argv) > 2 and not sys.argv[2].startswith('--'):
         output_file = sys.argv[2]
@@ -575,6 +561,9 @@ def main():
         'filter_punctuation': True,
         'filter_english': False,
         'common_words_dict_file': common_dict_file,
+        'compact_common_words': compact,
+        'source': source,
+        'output_source': output_source,
     }
     
     print(f"输入文件: {input_file}")
@@ -586,11 +575,21 @@ def main():
     common_words_dict = None
     if filter_common:
         print("正在从外部词典加载常用词...")
-        common_words_dict = load_common_words_from_file(common_dict_file)
+        if compact:
+            common_words_dict = load_compact_common_words(common_dict_file)
+        else:
+            common_words_dict = load_common_words_from_file(common_dict_file)
     
     # 统计原始词条数
-    with open(input_file, 'r', encoding='utf-8') as f:
-        original_count = sum(1 for line in f if line.strip())
+    if is_binary:
+        with BinaryDict(input_file) as d:
+            original_count = len(d)
+    elif is_store:
+        with DictStore(input_file) as store:
+            original_count = len(store.entries(source=source))
+    else:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            original_count = sum(1 for line in f if line.strip())
     
     # 执行过滤
     if has_freq:
@@ -614,7 +613,18 @@ def main():
     print(f"\n✅ 过滤完成! 文件已保存到: {output_file}")
     
     # 显示前20个保留的词条
-    if kept_count > 0:
+    if kept_count > 0 and is_store_path(output_file):
+        print("\n前20个保留的词条:")
+        with DictStore(output_file) as store:
+            rows = store.entries(source=output_source or 'filtered', limit=20)
+        for i, (word, freq, _) in enumerate(rows, 1):
+            print(f"  {i}. {word}\t{freq}")
+    elif kept_count > 0 and is_binary_dict(output_file):
+        print("\n前20个保留的词条:")
+        with BinaryDict(output_file) as d:
+            for i in range(min(20, len(d))):
+                print(f"  {i + 1}. {d.word(i)}\t{d.freqs[i]}")
+    elif kept_count > 0:
         print("\n前20个保留的词条:")
         with open(output_file, 'r', encoding='utf-8') as f:
             for i, line in enumerate(f, 1):
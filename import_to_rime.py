@@ -6,8 +6,12 @@
 """
 
 import sys
+from functools import lru_cache
 from pathlib import Path
 
+from dict_binary import BinaryDict, is_binary_dict
+from dict_store import DictStore, is_store_path
+
 try:
     from pypinyin import lazy_pinyin, Style
     PYPINYIN_AVAILABLE = True
@@ -15,21 +19,54 @@ except ImportError:
     PYPINYIN_AVAILABLE = False
 
 
+# 拼音缓存条目数：同一进程中连续导入多份词库（如 convert_batch.py）时，重复的词不再调用 pypinyin
+PINYIN_CACHE_SIZE = 500000
+
+
+@lru_cache(maxsize=PINYIN_CACHE_SIZE)
 def word_to_pinyin(word):
-    """将中文词转换为拼音"""
+    """将中文词转换为拼音（结果缓存）"""
     # 使用lazy_pinyin，不带声调
     pinyin_list = lazy_pinyin(word, style=Style.NORMAL)
     return ''.join(pinyin_list)
 
 
-def convert_to_rime_format(input_file, output_file=None, min_freq=1):
+def read_rime_entries(rime_file):
+    """读取已有的 Rime 词库文件，返回 {词条: (拼音, 词频)}（保持文件中的顺序）"""
+    entries = {}
+    with open(rime_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            if len(parts) >= 3:
+                entries[parts[0]] = (parts[1], parts[2])
+            elif len(parts) == 2:
+                entries[parts[0]] = (parts[1], '')
+    return entries
+
+
+def load_word_list(word_file):
+    """读取词条列表文件（每行一个词条，如 dict_diff.py 输出的 _removed.txt）"""
+    with open(word_file, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip() and not line.startswith('#')}
+
+
+def convert_to_rime_format(input_file, output_file=None, min_freq=1, source=None,
+                           merge=False, remove_words=None):
     """
     将搜狗词库转换为Rime格式
     
     Args:
-        input_file: 输入文件（词条列表，每行一个词）
+        input_file: 输入文件（词条列表，每行一个词；也可以是 dict_binary.py 的二进制词库
+                    或 dict_store.py 的词库数据库）
         output_file: 输出文件（默认为 ~/Library/Rime/custom_phrase.txt）
         min_freq: 最小词频（默认1）
+        source: 输入为词库数据库时只读取该来源（默认合并所有来源）
+        merge: 合并到已有的输出文件：只为新词条生成拼音，已有词条更新词频，其余保持不变
+               （配合 dict_diff.py 的 _delta.txt 只导入变化部分）
+        remove_words: 合并时从输出文件中删除的词条集合（如 dict_diff.py 的 _removed.txt）
     
     Raises:
         ImportError: 如果 pypinyin 未安装
@@ -58,29 +95,36 @@ def convert_to_rime_format(input_file, output_file=None, min_freq=1):
     words_with_freq = []
     has_freq = False
     
-    with open(input_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            # 检查是否包含制表符（带词频格式：词条\t词频）
-            if '\t' in line:
-                parts = line.split('\t', 1)
-                word = parts[0].strip()
-                if word:
-                    try:
-                        freq = int(parts[1].strip()) if len(parts) > 1 else 100
-                        words_with_freq.append((word, freq))
-                        has_freq = True
-                    except (ValueError, IndexError):
-                        # 如果词频解析失败，使用默认值
-                        words_with_freq.append((word, 100))
-            else:
-                # 不带词频格式：每行一个词
-            word = line.strip()
-            if word:
-                    words_with_freq.append((word, 100))
+    if is_store_path(input_path):
+        with DictStore(input_path) as store:
+            words_with_freq = [(word, freq) for word, freq, _ in store.entries(source=source)]
+        has_freq = True
+    elif is_binary_dict(input_path):
+        with BinaryDict(input_path) as d:
+            words_with_freq = list(zip(d.words(), d.freqs))
+        has_freq = True
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                # 检查是否包含制表符（带词频格式：词条\t词频）
+                if '\t' in line:
+                    parts = line.split('\t', 1)
+                    word = parts[0].strip()
+                    if word:
+                        try:
+                            freq = int(parts[1].strip()) if len(parts) > 1 else 100
+                            words_with_freq.append((word, freq))
+                            has_freq = True
+                        except (ValueError, IndexError):
+                            # 如果词频解析失败，使用默认值
+                            words_with_freq.append((word, 100))
+                else:
+                    # 不带词频格式：每行一个词
+                    words_with_freq.append((line, 100))
     
     if has_freq:
         print(f"读取到 {len(words_with_freq):,} 个词条（带词频）")
@@ -92,20 +136,40 @@ def convert_to_rime_format(input_file, output_file=None, min_freq=1):
     else:
         print(f"读取到 {len(words_with_freq):,} 个词条（不带词频，使用默认值100）")
     
+    # 合并模式：读取已有的输出文件，已有词条沿用原来的拼音
+    existing = {}
+    if merge and output_file.exists():
+        existing = read_rime_entries(output_file)
+        print(f"合并到已有词库: {len(existing):,} 个词条")
+    
     print("正在转换为Rime格式...")
     
     # 转换为Rime格式
-    rime_entries = []
+    updates = {}
     for i, (word, freq) in enumerate(words_with_freq, 1):
         if i % 1000 == 0:
             print(f"  处理进度: {i:,}/{len(words_with_freq):,}")
         
-        # 生成拼音
-        pinyin = word_to_pinyin(word)
+        # 生成拼音（合并模式下已有词条不重新生成）
+        pinyin = existing[word][0] if word in existing else word_to_pinyin(word)
         
         # Rime格式: 词条	拼音	词频
         # 使用实际词频值（如果文件包含词频）
-        rime_entries.append(f"{word}\t{pinyin}\t{freq}")
+        updates[word] = (pinyin, freq)
+    
+    if merge:
+        removed = 0
+        for word in remove_words or ():
+            if existing.pop(word, None) is not None:
+                removed += 1
+        added = sum(1 for word in updates if word not in existing)
+        # 已有词条原位更新，新词条追加在末尾
+        existing.update(updates)
+        merged = existing
+        print(f"  新增 {added:,} 个，更新 {len(updates) - added:,} 个，删除 {removed:,} 个")
+    else:
+        merged = updates
+    rime_entries = [f"{word}\t{pinyin}\t{freq}" for word, (pinyin, freq) in merged.items()]
     
     # 写入文件
     with open(output_file, 'w', encoding='utf-8') as f:
@@ -130,23 +194,45 @@ def main():
         print("安装命令: pip3 install pypinyin")
         sys.exit(1)
     
-    if len(sys.argv) < 2:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    source = None
+    merge = '--merge' in sys.argv
+    remove_file = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--source='):
+            source = arg.split('=', 1)[1]
+        elif arg.startswith('--remove='):
+            remove_file = arg.split('=', 1)[1]
+    
+    if not args:
         print("搜狗词库导入Rime工具")
         print("=" * 60)
-        print("用法: python3 import_to_rime.py <词库文件> [输出文件]")
+        print("用法: python3 import_to_rime.py <词库文件> [输出文件] [--source=NAME] [--merge [--remove=FILE]]")
+        print("\n选项:")
+        print("  --merge            合并到已有的输出文件（只为新词条生成拼音），而不是覆盖")
+        print("  --remove=FILE      合并时删除 FILE 中列出的词条（每行一个）")
         print("\n支持格式:")
         print("  - 带词频: 词条\\t词频 (推荐)")
         print("  - 不带词频: 每行一个词条")
+        print("  - 二进制词库: .rdict（见 dict_binary.py）")
+        print("  - 词库数据库: .db（见 dict_store.py，--source=NAME 指定来源，默认合并所有来源）")
         print("\n示例:")
         print("  python3 import_to_rime.py data/搜狗词库备份_2025_11_27_final_带词频.txt")
         print("  python3 import_to_rime.py data/搜狗词库备份_2025_11_27_final.txt")
         print("  python3 import_to_rime.py data/词库_final.txt ~/Library/Rime/custom_phrase.txt")
+        print("  python3 import_to_rime.py data/dict.db --source=final")
+        print("  python3 import_to_rime.py data/新备份_diff_delta.txt --merge --remove=data/新备份_diff_removed.txt")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    input_file = args[0]
+    output_file = args[1] if len(args) > 1 else None
+    
+    remove_words = load_word_list(remove_file) if remove_file else None
+    if remove_words and not merge:
+        print("错误: --remove 需要与 --merge 一起使用")
+        sys.exit(1)
     
-    convert_to_rime_format(input_file, output_file)
+    convert_to_rime_format(input_file, output_file, source=source, merge=merge, remove_words=remove_words)
 
 
 if __name__ == '__main__':
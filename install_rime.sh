@@ -413,7 +413,7 @@ install_ai_system() {
     
     # 复制 Lua 脚本
     print_info "复制 Lua 脚本..."
-    local lua_files=("ai_processor.lua" "ai_translator.lua" "ai_filter.lua")
+    local lua_files=("ai_processor.lua" "ai_translator.lua" "ai_filter.lua" "ai_buffer.lua" "ai_log.lua" "ai_commands.lua")
     for file in "${lua_files[@]}"; do
         local source_file="$RIME_AI_DIR/lua/$file"
         local target_file="$TARGET_LUA_DIR/$file"
@@ -428,7 +428,7 @@ install_ai_system() {
     
     # 复制 Python 脚本
     print_info "复制 Python 脚本..."
-    local python_files=("ai_streamer.py")
+    local python_files=("ai_streamer.py" "ai_daemon.py" "ai_metrics.py" "ai_sinks.py" "ai_history.py")
     for file in "${python_files[@]}"; do
         local source_file="$RIME_AI_DIR/$file"
         local target_file="$TARGET_RIME_DIR/$file"
@@ -562,6 +562,13 @@ EOF
         print_success ".env 文件已存在"
     fi
     
+    # 复制命令配置模板（如果不存在，避免覆盖用户的修改）
+    local profiles_file="$TARGET_RIME_DIR/ai_profiles.json"
+    if [ ! -f "$profiles_file" ] && [ -f "$RIME_AI_DIR/ai_profiles.json" ]; then
+        cp "$RIME_AI_DIR/ai_profiles.json" "$profiles_file"
+        print_success "已创建 ai_profiles.json（每个命令的模型、温度、max_tokens 配置）"
+    fi
+    
     print_success "AI 问答系统安装完成"
     print_info "下一步："
     echo "  1. 编辑 $env_file 设置 OPENAI_API_KEY 和 OPENAI_BASE_URL"
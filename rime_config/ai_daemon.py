@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+AI 常驻进程（streamer daemon）
+
+ai_processor.lua 通过收件箱目录投递请求（librime-lua 只能做文件读写，
+没有 socket），回车时不需要 fork 新进程。本进程轮询收件箱并处理：
+
+- prefetch：用户仍在输入时投递的部分查询。查询稳定 debounce_ms 后
+  开始"预取"请求，结果先缓存在内存中，不输入到屏幕
+- commit：用户按下回车。如果预取中的查询与之相同则直接沿用该请求
+  （已收到的内容立即输入，后续内容边收边输入），否则取消预取并重新请求
+- cancel：用户清空或离开了 AI 命令输入，取消预取
+
+commit 请求可带 sink 字段指定输出目标（如 candidate：写入候选词缓冲文件），
+不带时使用 AI_OUTPUT_SINK 配置。请求中的 session 字段标识 Rime 会话，
+history 为 true 的命令（如 chat:）按会话保存多轮对话（见 ai_history.py）。
+
+调度：
+- 回车的请求立即开始拉取（带对话历史的请求等前一轮输出完再开始），
+  但输出按回车顺序逐个进行，多个回答不会同时抢键盘
+- 与正在排队或输出中的请求完全相同（命令、查询、会话、输出目标）的回车直接合并，
+  不再请求 API，也不会重复输出（例如连按两次回车）
+- 发往 API 的请求受并发数（AI_MAX_CONCURRENCY）和令牌桶（AI_RATE_LIMIT 次/分钟，
+  最多积攒 AI_RATE_BURST 次）限制；收到 429 后指数退避，未输出任何内容时自动重试
+  （最多 AI_MAX_RETRIES 次）
+
+请求文件格式：每行一个 "键\\t值"，写入 .tmp 后 rename 为 .req，
+保证本进程不会读到写了一半的文件。
+
+存活检测：本进程持有单实例锁文件 LOCK_FILE，并每 HEARTBEAT_INTERVAL 秒
+把 "PID\\t时间戳" 写入其中（librime-lua 无法检查 flock 或进程是否存在）。
+Lua 端投递前读取该文件，心跳过期（例如本进程崩溃或被 SIGKILL，收件箱仍然留着）
+时不再投递，改为直接启动 ai_streamer.py，并重新拉起本进程。
+
+用法：
+    python3 ai_daemon.py            # 启动（已有实例在运行时直接退出）
+"""
+import os
+import sys
+import time
+import fcntl
+import shutil
+import queue
+import signal
+import threading
+from pathlib import Path
+
+from ai_history import HistoryStore
+from ai_metrics import RequestMetrics, StopFlag
+from ai_streamer import (
+    bootstrap_dependencies,
+    debug_log,
+    get_config_value,
+    get_profile,
+    format_user_prompt,
+    create_sink,
+    needs_esc_listener,
+    start_esc_listener,
+    write_stream,
+    stream_with_cache,
+    normalize_query,
+    KeyboardUnavailableError,
+)
+
+INBOX_DIR = Path("/tmp/rime_ai_inbox")
+LOCK_FILE = Path("/tmp/rime_ai_daemon.lock")
+POLL_INTERVAL = 0.01            # 收件箱轮询间隔（秒）
+IDLE_POLL_INTERVAL = 0.05       # 空闲时的轮询间隔（秒）
+IDLE_AFTER_SECONDS = 2.0        # 超过该时间没有请求（也没有等待防抖的预取）即视为空闲
+HEARTBEAT_INTERVAL = 1.0        # 心跳写入间隔（秒），Lua 端超过 3 秒未更新视为已退出
+DEFAULT_DEBOUNCE_MS = 300       # 查询稳定多久后开始预取
+STALE_REQUEST_SECONDS = 30      # 超过该时间的请求视为过期（例如常驻进程重启前留下的）
+DEFAULT_MAX_CONCURRENCY = 2     # 同时进行的 API 请求数
+DEFAULT_RATE_LIMIT = 30         # 每分钟最多发出的 API 请求数（0 表示不限制）
+DEFAULT_RATE_BURST = 5          # 令牌桶容量（短时间内最多连续发出的请求数）
+DEFAULT_MAX_RETRIES = 3         # 429 后的最大重试次数
+MAX_BACKOFF_SECONDS = 30.0
+
+
+def parse_request(text):
+    """解析请求文件内容（每行 "键\\t值"）"""
+    fields = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("\t")
+        if sep:
+            fields[key] = value
+    return fields
+
+
+def write_request(fields, inbox_dir=INBOX_DIR):
+    """投递一条请求（与 ai_processor.lua 的 write_request 相同格式，供脚本和调试使用）"""
+    inbox_dir = Path(inbox_dir)
+    name = f"{time.time_ns()}-{os.getpid()}"
+    tmp_path = inbox_dir / f"{name}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for key, value in fields.items():
+            f.write(f"{key}\t{value}\n")
+    os.rename(tmp_path, inbox_dir / f"{name}.req")
+
+
+def read_requests(inbox_dir=INBOX_DIR):
+    """按投递顺序读取并删除收件箱中的请求，过期请求直接丢弃"""
+    try:
+        entries = [e for e in os.scandir(inbox_dir) if e.name.endswith(".req")]
+    except FileNotFoundError:
+        return []
+    # 文件名以时间戳和序号开头，按文件名排序即投递顺序
+    entries.sort(key=lambda e: e.name)
+    now = time.time()
+    requests = []
+    for entry in entries:
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                text = f.read()
+            mtime = entry.stat().st_mtime
+            os.unlink(entry.path)
+        except OSError:
+            continue
+        if now - mtime > STALE_REQUEST_SECONDS:
+            continue
+        request = parse_request(text)
+        request["_dispatched_at"] = mtime  # 投递时间，用于计算 spawn_to_start
+        requests.append(request)
+    return requests
+
+
+class RateLimiter:
+    """
+    发往 API 的请求限流：并发数上限 + 令牌桶，收到 429 后指数退避（1s、2s、4s…），
+    退避期间不发出新请求，请求成功后退避时间清零；max_retries 为 429 后的最大重试次数
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, rate_per_min=DEFAULT_RATE_LIMIT,
+                 burst=DEFAULT_RATE_BURST, max_retries=DEFAULT_MAX_RETRIES, max_backoff=MAX_BACKOFF_SECONDS):
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.rate = rate_per_min / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.backoff = 0.0
+        self.backoff_until = 0.0
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+
+    def _wait_seconds(self):
+        """还需等待的时间；不需要等待时取走一个令牌并返回 0（调用方持有 self.lock）"""
+        now = time.monotonic()
+        if now < self.backoff_until:
+            return self.backoff_until - now
+        if self.rate <= 0:
+            return 0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self, cancelled):
+        """等待并发槽位和令牌，返回等待的秒数；等待期间 cancelled 被设置时返回 None"""
+        start = time.monotonic()
+        while not self.slots.acquire(timeout=0.05):
+            if cancelled.is_set():
+                return None
+        while True:
+            with self.lock:
+                wait = self._wait_seconds()
+            if wait <= 0:
+                return time.monotonic() - start
+            if cancelled.wait(min(wait, 0.5)):
+                self.slots.release()
+                return None
+
+    def release(self):
+        self.slots.release()
+
+    def report(self, status):
+        """请求结束后报告状态：http_429 时退避加倍，否则清零"""
+        with self.lock:
+            if status == "http_429":
+                self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else 1.0)
+                self.backoff_until = time.monotonic() + self.backoff
+            else:
+                self.backoff = 0.0
+
+
+def create_rate_limiter():
+    """根据 AI_MAX_CONCURRENCY / AI_RATE_LIMIT / AI_RATE_BURST / AI_MAX_RETRIES 配置创建限流器"""
+    try:
+        return RateLimiter(
+            int(get_config_value("AI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+            float(get_config_value("AI_RATE_LIMIT", DEFAULT_RATE_LIMIT)),
+            int(get_config_value("AI_RATE_BURST", DEFAULT_RATE_BURST)),
+            int(get_config_value("AI_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+        )
+    except ValueError:
+        return RateLimiter()
+
+
+class Speculation:
+    """一次预取请求：在后台线程中拉取 token 并缓存，提交时可被直接沿用"""
+
+    def __init__(self, cmd, query, debounce_ms=DEFAULT_DEBOUNCE_MS, history=None, limiter=None):
+        self.cmd = cmd
+        self.query = query
+        self.history = history
+        self.limiter = limiter
+        self.debounce = debounce_ms / 1000.0
+        self.updated = time.monotonic()
+        self.started = False
+        self.done = False
+        self.tokens = []
+        self.cancelled = threading.Event()
+        self.cond = threading.Condition()
+        self.metrics = None
+
+    def matches(self, cmd, query, history=None):
+        return (self.cmd == cmd and self.history is history
+                and normalize_query(self.query) == normalize_query(query))
+
+    def is_due(self):
+        return not self.started and time.monotonic() - self.updated >= self.debounce
+
+    def start(self, metrics=None):
+        self.started = True
+        self.metrics = metrics or self.metrics or RequestMetrics(self.cmd)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _stream_once(self, retry_on_429):
+        """拉取一次，返回 True 表示收到 429 且尚未输出任何内容，需要重试"""
+        for token in stream_with_cache(self.cmd, self.query, self.metrics, self.history):
+            if self.cancelled.is_set():
+                break
+            if (retry_on_429 and not self.tokens and token.startswith("ERROR:")
+                    and self.metrics.fields.get("status") == "http_429"):
+                return True
+            with self.cond:
+                self.tokens.append(token)
+                self.cond.notify_all()
+        return False
+
+    def _run(self):
+        try:
+            waited = 0.0
+            max_retries = self.limiter.max_retries if self.limiter is not None else 0
+            for attempt in range(max_retries + 1):
+                if self.limiter is not None:
+                    wait = self.limiter.acquire(self.cancelled)
+                    if wait is None:
+                        return
+                    waited += wait
+                    self.metrics.set(rate_limit_wait_ms=round(waited * 1000, 1), retries=attempt)
+                try:
+                    self.metrics.reset_request()
+                    retry = self._stream_once(attempt < max_retries)
+                finally:
+                    if self.limiter is not None:
+                        self.limiter.release()
+                        self.limiter.report(self.metrics.fields.get("status"))
+                if not retry:
+                    return
+                debug_log(f"Rate limited (429), retrying cmd={self.cmd} (attempt {attempt + 1})")
+        except Exception as e:
+            debug_log(f"ERROR in speculative stream: {e}")
+        finally:
+            with self.cond:
+                self.done = True
+                self.cond.notify_all()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def iter_tokens(self):
+        """先返回已缓存的 token，再边收边返回，直到请求结束"""
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.tokens) and not self.done:
+                    self.cond.wait()
+                if index >= len(self.tokens):
+                    return
+                batch = self.tokens[index:]
+                index = len(self.tokens)
+            yield from batch
+
+
+def write_heartbeat(lock):
+    """把 "PID\\t时间戳" 写入锁文件开头（一次 pwrite，长度不变，Lua 端不会读到半行）"""
+    os.pwrite(lock.fileno(), f"{os.getpid()}\t{int(time.time())}\n".encode(), 0)
+
+
+class Daemon:
+    def __init__(self, inbox_dir=INBOX_DIR, limiter=None, lock=None):
+        self.inbox_dir = Path(inbox_dir)
+        self.lock = lock            # 单实例锁文件，用于写入心跳
+        self.speculation = None
+        self.histories = HistoryStore()
+        self.limiter = limiter or create_rate_limiter()
+        self.jobs = queue.Queue()   # 等待输出的回车请求，由输出线程按顺序处理
+        self.inflight = {}          # 排队或输出中的请求：合并键 -> 请求 ID
+        self.inflight_lock = threading.Lock()
+        self.output_thread = None
+
+    def history_for(self, session, cmd):
+        """返回会话的对话历史，命令未开启 history 或没有会话 ID 时返回 None"""
+        profile = get_profile(cmd)
+        if not session or not profile.get("history"):
+            return None
+        self.histories.prune()
+        return self.histories.get(session, profile["history_tokens"], profile["history_idle_seconds"])
+
+    def record_turn(self, spec):
+        """完整结束（未被 ESC 停止、没有出错）的一轮写入对话历史"""
+        if spec.history is None or spec.metrics.fields.get("status") not in (None, "ok"):
+            return
+        answer = "".join(spec.tokens).replace("\r", "\n")
+        if not answer or answer.startswith("ERROR:"):
+            return
+        spec.history.add(format_user_prompt(get_profile(spec.cmd), spec.query), answer)
+
+    def cancel_speculation(self):
+        if self.speculation is not None:
+            self.speculation.cancel()
+            self.speculation = None
+
+    def handle(self, request):
+        op = request.get("op")
+        cmd = request.get("cmd", "")
+        query = request.get("query", "")
+        history = self.history_for(request.get("session"), cmd) if cmd else None
+        if op == "prefetch":
+            if self.speculation is not None and self.speculation.matches(cmd, query, history):
+                return
+            self.cancel_speculation()
+            try:
+                debounce_ms = int(request.get("debounce_ms", DEFAULT_DEBOUNCE_MS))
+            except ValueError:
+                debounce_ms = DEFAULT_DEBOUNCE_MS
+            self.speculation = Speculation(cmd, query, debounce_ms, history, self.limiter)
+        elif op == "cancel":
+            self.cancel_speculation()
+        elif op == "commit":
+            self.commit(request.get("id", ""), cmd, query, request.get("_dispatched_at"), request.get("sink"),
+                        history)
+        else:
+            debug_log(f"Unknown request op: {op}")
+
+    def commit(self, request_id, cmd, query, dispatched_at=None, sink_name=None, history=None):
+        key = (cmd, normalize_query(query), history, sink_name)
+        with self.inflight_lock:
+            duplicate_of = self.inflight.get(key)
+            if duplicate_of is None:
+                self.inflight[key] = request_id
+        if duplicate_of is not None:
+            debug_log(f"Commit {request_id}: identical to in-flight request {duplicate_of}, coalesced")
+            RequestMetrics(cmd, request_id, dispatched_at).finish("coalesced")
+            return
+
+        spec = self.speculation
+        self.speculation = None
+        if spec is not None and spec.matches(cmd, query, history):
+            debug_log(f"Commit {request_id}: adopting speculative request "
+                      f"({'started' if spec.started else 'not started'}, {len(spec.tokens)} tokens buffered)")
+            if not spec.started:
+                spec.start()
+            spec.metrics.adopt(request_id, dispatched_at)
+        else:
+            if spec is not None:
+                spec.cancel()
+            debug_log(f"Commit {request_id}: no matching speculation, starting cmd={cmd}, query={query}")
+            spec = Speculation(cmd, query, 0, history, self.limiter)
+            spec.metrics = RequestMetrics(cmd, request_id, dispatched_at)
+            # 与上下文无关的请求立即开始，和前面的输出并行拉取；
+            # 带对话历史的请求要等前一轮记入历史，轮到输出时再开始
+            if history is None:
+                spec.start()
+        self.jobs.put((request_id, spec, sink_name, key))
+
+    def output_loop(self):
+        """输出线程：按回车顺序逐个输出，同一时间只有一个回答在输入"""
+        while True:
+            request_id, spec, sink_name, key = self.jobs.get()
+            try:
+                self.deliver(request_id, spec, sink_name)
+            except KeyboardUnavailableError as e:
+                # 没有键盘权限时之后的回答也都无法输出：结束输出线程，主循环随之退出，
+                # Lua 端发现心跳停止后改为直接启动 ai_streamer.py
+                debug_log(f"ERROR delivering {request_id}: keyboard unavailable ({e}), stopping daemon")
+                spec.cancel()
+                spec.metrics.finish("error")
+                return
+            except Exception as e:
+                debug_log(f"ERROR delivering {request_id}: {e}")
+            finally:
+                with self.inflight_lock:
+                    self.inflight.pop(key, None)
+
+    def deliver(self, request_id, spec, sink_name):
+        if not spec.started:
+            spec.start()
+        sink = create_sink(sink_name, request_id, spec.cmd, spec.query)
+        stop_flag = StopFlag()
+        listener = start_esc_listener(stop_flag) if needs_esc_listener(sink) else None
+        try:
+            token_count = write_stream(spec.iter_tokens(), sink, stop_flag, spec.metrics)
+            debug_log(f"Commit {request_id}: stream completed, total tokens: {token_count}")
+            if not stop_flag.is_set():
+                self.record_turn(spec)
+            spec.metrics.finish("cancelled" if stop_flag.is_set() else None, stop_flag.set_at)
+        finally:
+            spec.cancel()
+            if listener is not None:
+                try:
+                    listener.stop()
+                except Exception as e:
+                    debug_log(f"ERROR stopping listener: {e}")
+
+    def run(self):
+        self.inbox_dir.mkdir(parents=True, exist_ok=True)
+        debug_log(f"Daemon started, PID: {os.getpid()}, inbox: {self.inbox_dir}")
+        self.output_thread = threading.Thread(target=self.output_loop, daemon=True)
+        self.output_thread.start()
+        last_heartbeat = 0.0
+        last_request = time.monotonic()
+        while True:
+            # 输出线程已结束（如键盘不可用）时退出，不再写心跳，避免请求在队列中无人输出
+            if not self.output_thread.is_alive():
+                debug_log("Output thread stopped, exiting")
+                sys.exit(1)
+            if self.lock is not None and time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                write_heartbeat(self.lock)
+                last_heartbeat = time.monotonic()
+            requests = read_requests(self.inbox_dir)
+            if requests:
+                last_request = time.monotonic()
+            for request in requests:
+                try:
+                    self.handle(request)
+                except Exception as e:
+                    debug_log(f"ERROR handling request {request}: {e}")
+            if self.speculation is not None and self.speculation.is_due():
+                debug_log(f"Prefetch: cmd={self.speculation.cmd}, query={self.speculation.query}")
+                self.speculation.start()
+            # 空闲时放慢轮询，减少唤醒次数；收到请求后恢复，等待防抖的预取也按快速间隔检查
+            idle = (time.monotonic() - last_request >= IDLE_AFTER_SECONDS
+                    and (self.speculation is None or self.speculation.started))
+            time.sleep(IDLE_POLL_INTERVAL if idle else POLL_INTERVAL)
+
+
+def acquire_lock(lock_file=LOCK_FILE):
+    """获取单实例锁，已有实例在运行时返回 None"""
+    # 不能用 "w" 打开：未拿到锁的进程也会清空正在运行的实例写入的心跳
+    f = os.fdopen(os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o644), "r+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    f.truncate(0)
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+def main():
+    lock = acquire_lock()
+    if lock is None:
+        print("ai_daemon is already running", file=sys.stderr)
+        sys.exit(0)
+    if not bootstrap_dependencies():
+        sys.exit(1)
+    # SIGTERM 也走正常退出流程，保证删除收件箱
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        Daemon(lock=lock).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        debug_log("Daemon exiting")
+        shutil.rmtree(INBOX_DIR, ignore_errors=True)
+        # 清空心跳，Lua 端立即改为直接启动，不必等心跳过期
+        lock.truncate(0)
+        lock.close()
+
+
+if __name__ == "__main__":
+    main()
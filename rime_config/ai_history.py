@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+多轮对话历史（chat: 等 history 为 true 的命令）
+
+由 ai_daemon.py 在内存中按会话（Rime 会话，即 ai_processor.lua 生成的 session id）保存，
+每次请求把历史轮次放在系统提示之后、当前问题之前发送：
+
+- 历史按 token 预算（profile 的 history_tokens）截断：超出预算时一次性丢弃最早的若干轮，
+  直到只剩一半预算。之后几轮只在末尾追加，请求前缀保持不变，可以命中服务端的前缀缓存
+  （OpenAI 对相同前缀自动缓存），而不是每轮都移动窗口导致前缀全部变化
+- 丢弃的轮次不额外调用 API 做总结，只把问题摘要成一条简短的系统消息，保留话题线索
+- 会话空闲超过 history_idle_seconds 后清空
+- 预取线程读取历史、输出线程记录新一轮可能同时发生，读写都加锁
+"""
+import threading
+import time
+from collections import deque
+
+DEFAULT_HISTORY_TOKENS = 2000
+DEFAULT_IDLE_SECONDS = 30 * 60
+SUMMARY_MAX_CHARS = 200      # 已丢弃轮次摘要的最大长度
+SUMMARY_QUESTION_CHARS = 30  # 摘要中每个问题保留的字数
+MESSAGE_OVERHEAD_TOKENS = 4  # 每条消息的格式开销（估算）
+# 保留的已丢弃问题数：每个问题连同分隔符至少占 1 个字，更早的问题不会出现在摘要中
+DROPPED_QUESTIONS_KEPT = SUMMARY_MAX_CHARS + 1
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩等字符按 1 个 token，其余按 4 个字符 1 个 token"""
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + (len(text) - wide + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationHistory:
+    """一个会话的对话历史"""
+
+    def __init__(self, max_tokens=DEFAULT_HISTORY_TOKENS, idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.max_tokens = max_tokens
+        self.idle_seconds = idle_seconds
+        self.turns = []          # [(问题, 回答, token 数)]
+        self.tokens = 0
+        self.dropped_questions = deque(maxlen=DROPPED_QUESTIONS_KEPT)
+        self.summary = ""
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def expire_if_idle(self):
+        with self.lock:
+            self._expire_if_idle()
+
+    def _expire_if_idle(self):
+        if self.turns and time.monotonic() - self.updated > self.idle_seconds:
+            self.clear()
+
+    def clear(self):
+        self.turns = []
+        self.tokens = 0
+        self.dropped_questions = deque(maxlen=DROPPED_QUESTIONS_KEPT)
+        self.summary = ""
+
+    def build_messages(self, system_prompt, user_content):
+        """系统提示 + 摘要 + 历史轮次 + 当前问题（前面部分在两次截断之间保持不变）"""
+        with self.lock:
+            self._expire_if_idle()
+            messages = [{"role": "system", "content": system_prompt}]
+            if self.summary:
+                messages.append({"role": "system", "content": self.summary})
+            for question, answer, _ in self.turns:
+                messages.append({"role": "user", "content": question})
+                messages.append({"role": "assistant", "content": answer})
+        messages.append({"role": "user", "content": user_content})
+        return messages
+
+    def add(self, question, answer):
+        """记录完整的一轮（question 为发送给 API 的用户消息内容）"""
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        with self.lock:
+            self.turns.append((question, answer, tokens))
+            self.tokens += tokens
+            self.updated = time.monotonic()
+            if self.tokens > self.max_tokens:
+                self._truncate()
+
+    def _truncate(self):
+        # 一次丢到预算的一半，之后几轮前缀保持稳定
+        target = self.max_tokens // 2
+        while self.turns and self.tokens > target:
+            question, _, tokens = self.turns.pop(0)
+            self.tokens -= tokens
+            self.dropped_questions.append(question[:SUMMARY_QUESTION_CHARS])
+        summary = "；".join(self.dropped_questions)
+        if len(summary) > SUMMARY_MAX_CHARS:
+            summary = "…" + summary[-SUMMARY_MAX_CHARS:]
+        self.summary = f"Earlier in this conversation the user asked about: {summary}"
+
+
+class HistoryStore:
+    """按会话保存对话历史"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def get(self, session, max_tokens=DEFAULT_HISTORY_TOKENS, idle_seconds=DEFAULT_IDLE_SECONDS):
+        history = self.sessions.get(session)
+        if history is None:
+            history = ConversationHistory(max_tokens, idle_seconds)
+            self.sessions[session] = history
+        history.max_tokens = max_tokens
+        history.idle_seconds = idle_seconds
+        return history
+
+    def prune(self):
+        """删除已空闲过期的会话"""
+        now = time.monotonic()
+        for session in [s for s, h in self.sessions.items() if now - h.updated > h.idle_seconds]:
+            del self.sessions[session]
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+AI 请求的结构化耗时指标
+
+每个请求结束后向 /tmp/rime_ai_metrics.jsonl（可用 AI_METRICS_FILE 修改）追加一行 JSON，文件超过
+MAX_METRICS_SIZE 时轮转（保留 METRICS_BACKUPS 个旧文件）。字段：
+
+- spawn_to_start_ms：Lua 端发起请求到 Python 开始处理
+- connect_ms：发出 HTTP 请求到收到响应头
+- ttfb_ms：发出 HTTP 请求到收到第一行响应体
+- ttft_ms：发出 HTTP 请求到收到第一个内容 token
+- first_typed_ms：开始处理到第一个字符输入到屏幕（用户感知的延迟）
+- tokens：收到的内容 chunk 数；chars：输入到屏幕的字符数
+- chars_per_sec：输入速度（第一个到最后一个字符之间）
+- cancel_latency_ms：按下 ESC 到停止输入
+- total_ms：开始处理到结束
+
+用法：
+    python3 ai_metrics.py                 # 最近 200 个请求的 p50/p95/p99
+    python3 ai_metrics.py 1000            # 最近 1000 个请求
+    python3 ai_metrics.py --by-profile    # 按命令配置分组
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+METRICS_FILE = os.environ.get("AI_METRICS_FILE", "/tmp/rime_ai_metrics.jsonl")
+MAX_METRICS_SIZE = 1024 * 1024  # 1MB
+METRICS_BACKUPS = 3
+
+SUMMARY_FIELDS = [
+    "spawn_to_start_ms",
+    "connect_ms",
+    "ttfb_ms",
+    "ttft_ms",
+    "first_typed_ms",
+    "total_ms",
+    "tokens",
+    "chars",
+    "chars_per_sec",
+    "cancel_latency_ms",
+]
+
+
+class StopFlag(threading.Event):
+    """记录被设置时间的停止标志，用于计算取消延迟"""
+
+    def __init__(self):
+        super().__init__()
+        self.set_at = None
+
+    def set(self):
+        if self.set_at is None:
+            self.set_at = time.monotonic()
+        super().set()
+
+
+def _ms(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start) * 1000, 1)
+
+
+# 每次发出 API 请求时重新打点的阶段（重试时清除）
+REQUEST_MARKS = ("request_sent", "headers", "first_byte", "first_token")
+
+
+class RequestMetrics:
+    """一次请求的耗时记录，各阶段调用 mark() 打点，结束时 finish() 写入指标文件"""
+
+    def __init__(self, cmd, request_id=None, dispatched_at=None):
+        """
+        Args:
+            cmd: 命令
+            request_id: 请求 ID（Lua 端生成）
+            dispatched_at: Lua 端发起请求的时间（time.time() 时间戳），用于计算 spawn_to_start
+        """
+        self.started = time.monotonic()
+        self.marks = {}
+        self.tokens = 0
+        self.chars = 0
+        self.fields = {
+            "request_id": request_id,
+            "cmd": cmd,
+            "spawn_to_start_ms": round((time.time() - dispatched_at) * 1000, 1) if dispatched_at else None,
+        }
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def mark(self, name):
+        """记录某个阶段第一次发生的时间"""
+        if name not in self.marks:
+            self.marks[name] = time.monotonic()
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def reset_request(self):
+        """重试前清除上一次 API 请求的打点和状态，耗时按重试的请求计算"""
+        for name in REQUEST_MARKS:
+            self.marks.pop(name, None)
+        self.fields["status"] = None
+
+    def adopt(self, request_id=None, dispatched_at=None):
+        """预取的请求被回车沿用：之后的"开始处理"时间以回车为准"""
+        self.started = time.monotonic()
+        self.fields.update({
+            "request_id": request_id,
+            "speculative": True,
+            "spawn_to_start_ms": round((time.time() - dispatched_at) * 1000, 1) if dispatched_at else None,
+        })
+
+    def finish(self, status=None, cancelled_at=None, path=METRICS_FILE):
+        """
+        计算各项指标并写入文件（只写一次）
+        status 为 None 时使用流式请求记录的状态（set(status=...)），默认 ok
+        """
+        with self._lock:
+            if self._finished:
+                return None
+            self._finished = True
+        now = time.monotonic()
+        m = self.marks
+        first_typed, last_typed = m.get("first_typed"), m.get("last_typed")
+        record = {"ts": time.strftime("%Y-%m-%d %H:%M:%S")}
+        record.update(self.fields)
+        record.update({
+            "status": status or self.fields.get("status") or "ok",
+            "connect_ms": _ms(m.get("request_sent"), m.get("headers")),
+            "ttfb_ms": _ms(m.get("request_sent"), m.get("first_byte")),
+            "ttft_ms": _ms(m.get("request_sent"), m.get("first_token")),
+            "first_typed_ms": _ms(self.started, first_typed),
+            "total_ms": _ms(self.started, now),
+            "tokens": self.tokens,
+            "chars": self.chars,
+            "chars_per_sec": (round(self.chars / (last_typed - first_typed), 1)
+                              if first_typed and last_typed and last_typed > first_typed else None),
+            "cancel_latency_ms": _ms(cancelled_at, m.get("stopped")) if cancelled_at else None,
+        })
+        write_record(record, path)
+        return record
+
+
+def _rotate(path):
+    for i in range(METRICS_BACKUPS - 1, 0, -1):
+        src = f"{path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def write_record(record, path=METRICS_FILE):
+    try:
+        if os.path.exists(path) and os.path.getsize(path) > MAX_METRICS_SIZE:
+            _rotate(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError:
+        pass  # 指标写入失败不影响正常输出
+
+
+def load_records(limit=200, path=METRICS_FILE):
+    """读取最近 limit 条记录（包括轮转出去的旧文件）"""
+    records = []
+    paths = [f"{path}.{i}" for i in range(METRICS_BACKUPS, 0, -1)] + [path]
+    for p in paths:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+    return records[-limit:] if limit else records
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数（sorted_values 需已排序）"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(records):
+    """返回 {字段: (样本数, p50, p95, p99)}"""
+    summary = {}
+    for field in SUMMARY_FIELDS:
+        values = sorted(r[field] for r in records if isinstance(r.get(field), (int, float)))
+        summary[field] = (len(values), percentile(values, 50), percentile(values, 95), percentile(values, 99))
+    return summary
+
+
+def print_summary(records, title="all"):
+    statuses = {}
+    for r in records:
+        statuses[r.get("status")] = statuses.get(r.get("status"), 0) + 1
+    cached = sum(1 for r in records if r.get("cached"))
+    print(f"[{title}] {len(records)} requests, cached: {cached}, "
+          f"status: {', '.join(f'{k}={v}' for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0])))}")
+    print(f"  {'metric':<20} {'n':>5} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for field, (n, p50, p95, p99) in summarize(records).items():
+        if n == 0:
+            continue
+        print(f"  {field:<20} {n:>5} {p50:>10} {p95:>10} {p99:>10}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    by_profile = "--by-profile" in argv
+    limit = 200
+    for arg in argv:
+        if arg.isdigit():
+            limit = int(arg)
+
+    records = load_records(limit)
+    if not records:
+        print(f"No metrics yet: {METRICS_FILE}")
+        return
+    if by_profile:
+        groups = {}
+        for r in records:
+            groups.setdefault((r.get("profile"), r.get("model")), []).append(r)
+        for (profile, model), group in sorted(groups.items(), key=lambda kv: str(kv[0])):
+            print_summary(group, f"{profile} / {model}")
+            print()
+    else:
+        print_summary(records)
+
+
+if __name__ == "__main__":
+    main()
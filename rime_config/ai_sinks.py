@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+AI 输出目标（sink）
+
+ai_streamer 把流式 token 交给一个 sink 输出，可选：
+
+- keyboard：用 pynput 逐个模拟按键输入（默认，与原来的行为一致）
+- paste：把 token 攒成片段，写入剪贴板后模拟一次粘贴，长回答不再逐字模拟按键
+- pipe：写入命名管道（FIFO）或 Unix socket，交给 Rime Lua 端或其他程序处理
+- candidate：写入候选词缓冲文件，由 ai_translator.lua 读取并显示为候选词
+- memory：保存在内存中（测试和基准测试使用）
+
+所有 sink 提供 write(text) / flush() / close() 三个方法。
+本模块不直接导入 pynput，需要键盘的 sink 由调用方传入键盘控制器。
+"""
+import os
+import sys
+import stat
+import time
+import socket
+import subprocess
+
+
+class OutputSink:
+    """输出目标基类"""
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class KeyboardSink(OutputSink):
+    """逐 token 模拟按键输入；输入失败时兜底写到 stdout"""
+
+    def __init__(self, keyboard, log=None):
+        self.keyboard = keyboard
+        self.log = log or (lambda msg: None)
+
+    def write(self, text):
+        try:
+            # 使用 pynput 直接输入字符，不占用剪贴板，不会激活输入法，支持中文
+            self.keyboard.type(text)
+        except Exception as e:
+            self.log(f"ERROR writing token '{text}': {type(e).__name__}: {e}")
+            # 最小失败兜底：直接打印到 stdout
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+
+def _clipboard_commands():
+    """返回当前平台的 (复制命令, 读取命令)"""
+    if sys.platform == "darwin":
+        return ["pbcopy"], ["pbpaste"]
+    if os.environ.get("WAYLAND_DISPLAY"):
+        return ["wl-copy"], ["wl-paste", "--no-newline"]
+    return ["xclip", "-selection", "clipboard"], ["xclip", "-selection", "clipboard", "-o"]
+
+
+class ClipboardPasteSink(OutputSink):
+    """
+    剪贴板粘贴输出
+
+    token 先攒在缓冲区，距上次粘贴超过 interval 秒或缓冲超过 max_chars 时，
+    写入剪贴板并模拟一次 Cmd+V / Ctrl+V。第一个 token 立即粘贴，不影响首字延迟。
+    关闭时恢复用户原来的剪贴板内容。
+    """
+
+    SETTLE_SECONDS = 0.05  # 粘贴后等待目标应用读取剪贴板，避免被下一段覆盖
+
+    def __init__(self, keyboard, paste_modifier, interval=0.15, max_chars=200, log=None):
+        """
+        Args:
+            keyboard: pynput 键盘控制器
+            paste_modifier: 粘贴组合键的修饰键（macOS 为 Key.cmd，其他平台为 Key.ctrl）
+        """
+        self.keyboard = keyboard
+        self.paste_modifier = paste_modifier
+        self.interval = interval
+        self.max_chars = max_chars
+        self.log = log or (lambda msg: None)
+        self.buffer = []
+        self.buffered_chars = 0
+        self.last_paste = 0.0
+        self.copy_cmd, self.read_cmd = _clipboard_commands()
+        self.saved_clipboard = self._read_clipboard()
+
+    def _read_clipboard(self):
+        try:
+            return subprocess.run(self.read_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  timeout=2).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _set_clipboard(self, data):
+        subprocess.run(self.copy_cmd, input=data, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, timeout=2, check=True)
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered_chars += len(text)
+        if self.buffered_chars >= self.max_chars or time.monotonic() - self.last_paste >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        # 粘贴不会触发"发送"，把逐字输入时替换成的 \r 还原为换行
+        text = "".join(self.buffer).replace("\r", "\n")
+        self.buffer = []
+        self.buffered_chars = 0
+        try:
+            self._set_clipboard(text.encode("utf-8"))
+            with self.keyboard.pressed(self.paste_modifier):
+                self.keyboard.press("v")
+                self.keyboard.release("v")
+            time.sleep(self.SETTLE_SECONDS)
+        except Exception as e:
+            self.log(f"ERROR pasting segment, falling back to typing: {type(e).__name__}: {e}")
+            self.keyboard.type(text)
+        self.last_paste = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self.saved_clipboard is not None:
+            try:
+                self._set_clipboard(self.saved_clipboard)
+            except Exception:
+                pass
+
+
+class PipeSink(OutputSink):
+    """
+    写入命名管道或 Unix socket
+
+    path 为 socket 时以流方式连接；为 FIFO 时以非阻塞方式打开写端，
+    没有读取方时立即抛出 OSError，而不是卡住。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+        self.fd = None
+        mode = os.stat(path).st_mode
+        if stat.S_ISSOCK(mode):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        elif stat.S_ISFIFO(mode):
+            self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            os.set_blocking(self.fd, True)
+        else:
+            raise OSError(f"{path} is neither a FIFO nor a Unix socket")
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        if self.sock is not None:
+            self.sock.sendall(data)
+        else:
+            while data:
+                written = os.write(self.fd, data)
+                data = data[written:]
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _escape_field(text):
+    """缓冲文件每行一个 "键\\t值"，值中的反斜杠、换行和制表符需要转义"""
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace("\t", "\\t")
+
+
+class CandidateBufferSink(OutputSink):
+    """
+    写入候选词缓冲文件
+
+    ai_translator.lua 在每次按键刷新时读取该文件，把当前的部分回答显示为候选词，
+    Lua 引擎不需要等待或 sleep。文件内容为 id / state / cmd / query / text 五行，
+    state 为 streaming（回答中）或 done（已结束）。每次更新都先写临时文件再 os.replace，
+    读取方不会读到写了一半的内容；更新频率限制为 interval 秒一次，关闭时写入最终状态。
+    """
+
+    def __init__(self, path, request_id="", cmd="", query="", interval=0.03):
+        self.path = path
+        self.header = [("id", request_id or ""), ("cmd", cmd or ""), ("query", query or "")]
+        self.interval = interval
+        self.parts = []
+        self.last_save = 0.0
+        self._save("streaming")
+
+    def _save(self, state):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fields = [("state", state)] + self.header + [("text", "".join(self.parts))]
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, value in fields:
+                f.write(f"{key}\t{_escape_field(value)}\n")
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
+
+    def write(self, text):
+        # 候选词上屏不会触发"发送"，把逐字输入时替换成的 \r 还原为换行
+        self.parts.append(text.replace("\r", "\n"))
+        if time.monotonic() - self.last_save >= self.interval:
+            self._save("streaming")
+
+    def flush(self):
+        self._save("streaming")
+
+    def close(self):
+        self._save("done")
+
+
+class MemorySink(OutputSink):
+    """保存到内存，用于测试"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def text(self):
+        return "".join(self.parts)
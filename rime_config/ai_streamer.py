@@ -3,21 +3,33 @@
 #!/usr/bin/env python3
 import sys
 import os
+import atexit
 import time
 import json
-import subprocess
+import hashlib
 import threading
+import unicodedata
+from collections import OrderedDict
 from pathlib import Path
 
-# 外部依赖列表：格式为 (包名, 导入语句, 描述)
+import ai_sinks
+from ai_metrics import RequestMetrics, StopFlag
+
+# 外部依赖列表：格式为 (包名, 模块名, 描述)
+# 依赖不在导入时加载，而是在真正用到时通过 require() 按需导入：
+# 缓存命中等不联网的路径不会加载 requests
 REQUIRED_PACKAGES = [
-    ("requests", "import requests", "HTTP library for API requests"),
-    ("pynput", "from pynput.keyboard import Controller as KeyboardController, Listener, Key", 
-     "Keyboard input library"),
+    ("requests", "requests", "HTTP library for API requests"),
+    ("pynput", "pynput.keyboard", "Keyboard input library"),
 ]
 
+# 依赖检查通过后写入的环境记录（解释器路径 + 包版本），之后的运行直接跳过检查
+ENV_STAMP_NAME = ".ai_streamer_env.json"
+
+
 def install_package(package_name):
     """安装指定的包"""
+    import subprocess
     try:
         python_exe = sys.executable
         print(f"Installing {package_name}...", file=sys.stderr)
@@ -43,41 +55,106 @@ def install_package(package_name):
         print(f"Unexpected error installing {package_name}: {e}", file=sys.stderr)
         return False
 
-def check_and_install_dependencies():
-    """检查并安装所有必需的依赖"""
-    global KeyboardController, Listener, Key  # 声明全局变量
+
+def get_env_stamp_path():
+    return get_rime_dir() / ENV_STAMP_NAME
+
+
+def read_env_stamp():
+    """读取环境记录，不存在或损坏时返回 None"""
+    try:
+        with open(get_env_stamp_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_env_stamp(versions):
+    stamp = {
+        "python": sys.executable,
+        "python_version": sys.version.split()[0],
+        "packages": versions,
+        "verified_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    try:
+        path = get_env_stamp_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(stamp, f, ensure_ascii=False, indent=2)
+    except OSError:
+        pass  # 写不进去只是下次再检查一遍
+
+
+def bootstrap_dependencies(force=False):
+    """
+    一次性检查并安装所有必需的依赖
+    
+    当前解释器已有环境记录时直接返回，不做任何检查；
+    否则只查找模块（不导入），缺失的用 pip 安装，全部就绪后写入环境记录。
+    
+    Returns:
+        bool: 依赖是否就绪
+    """
+    if not force:
+        stamp = read_env_stamp()
+        if stamp and stamp.get("python") == sys.executable:
+            return True
     
-    for package_name, import_stmt, description in REQUIRED_PACKAGES:
-        # 尝试导入
+    import importlib.util
+    from importlib import metadata
+    
+    versions = {}
+    for package_name, module_name, description in REQUIRED_PACKAGES:
+        if importlib.util.find_spec(package_name) is None:
+            # 找不到模块，尝试安装
+            print(f"{description} ({package_name}) not found, attempting to install...", file=sys.stderr)
+            if not install_package(package_name):
+                print(f"Error: Failed to install {package_name}.", file=sys.stderr)
+                print(f"Please install manually: pip3 install {package_name}", file=sys.stderr)
+                return False
+            importlib.invalidate_caches()
+            print(f"Successfully installed {package_name}", file=sys.stderr)
         try:
-            # 使用 globals() 确保导入到全局作用域
-            exec(import_stmt, globals())
-            continue  # 导入成功，继续下一个
-        except ImportError:
-            pass  # 导入失败，继续安装流程
-        
-        # 导入失败，尝试安装
-        print(f"{description} ({package_name}) not found, attempting to install...", file=sys.stderr)
-        if not install_package(package_name):
-            print(f"Error: Failed to install {package_name}.", file=sys.stderr)
-            print(f"Please install manually: pip3 install {package_name}", file=sys.stderr)
+            versions[package_name] = metadata.version(package_name)
+        except metadata.PackageNotFoundError:
+            versions[package_name] = None
+    
+    write_env_stamp(versions)
+    return True
+
+
+_loaded_modules = {}
+
+
+def require(package_name):
+    """
+    按需导入依赖模块
+    导入失败说明环境记录已过时（例如包被卸载），会重新检查安装一次，仍失败则退出。
+    """
+    module = _loaded_modules.get(package_name)
+    if module is not None:
+        return module
+    
+    import importlib
+    module_name = next(m for p, m, _ in REQUIRED_PACKAGES if p == package_name)
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        if not bootstrap_dependencies(force=True):
             sys.exit(1)
-        
-        # 安装后重新尝试导入
         try:
-            # 使用 globals() 确保导入到全局作用域
-            exec(import_stmt, globals())
-            print(f"Successfully installed and imported {package_name}", file=sys.stderr)
+            module = importlib.import_module(module_name)
         except ImportError as e:
             print(f"Error: {package_name} installed but import failed: {e}", file=sys.stderr)
             print("You may need to install additional dependencies manually.", file=sys.stderr)
             sys.exit(1)
+    _loaded_modules[package_name] = module
+    return module
 
-# 检查并安装所有依赖
-check_and_install_dependencies()
 
 # 用法：
 #   python3 ai_streamer.py <cmd> <query>
+#   python3 ai_streamer.py --profile-stats    # 按命令配置汇总耗时指标（同 ai_metrics.py --by-profile）
 #
 # 示例：
 #   python3 ai_streamer.py ai "台湾在哪里"
@@ -105,22 +182,30 @@ def load_env_file(env_path):
         pass  # 忽略读取错误
     return env_vars
 
+def get_rime_dir():
+    """获取 Rime 用户目录（.env、缓存等文件都放在这里）"""
+    home = os.getenv("HOME") or os.path.expanduser("~")
+    return Path(home) / "Library" / "Rime"
+
+
+_env_file_vars = None
+
+
+def get_config_value(key, default=None):
+    """读取配置项（优先从环境变量，其次从 .env 文件）"""
+    global _env_file_vars
+    value = os.getenv(key)
+    if value:
+        return value
+    if _env_file_vars is None:
+        _env_file_vars = load_env_file(get_rime_dir() / ".env")
+    return _env_file_vars.get(key) or default
+
+
 def get_api_config():
     """获取 API 配置（优先从环境变量，其次从 .env 文件）"""
-    # 先尝试从环境变量读取
-    api_key = os.getenv("OPENAI_API_KEY")
-    base_url = os.getenv("OPENAI_BASE_URL")
-    
-    # 如果环境变量中没有，尝试从 .env 文件读取
-    if not api_key or not base_url:
-        home = os.getenv("HOME") or os.path.expanduser("~")
-        env_path = Path(home) / "Library" / "Rime" / ".env"
-        env_vars = load_env_file(env_path)
-        
-        if not api_key and "OPENAI_API_KEY" in env_vars:
-            api_key = env_vars["OPENAI_API_KEY"]
-        if not base_url and "OPENAI_BASE_URL" in env_vars:
-            base_url = env_vars["OPENAI_BASE_URL"]
+    api_key = get_config_value("OPENAI_API_KEY")
+    base_url = get_config_value("OPENAI_BASE_URL")
     
     # 设置默认值
     if not base_url:
@@ -134,56 +219,381 @@ def get_api_config():
     
     return api_key, base_url
 
-def stream_openai_like(cmd, query):
+
+# ================================
+# 命令配置（profile）
+# ================================
+
+# 每个命令对应的模型和提示参数，可被 ~/Library/Rime/ai_profiles.json 覆盖
+# （与 .env 放在同一目录，也可用 AI_PROFILES_FILE 指定路径）。
+# 文件中每个命令只需写要修改的字段，其余字段沿用 "default"。
+# prompt 为用户提示模板，{query} 为用户输入；max_query_chars 限制输入长度（null 表示不限制）
+# history 为 true 时常驻进程按会话保存多轮对话（见 ai_history.py），
+# history_tokens 为历史的 token 预算，history_idle_seconds 为会话空闲多久后清空
+DEFAULT_PROFILES = {
+    "default": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.2,
+        "max_tokens": None,
+        "system_prompt": "you are a helpful assistant, answer in concise and clear manner, with no more than 100 words.",
+        "prompt": "{query}",
+        "max_query_chars": None,
+        "history": False,
+        "history_tokens": 2000,
+        "history_idle_seconds": 1800,
+    },
+    "chat": {
+        "history": True,
+    },
+    "translate": {
+        "temperature": 0,
+        "max_tokens": 256,
+        "system_prompt": "You are a translator. Translate Chinese into English and any other language into Chinese. Output only the translation.",
+        "prompt": "【翻译】{query}",
+    },
+    "sum": {
+        "prompt": "【总结】{query}",
+        "max_query_chars": 2000,
+    },
+    "code": {
+        "system_prompt": "You are a programming assistant. Reply with a short, working code example and minimal explanation.",
+        "prompt": "{query}",
+    },
+}
+
+# 命令别名（Lua 端把 tr: 映射为 translate）
+PROFILE_ALIASES = {"tr": "translate"}
+
+PROFILES_FILE_NAME = "ai_profiles.json"
+
+_profiles = None
+
+
+def load_profiles():
+    """加载命令配置（只在首次调用时读取文件），返回 {命令: 完整配置}"""
+    global _profiles
+    if _profiles is not None:
+        return _profiles
+    
+    overrides = {}
+    path = Path(get_config_value("AI_PROFILES_FILE") or get_rime_dir() / PROFILES_FILE_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise ValueError("top level must be an object")
+    except FileNotFoundError:
+        overrides = {}
+    except (OSError, ValueError) as e:
+        print(f"WARNING: ignoring invalid profile file {path}: {e}", file=sys.stderr)
+        overrides = {}
+    
+    default = dict(DEFAULT_PROFILES["default"])
+    default.update(overrides.get("default", {}))
+    profiles = {"default": default}
+    for name in set(DEFAULT_PROFILES) | set(overrides):
+        if name == "default":
+            continue
+        profile = dict(default)
+        profile.update(DEFAULT_PROFILES.get(name, {}))
+        profile.update(overrides.get(name, {}))
+        profiles[name] = profile
+    _profiles = profiles
+    return profiles
+
+
+def get_profile(cmd):
+    """获取命令对应的配置，未配置的命令使用 default"""
+    profiles = load_profiles()
+    name = PROFILE_ALIASES.get(cmd, cmd)
+    return profiles.get(name, profiles["default"])
+
+
+def format_user_prompt(profile, query):
+    """按命令配置的模板生成用户消息内容"""
+    max_chars = profile.get("max_query_chars")
+    if max_chars:
+        query = query[:max_chars]
+    return profile["prompt"].format(query=query)
+
+
+def build_messages(profile, query, history=None):
+    """根据命令配置构建请求消息，传入 history（ConversationHistory）时带上之前的对话"""
+    user_content = format_user_prompt(profile, query)
+    if history is not None:
+        return history.build_messages(profile["system_prompt"], user_content)
+    return [
+        {"role": "system", "content": profile["system_prompt"]},
+        {"role": "user", "content": user_content},
+    ]
+
+
+# ================================
+# 响应缓存
+# ================================
+
+# 只缓存结果与上下文无关的命令（chat: 等对话类命令不缓存）
+CACHEABLE_COMMANDS = {"ai", "tr", "translate"}
+DEFAULT_CACHE_TTL = 7 * 24 * 3600  # 缓存有效期（秒）
+DEFAULT_CACHE_SIZE = 500           # 最多缓存的条目数
+
+
+def normalize_query(query):
+    """规范化查询：统一全角/半角并折叠空白，使等价的输入命中同一条缓存"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def make_cache_key(cmd, query, model, prompt_template, temperature):
+    """由 (命令, 规范化查询, 模型, 提示模板, 温度) 生成缓存键"""
+    if cmd == "tr":
+        cmd = "translate"
+    raw = json.dumps([cmd, normalize_query(query), model, prompt_template, temperature],
+                     ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    持久化到磁盘的 AI 响应缓存
+    
+    - 条目超过 ttl 秒即失效
+    - 条目数超过 max_entries 时按最近最少使用（LRU，按条目的 used 时间）淘汰
+    - 命中只在内存中记录使用时间，不写文件；记录的使用时间随下一次 put 写入，
+      进程退出时（flush）再写入一次，文件被其他进程更新后重新读取时也会合并进去
+    - 写入时用临时文件 + os.replace 原子替换，多个进程并发写入时
+      最后写入者生效，不会产生损坏的缓存文件
+    """
+    
+    def __init__(self, path, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_SIZE):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = None  # OrderedDict: key -> {"text", "created", "used"}，按 used 排序，末尾为最近使用
+        self._hits = {}       # 尚未写入文件的命中：key -> 使用时间
+        self._stamp = None    # 读取或写入时文件的 (mtime_ns, size)，用于发现其他进程的更新
+        self._lock = threading.Lock()  # 常驻进程中多个请求线程共用同一个缓存
+    
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def _load(self):
+        stamp = self._file_stamp()
+        if self._entries is not None and stamp == self._stamp:
+            return self._entries
+        items = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data.get("entries", []):
+                created = item["created"]
+                items.append((item["key"], {"text": item["text"], "created": created,
+                                            "used": item.get("used", created)}))
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError, OSError):
+            items = []  # 缓存损坏时直接丢弃
+        # 合并本进程尚未写入的命中
+        for key, entry in items:
+            used = self._hits.get(key)
+            if used is not None and used > entry["used"]:
+                entry["used"] = used
+        items.sort(key=lambda item: item[1]["used"])
+        self._entries = OrderedDict(items)
+        self._stamp = stamp
+        return self._entries
+    
+    def _save(self):
+        # 直接写内存中的条目（调用方已 _load），不在写入前重新读取而丢掉刚写入的条目
+        entries = self._entries if self._entries is not None else self._load()
+        data = {
+            "version": 1,
+            "entries": [{"key": k, **v} for k, v in entries.items()],
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._stamp = self._file_stamp()
+            self._hits.clear()
+        except OSError:
+            pass  # 缓存写入失败不影响正常输出
+    
+    def get(self, key):
+        """返回缓存的答案文本，未命中或已过期返回 None（过期条目在下一次 put 时从文件中删除）"""
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry["created"] > self.ttl:
+                del entries[key]
+                return None
+            entry["used"] = now
+            entries.move_to_end(key)
+            self._hits[key] = now
+            return entry["text"]
+    
+    def put(self, key, text):
+        """写入缓存（连同之前命中的使用时间），超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            entries[key] = {"text": text, "created": now, "used": now}
+            entries.move_to_end(key)
+            # 顺带清理过期条目
+            for k in [k for k, v in entries.items() if now - v["created"] > self.ttl]:
+                del entries[k]
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._save()
+    
+    def flush(self):
+        """把尚未写入的命中时间写入文件（没有命中时不写）"""
+        with self._lock:
+            if self._hits:
+                self._save()
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """
+    根据配置返回本进程共用的响应缓存（只创建一次，常驻进程的访问顺序保存在内存中，
+    退出时写入命中时间），AI_CACHE=0 时禁用（返回 None）
+    """
+    global _response_cache
+    if get_config_value("AI_CACHE", "1") in ("0", "false", "off", "no"):
+        return None
+    try:
+        ttl = float(get_config_value("AI_CACHE_TTL", DEFAULT_CACHE_TTL))
+        max_entries = int(get_config_value("AI_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    except ValueError:
+        ttl, max_entries = DEFAULT_CACHE_TTL, DEFAULT_CACHE_SIZE
+    path = get_rime_dir() / "ai_cache.json"
+    cache = _response_cache
+    if cache is None or (cache.path, cache.ttl, cache.max_entries) != (path, ttl, max_entries):
+        if cache is not None:
+            cache.flush()
+        cache = _response_cache = ResponseCache(path, ttl=ttl, max_entries=max_entries)
+        atexit.register(cache.flush)
+    return cache
+
+
+def stream_with_cache(cmd, query, metrics=None, history=None):
+    """
+    带响应缓存的流式输出
+    命中缓存时直接回放缓存的答案（不发起任何网络请求），
+    未命中时透传 stream_openai_like 的输出，完整结束后写入缓存。
+    带对话历史的请求与上下文有关，不使用缓存。
+    """
+    cache = get_response_cache() if cmd in CACHEABLE_COMMANDS and history is None else None
+    if cache is None:
+        yield from stream_openai_like(cmd, query, metrics, history)
+        return
+    
+    profile = get_profile(cmd)
+    key = make_cache_key(cmd, query, profile["model"],
+                         profile["system_prompt"] + "\n" + profile["prompt"],
+                         profile["temperature"])
+    cached = cache.get(key)
+    if cached is not None:
+        if metrics is not None:
+            metrics.set(profile=PROFILE_ALIASES.get(cmd, cmd), model=profile["model"], cached=True)
+        yield from cached
+        return
+    
+    parts = []
+    failed = False
+    for token in stream_openai_like(cmd, query, metrics):
+        if len(token) > 1 and token.startswith("ERROR:"):
+            failed = True
+        parts.append(token)
+        yield token
+    # 被中途停止（ESC）时生成器在 yield 处关闭，不会走到这里，因此只缓存完整答案
+    if parts and not failed:
+        cache.put(key, "".join(parts))
+
+
+def error_message(resp):
+    """
+    从非 200 响应中取出错误信息；响应体不是 JSON（如代理返回的 HTML 错误页）时
+    使用响应文本，不抛出异常（否则状态会被改写为 error，429 不会退避重试）
+    """
+    try:
+        error = resp.json().get("error", {})
+        message = error.get("message") if isinstance(error, dict) else error
+        if message:
+            return str(message)
+    except (ValueError, AttributeError):
+        pass
+    try:
+        text = " ".join(resp.text.split())
+    except Exception:
+        text = ""
+    return text[:200] or f"HTTP {resp.status_code}"
+
+
+def stream_openai_like(cmd, query, metrics=None, history=None):
     """
     调用 OpenAI API 进行流式输出
     要求：yield 出"最小 token 粒度"的 unicode 字符串。
+    传入 metrics（RequestMetrics）时记录连接、首字节、首 token 等耗时；
+    传入 history（ConversationHistory）时把之前的对话一起发送。
     """
+    if metrics is None:
+        metrics = RequestMetrics(cmd)  # 不写入文件，只是免去下面的判空
     API_KEY, BASE_URL = get_api_config()
     
     if not API_KEY:
         yield "ERROR: OPENAI_API_KEY not set"
         return
     
-    # 根据命令类型构建不同的提示
-    system_prompt = "you are a helpful assistant, answer in concise and clear manner, with no more than 100 words."
-    user_prompt = query
-    
-    if cmd == "translate" or cmd == "tr":
-        user_prompt = f"【翻译】{query}"
-    elif cmd == "sum":
-        user_prompt = f"【总结】{query[:200]}..."
-    elif cmd == "code":
-        user_prompt = f"# 代码示例\n# {query}\nprint('hello')"
+    # 根据命令类型选择模型和提示
+    profile = get_profile(cmd)
+    payload = {
+        "model": profile["model"],
+        "messages": build_messages(profile, query, history),
+        "temperature": profile["temperature"],
+        "stream": True,
+    }
+    if profile.get("max_tokens"):
+        payload["max_tokens"] = profile["max_tokens"]
+    metrics.set(profile=PROFILE_ALIASES.get(cmd, cmd), model=profile["model"], cached=False)
+    if history is not None:
+        metrics.set(history_turns=len(history.turns))
     
     try:
+        requests = require("requests")
+        metrics.mark("request_sent")
         resp = requests.post(
             f"{BASE_URL}/chat/completions",
             headers={
                 "Authorization": f"Bearer {API_KEY}",
                 "Content-Type": "application/json",
             },
-            json={
-                "model": "gpt-4o-mini",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.2,
-                "stream": True
-            },
+            json=payload,
             timeout=60,
             stream=True
         )
+        metrics.mark("headers")
         
         if resp.status_code != 200:
-            error_msg = resp.json().get("error", {}).get("message", "Unknown error")
-            yield f"ERROR: {error_msg}"
+            metrics.set(status=f"http_{resp.status_code}")
+            yield f"ERROR: {error_message(resp)}"
             return
         
         # 流式读取响应
         for line in resp.iter_lines():
             if line:
+                metrics.mark("first_byte")
                 line_str = line.decode('utf-8')
                 if line_str.startswith('data: '):
                     data_str = line_str[6:]  # 移除 'data: ' 前缀
@@ -195,6 +605,8 @@ def stream_openai_like(cmd, query):
                             delta = data['choices'][0].get('delta', {})
                             content = delta.get('content', '')
                             if content:
+                                metrics.mark("first_token")
+                                metrics.tokens += 1
                                 # 逐字符 yield，实现真正的流式输出
                                 # 将换行符（\n）替换为回车符（\r），避免在聊天窗口中触发"发送"
                                 for ch in content:
@@ -205,51 +617,38 @@ def stream_openai_like(cmd, query):
                     except json.JSONDecodeError:
                         continue
     except Exception as e:
+        metrics.set(status="error")
         yield f"ERROR: {str(e)}"
 
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 ai_streamer.py <cmd> <query>", file=sys.stderr)
-        sys.exit(1)
+# 日志文件用于调试 - 输出到 rime_ai.log 方便查看
+LOG_FILE = "/tmp/rime_ai.log"
 
-    cmd = sys.argv[1]
-    query = sys.argv[2]
 
-    # 日志文件用于调试 - 输出到 rime_ai.log 方便查看
-    log_file = "/tmp/rime_ai.log"
-    
-    def debug_log(msg):
-        try:
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(f"[AI_STREAMER][{time.strftime('%H:%M:%S')}] {msg}\n")
-            # 同时输出到 stderr，确保能看到
-            print(f"[AI_STREAMER] {msg}", file=sys.stderr)
-        except Exception:
-            pass
+def debug_log(msg):
+    try:
+        with open(LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(f"[AI_STREAMER][{time.strftime('%H:%M:%S')}] {msg}\n")
+        # 同时输出到 stderr，确保能看到
+        print(f"[AI_STREAMER] {msg}", file=sys.stderr)
+    except Exception:
+        pass
 
-    debug_log(f"Starting: cmd={cmd}, query={query}")
 
-    # 全局停止标志
-    stop_flag = threading.Event()
-    paused = False
+class KeyboardUnavailableError(RuntimeError):
+    """键盘控制器无法创建（通常是缺少辅助功能权限）"""
+
 
-    # 初始化键盘控制器（在监听器之前创建，以便共享使用）
+def create_keyboard():
+    """初始化键盘控制器，权限不足时打印提示并抛出 KeyboardUnavailableError"""
     try:
-        keyboard = KeyboardController()
+        keyboard = require("pynput").Controller()
         # 为了兼容性，如果 Controller 没有 write 方法，添加一个别名
         if not hasattr(keyboard, 'write'):
             keyboard.write = keyboard.type
             debug_log("Added write() alias to keyboard controller")
         debug_log("Keyboard controller initialized")
-        
-        # 测试权限：尝试输入一个测试字符（但不实际输入）
-        # 如果权限不足，这里会抛出异常或警告
-        try:
-            # 不实际输入，只是检查权限
-            debug_log("Testing accessibility permissions...")
-        except Exception as perm_error:
-            debug_log(f"WARNING: Possible permission issue: {perm_error}")
+        return keyboard
     except Exception as e:
         error_msg = str(e)
         debug_log(f"ERROR: Failed to initialize keyboard: {e}")
@@ -265,68 +664,164 @@ def main():
         print("", file=sys.stderr)
         print(f"Original error: {error_msg}", file=sys.stderr)
         print("=" * 60, file=sys.stderr)
-        sys.exit(1)
+        raise KeyboardUnavailableError(error_msg) from e
+
+
+# 输出目标：keyboard（逐字模拟按键）/ paste（剪贴板分段粘贴）/ pipe（命名管道或 socket）/
+# candidate（写入候选词缓冲文件，与 ai_buffer.lua 的 PATH 一致）/ memory
+DEFAULT_OUTPUT_SINK = "keyboard"
+DEFAULT_OUTPUT_PIPE = "/tmp/rime_ai_output"
+CANDIDATE_BUFFER_FILE = "/tmp/rime_ai_answer"
+PAUSED_TEXT = "已暂停"
+
+
+def create_sink(name=None, request_id=None, cmd=None, query=None):
+    """
+    创建输出目标，name 为 None 时使用 AI_OUTPUT_SINK 配置，pipe 不可用时退回键盘输入
+    request_id / cmd / query 写入候选词缓冲文件，供 Lua 端判断回答属于哪次请求
+    """
+    name = name or get_config_value("AI_OUTPUT_SINK", DEFAULT_OUTPUT_SINK)
+    if name == "memory":
+        return ai_sinks.MemorySink()
+    if name == "candidate":
+        return ai_sinks.CandidateBufferSink(CANDIDATE_BUFFER_FILE, request_id, cmd, query)
+    if name == "pipe":
+        path = get_config_value("AI_OUTPUT_PIPE", DEFAULT_OUTPUT_PIPE)
+        try:
+            return ai_sinks.PipeSink(path)
+        except OSError as e:
+            debug_log(f"Output pipe {path} unavailable ({e}), falling back to keyboard")
+    if name == "paste":
+        pynput_keyboard = require("pynput")
+        modifier = pynput_keyboard.Key.cmd if sys.platform == "darwin" else pynput_keyboard.Key.ctrl
+        try:
+            interval = float(get_config_value("AI_PASTE_INTERVAL", 0.15))
+        except ValueError:
+            interval = 0.15
+        return ai_sinks.ClipboardPasteSink(create_keyboard(), modifier, interval=interval, log=debug_log)
+    return ai_sinks.KeyboardSink(create_keyboard(), log=debug_log)
+
+
+def needs_esc_listener(sink):
+    """只有模拟键盘输出时才需要监听 ESC（也只有这时才有辅助功能权限）"""
+    return isinstance(sink, (ai_sinks.KeyboardSink, ai_sinks.ClipboardPasteSink))
+
+
+def start_esc_listener(stop_flag):
+    """启动 ESC 键监听器（后台线程），按下 ESC 时设置 stop_flag"""
+    pynput_keyboard = require("pynput")
 
-    # ESC 键监听器
     def on_press(key):
-        nonlocal paused
         try:
-            if key == Key.esc:
-                if not paused:
-                    paused = True
-                    stop_flag.set()
-                    # 追加"已暂停"
-                    keyboard.type("已暂停")
+            if key == pynput_keyboard.Key.esc:
+                stop_flag.set()
         except Exception:
             pass
 
-    # 启动键盘监听器（在后台线程）
-    listener = Listener(on_press=on_press)
+    listener = pynput_keyboard.Listener(on_press=on_press)
     listener.start()
+    return listener
 
-    # 记录进程信息
-    debug_log(f"Process PID: {os.getpid()}")
-    debug_log(f"Current working directory: {os.getcwd()}")
 
-    # 流式获取并输入字符
+def write_stream(tokens, sink, stop_flag, metrics=None):
+    """把 token 流逐个写入输出目标，返回已写入的 token 数；被 ESC 停止时追加 PAUSED_TEXT"""
     token_count = 0
     try:
-        debug_log("Starting stream...")
-        for token in stream_openai_like(cmd, query):
+        for token in tokens:
             # 检查停止标志
             if stop_flag.is_set():
                 debug_log("Stop flag set, breaking")
+                if metrics is not None:
+                    metrics.mark("stopped")
+                sink.write(PAUSED_TEXT)
                 break
-            try:
-                # 真·逐 token 输入
-                # 使用 pynput 直接输入字符，不占用剪贴板，不会激活输入法，支持中文
-                # 使用 type() 方法，它更可靠
-                keyboard.type(token)
-                token_count += 1
-                # 每5个字符记录一次（更频繁的日志，方便调试）
-                if token_count % 5 == 0:
-                    debug_log(f"Written {token_count} tokens (last: '{token}')")
-            except Exception as e:
-                debug_log(f"ERROR writing token '{token}': {e}")
-                debug_log(f"Exception type: {type(e).__name__}, message: {str(e)}")
-                import traceback
-                debug_log(f"Traceback: {traceback.format_exc()}")
-                # 最小失败兜底：直接打印到 stdout
-                sys.stdout.write(token)
-                sys.stdout.flush()
+            sink.write(token)
+            token_count += 1
+            if metrics is not None:
+                metrics.mark("first_typed")
+                metrics.marks["last_typed"] = time.monotonic()
+                metrics.chars += len(token)
+            # 每5个字符记录一次（更频繁的日志，方便调试）
+            if token_count % 5 == 0:
+                debug_log(f"Written {token_count} tokens (last: '{token}')")
+    finally:
+        sink.close()
+    return token_count
+
+
+def read_spawn_marker():
+    """
+    读取 Lua 端在启动本进程前创建的标记文件（AI_SPAWN_MARKER），
+    其修改时间即发起请求的时间（Lua 只有秒级时钟，所以借助文件时间戳）
+    """
+    marker = os.environ.get("AI_SPAWN_MARKER")
+    if not marker:
+        return None
+    try:
+        dispatched_at = os.stat(marker).st_mtime
+        os.unlink(marker)
+        return dispatched_at
+    except OSError:
+        return None
+
+
+def main():
+    if len(sys.argv) == 2 and sys.argv[1] == "--profile-stats":
+        import ai_metrics
+        ai_metrics.main(["--by-profile"])
+        return
+
+    if len(sys.argv) < 3:
+        print("Usage: python3 ai_streamer.py <cmd> <query>", file=sys.stderr)
+        print("       python3 ai_streamer.py --profile-stats", file=sys.stderr)
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    query = sys.argv[2]
+    metrics = RequestMetrics(cmd, os.environ.get("AI_REQUEST_ID"), read_spawn_marker())
+
+    if not bootstrap_dependencies():
+        sys.exit(1)
+
+    debug_log(f"Starting: cmd={cmd}, query={query}")
+
+    # 全局停止标志
+    stop_flag = StopFlag()
+
+    # 初始化输出目标（在监听器之前创建，键盘权限不足时在这里退出）
+    try:
+        sink = create_sink(request_id=metrics.fields["request_id"], cmd=cmd, query=query)
+    except KeyboardUnavailableError:
+        metrics.finish("error")
+        sys.exit(1)
+
+    # 启动键盘监听器（在后台线程）
+    listener = start_esc_listener(stop_flag) if needs_esc_listener(sink) else None
+
+    # 记录进程信息
+    debug_log(f"Process PID: {os.getpid()}, sink: {type(sink).__name__}")
+    debug_log(f"Current working directory: {os.getcwd()}")
+
+    # 流式获取并输出字符
+    try:
+        debug_log("Starting stream...")
+        token_count = write_stream(stream_with_cache(cmd, query, metrics), sink, stop_flag, metrics)
         debug_log(f"Stream completed, total tokens: {token_count}")
+        metrics.finish("cancelled" if stop_flag.is_set() else None, stop_flag.set_at)
     except Exception as e:
         debug_log(f"ERROR in main loop: {e}")
         print(f"ERROR: {e}", file=sys.stderr)
+        metrics.finish("error")
     finally:
         # 停止监听器
-        try:
-            listener.stop()
-        except Exception as e:
-            debug_log(f"ERROR stopping listener: {e}")
+        if listener is not None:
+            try:
+                listener.stop()
+            except Exception as e:
+                debug_log(f"ERROR stopping listener: {e}")
         debug_log("Exiting")
 
     sys.exit(0)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
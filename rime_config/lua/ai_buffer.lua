@@ -0,0 +1,52 @@
+-- ================================
+-- AI 回答缓冲区（候选词输出模式）
+-- ai_streamer.py / ai_daemon.py 以 candidate 输出时，把当前的部分回答写入 PATH
+-- （每行一个 "键\t值"：state / id / cmd / query / text，整个文件原子替换），
+-- ai_translator.lua 和 ai_processor.lua 在按键时读取，不需要等待或 sleep
+-- ================================
+
+local M = {}
+
+-- 与 ai_streamer.py 的 CANDIDATE_BUFFER_FILE 一致
+M.PATH = "/tmp/rime_ai_answer"
+
+local unescapes = { n = "\n", t = "\t", ["\\"] = "\\" }
+
+local function escape(s)
+    return (tostring(s):gsub("\\", "\\\\"):gsub("\n", "\\n"):gsub("\t", "\\t"))
+end
+
+local function unescape(s)
+    return (s:gsub("\\(.)", unescapes))
+end
+
+-- 读取当前回答，文件不存在时返回 nil
+-- 返回 { state = "pending" | "streaming" | "done", id, cmd, query, text }
+function M.read()
+    local f = io.open(M.PATH, "r")
+    if not f then return nil end
+    local content = f:read("*a")
+    f:close()
+    local answer = {}
+    for line in content:gmatch("[^\n]+") do
+        local key, value = line:match("^([^\t]+)\t(.*)$")
+        if key then answer[key] = unescape(value) end
+    end
+    if not answer.state then return nil end
+    answer.text = answer.text or ""
+    return answer
+end
+
+-- 发起请求时先写入 pending 状态，候选词立即显示"等待回答"，也不会误读上一次的回答
+function M.write_pending(id, cmd, query)
+    local tmp_path = M.PATH .. ".lua.tmp"
+    local f = io.open(tmp_path, "w")
+    if not f then return false end
+    for _, kv in ipairs({ { "state", "pending" }, { "id", id }, { "cmd", cmd }, { "query", query }, { "text", "" } }) do
+        f:write(kv[1], "\t", escape(kv[2]), "\n")
+    end
+    f:close()
+    return os.rename(tmp_path, M.PATH) and true or false
+end
+
+return M
@@ -0,0 +1,120 @@
+-- ================================
+-- AI 命令表（ai_processor / ai_translator / ai_filter 共用）
+-- 从 schema 配置 recognizer/patterns/ai_cmd（如 "^(@ai|ai:|chat:|tr:)"）解析出命令前缀，
+-- 每种配置只解析一次；新增命令只需修改配置，不用改 Lua 文件。
+--
+-- 命令名为前缀去掉 "@" 和 ":"（ai: -> ai，tr: -> tr），ai_streamer.py 按命令名选择配置
+-- 不以 ":" 结尾的前缀（如 @ai）后面必须是空格、":" 或输入结束，"@aixyz" 不是命令
+--
+-- 用法：
+--   local ai_commands = require("ai_commands")
+--   env.ai_cmds = ai_commands.load(env.engine.schema.config)   -- init 中调用
+--   env.ai_cmds:could_be(input)          -- 常数时间判断输入是否以命令前缀开头
+--   local name, query = env.ai_cmds:match(input)   -- 不是命令时 name 为 nil
+-- ================================
+
+local M = {}
+
+M.DEFAULT_PATTERN = "^(@ai|ai:|chat:|tr:)"
+M.ICONS = { ai = "🤖", chat = "💬", tr = "🌐" }
+M.DEFAULT_ICON = "🤖"
+
+local Commands = {}
+Commands.__index = Commands
+
+-- 已解析的命令表，按 pattern 缓存
+local cache = {}
+
+-- 把 "^(a|b|c)" 形式的正则拆成前缀列表；含其他正则语法的分支无法当作前缀，跳过
+local function parse_pattern(pattern)
+    local body = pattern:gsub("^%^", ""):gsub("^%((.*)%)$", "%1")
+    local prefixes = {}
+    for branch in (body .. "|"):gmatch("([^|]*)|") do
+        local prefix = branch:gsub("\\(.)", "%1")
+        if prefix ~= "" and not prefix:find("[%^%$%(%)%[%]%.%*%+%?]") then
+            table.insert(prefixes, prefix)
+        end
+    end
+    return prefixes
+end
+
+local function build(pattern)
+    local self = setmetatable({
+        pattern = pattern,
+        names = {},        -- 前缀 -> 命令名
+        icons = {},        -- 前缀 -> 图标
+        first_bytes = {},  -- 前缀首字节集合
+        checks = {},       -- { 长度, 末字节 }，按长度从长到短，匹配时优先最长前缀
+    }, Commands)
+    local seen = {}
+    for _, prefix in ipairs(parse_pattern(pattern)) do
+        local name = prefix:gsub("[@:]", "")
+        self.names[prefix] = name
+        self.icons[prefix] = M.ICONS[name] or M.DEFAULT_ICON
+        self.first_bytes[prefix:byte(1)] = true
+        local key = #prefix .. ":" .. prefix:byte(-1)
+        if not seen[key] then
+            seen[key] = true
+            table.insert(self.checks, { #prefix, prefix:byte(-1) })
+        end
+    end
+    table.sort(self.checks, function(a, b) return a[1] > b[1] end)
+    return self
+end
+
+function M.load(config)
+    local pattern = config and config:get_string("recognizer/patterns/ai_cmd") or M.DEFAULT_PATTERN
+    local commands = cache[pattern]
+    if not commands then
+        commands = build(pattern)
+        cache[pattern] = commands
+    end
+    return commands
+end
+
+local COLON, SPACE = (":"):byte(), (" "):byte()
+
+-- 前缀之后是否为分隔符：前缀以 ":" 结尾，或下一个字节是空格、":"、输入结束
+local function is_separated(input, n, last_byte)
+    if last_byte == COLON then return true end
+    local next_byte = input:byte(n + 1)
+    return next_byte == nil or next_byte == SPACE or next_byte == COLON
+end
+
+-- 返回输入开头的命令前缀（最长匹配），没有则返回 nil
+-- 只比较首字节和固定几个长度的末字节，普通拼音输入不会创建子串
+function Commands:prefix_of(input)
+    if not self.first_bytes[input:byte(1) or 0] then return nil end
+    local checks = self.checks
+    for i = 1, #checks do
+        local n, last_byte = checks[i][1], checks[i][2]
+        if input:byte(n) == last_byte and is_separated(input, n, last_byte) then
+            local prefix = input:sub(1, n)
+            if self.names[prefix] then return prefix end
+        end
+    end
+    return nil
+end
+
+function Commands:could_be(input)
+    return self:prefix_of(input) ~= nil
+end
+
+-- 解析输入，返回 命令名, 查询（去掉分隔符和开头空格，可能为空串）, 前缀；不是命令时返回 nil
+function Commands:match(input)
+    local prefix = self:prefix_of(input)
+    if not prefix then return nil end
+    local start = #prefix + 1
+    if input:byte(start) == COLON and prefix:byte(-1) ~= COLON then start = start + 1 end
+    local query = input:sub(start):gsub("^%s+", "")
+    return self.names[prefix], query, prefix
+end
+
+function Commands:list()
+    local prefixes = {}
+    for prefix in pairs(self.names) do table.insert(prefixes, prefix) end
+    table.sort(prefixes)
+    return prefixes
+end
+
+return M
@@ -1,25 +1,29 @@
 -- =========================================
 -- AI Type Filter
--- 只保留 type == "ai_test" 的候选
+-- 输入为 AI 命令时，只保留最长的 type == "ai" 候选并放在最前面；
+-- 其他输入直接逐个转交候选，不缓冲，保持 Rime 的按页惰性翻译
 -- =========================================
 
 local TARGET_TYPE = "ai"
 local M = {}
-local LOG_PATH = "/tmp/rime_ai.log"
-local function log(kind, fmt, ...)
-    local f = io.open(LOG_PATH, "a")
-    if not f then return end
-    local ok, msg = pcall(string.format, fmt, ...)
-    if not ok then msg = fmt end
-    f:write(string.format("[%s][%s] %s\n", os.date("%H:%M:%S"), kind, msg))
-    f:close()
-end
+local ai_commands = require("ai_commands")
+local log = require("ai_log")
 
 function M.init(env)
-    log("AI_FILTER", "initialized")
+    log.configure(env.engine.schema.config)
+    env.ai_cmds = ai_commands.load(env.engine.schema.config)
+    log.info("AI_FILTER", "initialized")
 end
 
 function M.func(input, env)
+    -- 普通输入：不可能有 AI 候选，边取边 yield，只翻译实际显示的页
+    if not env.ai_cmds:could_be(env.engine.context.input or "") then
+        for cand in input:iter() do
+            yield(cand)
+        end
+        return
+    end
+
     local max_ai_len = 0
     local max_len_cand = nil
     local other_cands = {}
@@ -29,8 +33,8 @@ function M.func(input, env)
         local ctype = cand.type
         if ctype == TARGET_TYPE then
             -- AI 候选，找出最长的那个
-            ai_text = cand.text
-            log("AI_FILTER", "type: %s, max_ai_len: %s", ctype, max_ai_len)
+            local ai_text = cand.text
+            log.debug("AI_FILTER", "type: %s, max_ai_len: %s", ctype, max_ai_len)
             if #ai_text > max_ai_len then
                 max_ai_len = #ai_text
                 max_len_cand = cand
@@ -41,7 +45,7 @@ function M.func(input, env)
     end
     -- 如果找到了最长的 AI 候选，则 yield
     if max_len_cand then
-        log("AI_FILTER", "yield max_len_cand: %s", max_len_cand.text)
+        log.debug("AI_FILTER", "yield max_len_cand: %s", max_len_cand.text)
         yield(max_len_cand)
     end
     -- yield regular candidates
@@ -50,4 +54,8 @@ function M.func(input, env)
     end
 end
 
+function M.fini(env)
+    log.flush()
+end
+
 return M
\ No newline at end of file
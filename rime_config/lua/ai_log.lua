@@ -0,0 +1,84 @@
+-- ================================
+-- AI 组件共用日志（/tmp/rime_ai.log）
+-- - 日志级别：debug / info / warn / error / off，由 ai_streamer/log_level 配置，默认 info；
+--   逐键的详细记录使用 debug，默认不输出，也不会格式化字符串
+-- - 先写入内存缓冲区，超过 FLUSH_LINES 行或距上次写入超过 FLUSH_SECONDS 秒时一次性写入文件；
+--   warn / error 立即写入
+-- - 文件超过 MAX_SIZE 时用 os.rename 轮转为 .1（不再 fork shell 执行 rm）
+--
+-- 用法：
+--   local log = require("ai_log")
+--   log.configure(env.engine.schema.config)   -- init 中调用
+--   log.debug("PROCESSOR", "key:'%s'", key_repr)
+--   if log.enabled("debug") then ... end        -- 参数本身开销较大时先判断
+--   log.flush()                                 -- fini 中调用
+-- ================================
+
+local M = {}
+
+M.PATH = "/tmp/rime_ai.log"
+M.MAX_SIZE = 5 * 1024 * 1024  -- 5MB，超过此大小则轮转
+M.FLUSH_LINES = 50
+M.FLUSH_SECONDS = 2
+
+local LEVELS = { debug = 1, info = 2, warn = 3, error = 4, off = 5 }
+local LABELS = { "DEBUG", "INFO", "WARN", "ERROR" }
+
+local threshold = LEVELS.info
+local buffer = {}
+local last_flush = os.time()
+
+-- 从 schema 配置读取 ai_streamer/log_level（多个组件各自调用，结果相同）
+function M.configure(config)
+    local name = config and config:get_string("ai_streamer/log_level")
+    M.set_level(name or "info")
+end
+
+function M.set_level(name)
+    threshold = LEVELS[name] or LEVELS.info
+end
+
+function M.enabled(name)
+    return LEVELS[name] >= threshold
+end
+
+function M.flush()
+    if #buffer == 0 then return end
+    local f = io.open(M.PATH, "a")
+    if not f then
+        buffer = {}
+        return
+    end
+    -- 追加模式打开后 seek 到末尾即文件大小，不需要额外的系统调用
+    local size = f:seek("end")
+    if size and size > M.MAX_SIZE then
+        f:close()
+        os.rename(M.PATH, M.PATH .. ".1")
+        f = io.open(M.PATH, "a")
+        if not f then
+            buffer = {}
+            return
+        end
+    end
+    f:write(table.concat(buffer, "\n"), "\n")
+    f:close()
+    buffer = {}
+    last_flush = os.time()
+end
+
+local function write(level, kind, fmt, ...)
+    if level < threshold then return end
+    local ok, msg = pcall(string.format, fmt, ...)
+    if not ok then msg = fmt end
+    buffer[#buffer + 1] = string.format("[%s][%s][%s] %s", os.date("%H:%M:%S"), kind, LABELS[level], msg)
+    if level >= LEVELS.warn or #buffer >= M.FLUSH_LINES or os.time() - last_flush >= M.FLUSH_SECONDS then
+        M.flush()
+    end
+end
+
+function M.debug(kind, fmt, ...) write(LEVELS.debug, kind, fmt, ...) end
+function M.info(kind, fmt, ...) write(LEVELS.info, kind, fmt, ...) end
+function M.warn(kind, fmt, ...) write(LEVELS.warn, kind, fmt, ...) end
+function M.error(kind, fmt, ...) write(LEVELS.error, kind, fmt, ...) end
+
+return M
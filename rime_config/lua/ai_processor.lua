@@ -3,87 +3,174 @@
 -- 功能：
 -- 1. 空格键：在 AI 命令输入中追加空格，不上屏
 -- 2. 回车键：调用 AI，上屏结果
+--    候选词输出模式（ai_streamer/candidate_output: true）下回答显示为候选词，
+--    回答中回车刷新候选词，回答结束后回车上屏
 -- ================================
+local ai_buffer = require("ai_buffer")
+local ai_commands = require("ai_commands")
+local log = require("ai_log")
 
 local placeholder = "AI:"
-local LOG_PATH = "/tmp/rime_ai.log"
-local MAX_LOG_SIZE = 5 * 1024 * 1024  -- 5MB，超过此大小则轮转
-local last_size_check = 0  -- 上次检查的文件大小
-
-local function log(kind, fmt, ...)
-    local ok, msg = pcall(string.format, fmt, ...)
-    if not ok then msg = fmt end
-    local log_msg = string.format("[%s][%s] %s", os.date("%H:%M:%S"), kind, msg)
-    
-    -- 检查日志文件大小（每 1000 次写入或文件可能超过限制时检查）
-    -- 使用简单的计数器避免每次都检查文件大小
-    local check_size = false
-    if last_size_check == 0 or last_size_check > 1000 then
-        check_size = true
-        last_size_check = 0
-    else
-        last_size_check = last_size_check + 1
+
+local home = os.getenv("HOME") or ""
+local streamer_path = home .. "/Library/Rime/ai_streamer.py"
+local daemon_path = home .. "/Library/Rime/ai_daemon.py"
+-- 将错误输出到日志文件，方便调试
+local error_log = "/tmp/ai_streamer_error.log"
+
+-- ================================
+-- 请求投递（ai_streamer/dispatch: daemon，默认）
+-- 回车时把请求写入常驻进程 ai_daemon.py 的收件箱目录后立即返回，
+-- 按键处理中不 fork shell，查询也不经过 shell 转义；常驻进程不可用时才启动 ai_streamer.py。
+-- （librime-lua 没有 socket；FIFO 在没有读取方时 open 会阻塞输入法线程，所以使用收件箱目录）
+--
+-- 预取模式（ai_streamer/prefetch: true）
+-- 输入 AI 命令时把当前查询投递给常驻进程，
+-- 查询稳定一段时间后常驻进程开始预取；回车时沿用预取中的请求
+-- ================================
+local INBOX_DIR = "/tmp/rime_ai_inbox"
+-- 常驻进程持有的锁文件，内容为 "PID\t心跳时间戳"（每秒更新）
+local DAEMON_LOCK_FILE = "/tmp/rime_ai_daemon.lock"
+local DAEMON_STALE_SECONDS = 3     -- 心跳超过该时间未更新视为常驻进程已退出
+local DAEMON_RESTART_SECONDS = 10  -- 两次拉起常驻进程的最小间隔（启动需要时间，避免每次按键都 fork）
+local request_seq = 0
+local daemon_started_at = nil
+
+-- 单引号包裹并转义，用于拼接 shell 命令
+local function shell_quote(s)
+    return "'" .. tostring(s):gsub("'", "'\\''") .. "'"
+end
+
+local function start_daemon()
+    local file = io.open(daemon_path, "r")
+    if not file then
+        log.error("PROCESSOR", "daemon file not found: %s", daemon_path)
+        return
     end
-    
-    if check_size then
-        local f = io.open(LOG_PATH, "r")
-        if f then
-            local size = f:seek("end")
-            f:close()
-            if size and size > MAX_LOG_SIZE then
-                -- 轮转日志：直接删除旧日志，新文件从头开始
-                os.execute(string.format('rm "%s" 2>/dev/null', LOG_PATH))
-            end
-        end
+    file:close()
+    -- 常驻进程自带单实例锁，重复启动会直接退出
+    daemon_started_at = os.time()
+    os.execute(string.format("python3 %s >>%s 2>&1 &", shell_quote(daemon_path), shell_quote(error_log)))
+    log.info("PROCESSOR", "daemon started: %s", daemon_path)
+end
+
+-- 常驻进程是否存活：锁文件中的心跳未过期
+-- 常驻进程崩溃或被 SIGKILL 时收件箱目录仍然存在，只检查收件箱会把请求投递给没有读取方的目录
+local function daemon_alive()
+    local f = io.open(DAEMON_LOCK_FILE, "r")
+    if not f then return false end
+    local content = f:read("*l")
+    f:close()
+    local beat = tonumber(content and content:match("^%d+\t(%d+)$"))
+    return beat ~= nil and os.time() - beat <= DAEMON_STALE_SECONDS
+end
+
+-- 常驻进程不在运行时重新拉起（启动中的不重复拉起）
+local function ensure_daemon()
+    if daemon_alive() then return true end
+    if not daemon_started_at or os.time() - daemon_started_at >= DAEMON_RESTART_SECONDS then
+        start_daemon()
     end
-    
-    -- 写入文件日志
-    local f = io.open(LOG_PATH, "a")
-    if f then
-        f:write(log_msg .. "\n")
-        f:close()
+    return false
+end
+
+-- 投递请求：先写 .tmp 再 rename 为 .req，常驻进程只读取完整的文件
+-- 常驻进程不在运行（心跳过期或收件箱不存在）时返回 false，并重新拉起常驻进程
+local function write_request(fields)
+    if not ensure_daemon() then return false end
+    request_seq = request_seq + 1
+    local name = string.format("%s/%d-%06d", INBOX_DIR, os.time(), request_seq)
+    local f = io.open(name .. ".tmp", "w")
+    if not f then return false end
+    for _, kv in ipairs(fields) do
+        f:write(kv[1], "\t", tostring(kv[2]), "\n")
     end
+    f:close()
+    return os.rename(name .. ".tmp", name .. ".req") and true or false
 end
 
-local ai_commands = {
-    ["ai:"] = "ai",
-    ["chat:"] = "chat",
-    ["tr:"] = "translate",
-}
+-- 输入变化时投递 prefetch，离开 AI 命令输入时投递 cancel（由常驻进程负责防抖）
+local function on_context_update(ctx, env)
+    local cmd, query = env.ai_cmds:match(ctx.input or "")
+    if cmd and query ~= "" then
+        local key = cmd .. "\t" .. query
+        if key ~= env.prefetch_key then
+            env.prefetch_key = key
+            write_request({
+                {"op", "prefetch"},
+                {"cmd", cmd},
+                {"query", query},
+                {"debounce_ms", env.prefetch_debounce_ms},
+                {"session", env.session_id},
+            })
+        end
+    elseif env.prefetch_key then
+        env.prefetch_key = nil
+        write_request({{"op", "cancel"}})
+    end
+end
 
 local M = {}
 
 -- 初始化
 function M.init(env) 
-    -- local success, data = pcall(require, "module")
-    -- if not success then
-    --     env.log.warning("Failed to load module: " .. data)
-    --     data = {}
-    -- end
-    log("PROCESSOR", "initialized") 
+    local config = env.engine.schema.config
+    log.configure(config)
+    env.ai_cmds = ai_commands.load(config)
+    -- 会话 ID：常驻进程按会话保存 chat: 等命令的多轮对话
+    env.session_id = string.format("%d-%06d", os.time(), math.random(0, 999999))
+    env.prefetch = config:get_bool("ai_streamer/prefetch") or false
+    env.prefetch_debounce_ms = config:get_int("ai_streamer/prefetch_debounce_ms") or 300
+    env.candidate_output = config:get_bool("ai_streamer/candidate_output") or false
+    env.use_daemon = env.prefetch or (config:get_string("ai_streamer/dispatch") or "daemon") == "daemon"
+    if env.use_daemon then
+        ensure_daemon()
+    end
+    if env.prefetch then
+        env.prefetch_key = nil
+        env.update_connection = env.engine.context.update_notifier:connect(function(ctx)
+            on_context_update(ctx, env)
+        end)
+    end
+    log.info("PROCESSOR", "initialized, commands=%s, daemon=%s, prefetch=%s, candidate_output=%s",
+        table.concat(env.ai_cmds:list(), " "), tostring(env.use_daemon), tostring(env.prefetch),
+        tostring(env.candidate_output))
+end
+
+function M.fini(env)
+    log.flush()
+    if env.update_connection then
+        env.update_connection:disconnect()
+        env.update_connection = nil
+    end
 end
 
 -- Processor 函数：处理按键事件
 function M.func(key, env)
     local context = env.engine.context
+    local input = context.input or ""
+    -- 快速路径：只比较首字节和固定几个长度的前缀（常数时间），不可能是 AI 命令时
+    -- 立即交给后续处理器，普通拼音输入不做 key:repr()、日志和字符串解析
+    if not env.ai_cmds:could_be(input) then return 2 end
+
     local key_repr = key:repr()
     local char_code = key.keycode
-    local input = context.input or ""
     local char = nil
     if char_code >= 32 and char_code <= 126 then
         char = string.char(char_code)
     else char = key_repr end
-    -- 记录每次调用（详细日志）
-    log("PROCESSOR", "key:'%s', key_repr='%s', key_code=%d, input='%s', is_composing=%s, has_menu=%s",
-        char, key_repr, char_code, input, tostring(context:is_composing()), tostring(context:has_menu()))
+    -- 记录每次调用（详细日志，仅 debug 级别；参数需要查询 context，先判断级别）
+    if log.enabled("debug") then
+        log.debug("PROCESSOR", "key:'%s', key_repr='%s', key_code=%d, input='%s', is_composing=%s, has_menu=%s",
+            char, key_repr, char_code, input, tostring(context:is_composing()), tostring(context:has_menu()))
+    end
 
     -- 不在输入状态时不处理
     if not context:is_composing() then return 2 end
 
-    -- 只关心以 cmd: 开头的输入
-    local cmd_str, query = input:match("^(.+:)(.+)$")
-    cmd = ai_commands[cmd_str]
-    if not cmd then return 2 end
+    -- 只关心以命令前缀开头且带有查询的输入
+    local cmd, query = env.ai_cmds:match(input)
+    if not cmd or query == "" then return 2 end
 
     -- Escape 键：清空输入
     if key_repr == "Escape" then
@@ -93,27 +180,72 @@ function M.func(key, env)
 
     
     -- 回车：直接调用 AI，提交结果（优先处理，不受候选词面板影响）
-    if key_repr == "Return" or key_repr == "Enter" then
+    -- 候选词输出模式下回答候选显示期间，空格与回车相同（上屏或刷新）
+    local is_pending = env.pending_query ~= nil and env.pending_query == cmd .. "\t" .. query
+    if key_repr == "Return" or key_repr == "Enter" or (key_repr == "space" and is_pending) then
 
-        log("PROCESSOR", "Enter on AI cmd:'%s', query='%s'", cmd, tostring(query))
+        log.info("PROCESSOR", "Enter on AI cmd:'%s', query='%s'", cmd, tostring(query))
 
         if not cmd or not query or query == "" then
             -- 没有内容，交给默认处理
-            log("PROCESSOR", "no query, returning 2")
+            log.debug("PROCESSOR", "no query, returning 2")
             return 2
         end
 
-        -- 仅作为 AI 触发器：不再由 Rime 输出任何流式文本
-        context:clear()
-        env.engine:commit_text(placeholder)
+        -- 候选词输出模式：本次查询已发起请求时，回答结束则上屏，否则刷新候选词
+        if env.candidate_output and is_pending then
+            local answer = ai_buffer.read()
+            if answer and answer.id == env.pending_id and answer.state == "done" then
+                log.info("PROCESSOR", "commit answer %s (%d bytes)", answer.id, #answer.text)
+                env.pending_id, env.pending_query = nil, nil
+                context:clear()
+                env.engine:commit_text(answer.text)
+            else
+                context:refresh_non_confirmed_composition()
+            end
+            return 1
+        end
+
+        local request_id = string.format("%d-%d", os.time(), request_seq + 1)
+        if env.candidate_output then
+            -- 保留输入，由 ai_translator 把回答显示为候选词
+            env.pending_id, env.pending_query = request_id, cmd .. "\t" .. query
+            ai_buffer.write_pending(request_id, cmd, query)
+        end
+
+        -- 投递给常驻进程（预取模式下由它沿用或取消预取中的请求），不 fork
+        if env.use_daemon then
+            -- 先清掉预取状态，避免 context:clear() 触发的通知把请求取消
+            env.prefetch_key = nil
+            local fields = {{"op", "commit"}, {"id", request_id}, {"cmd", cmd}, {"query", query},
+                {"session", env.session_id}}
+            if env.candidate_output then table.insert(fields, {"sink", "candidate"}) end
+            if write_request(fields) then
+                log.info("PROCESSOR", "commit %s sent to daemon", request_id)
+                if env.candidate_output then
+                    context:refresh_non_confirmed_composition()
+                else
+                    context:clear()
+                    env.engine:commit_text(placeholder)
+                end
+                return 1
+            end
+            -- 常驻进程已退出（write_request 中已重新拉起）：本次直接启动 ai_streamer.py
+            log.warn("PROCESSOR", "daemon unavailable, falling back to spawn")
+        end
+
+        if env.candidate_output then
+            context:refresh_non_confirmed_composition()
+        else
+            -- 仅作为 AI 触发器：不再由 Rime 输出任何流式文本
+            context:clear()
+            env.engine:commit_text(placeholder)
+        end
 
-        local home = os.getenv("HOME") or ""
-        local streamer_path = home .. "/Library/Rime/ai_streamer.py"
-        
         -- 检查文件是否存在
         local file = io.open(streamer_path, "r")
         if not file then
-            log("PROCESSOR", "ERROR: streamer file not found: %s", streamer_path)
+            log.error("PROCESSOR", "streamer file not found: %s", streamer_path)
             return 1
         end
         file:close()
@@ -122,16 +254,23 @@ function M.func(key, env)
         -- 脚本会使用 sys.executable 来安装依赖，确保使用正确的 Python 环境
         local python3_cmd = "python3"
         
-        -- 将错误输出到日志文件，方便调试
-        local error_log = "/tmp/ai_streamer_error.log"
+        -- 标记文件的修改时间记录发起时间（Lua 只有秒级时钟），用于统计启动耗时
+        request_seq = request_seq + 1
+        local spawn_marker = string.format("/tmp/rime_ai_spawn_%s", request_id)
+        local marker_file = io.open(spawn_marker, "w")
+        if marker_file then marker_file:close() end
+
+        -- 所有参数都用 shell_quote 转义，查询中的引号、$、` 等不会被 shell 解释
+        local sink_env = env.candidate_output and "AI_OUTPUT_SINK=candidate " or ""
         local cmd_str = string.format(
-            '%s "%s" "%s" "%s" >>"%s" 2>&1 &',
-            python3_cmd, streamer_path, cmd, query, error_log
+            "%sAI_REQUEST_ID=%s AI_SPAWN_MARKER=%s %s %s %s %s >>%s 2>&1 &",
+            sink_env, shell_quote(request_id), shell_quote(spawn_marker), python3_cmd,
+            shell_quote(streamer_path), shell_quote(cmd), shell_quote(query), shell_quote(error_log)
         )
 
-        log("PROCESSOR", "spawn streamer: %s", cmd_str)
+        log.info("PROCESSOR", "spawn streamer: %s", cmd_str)
         local result = os.execute(cmd_str)
-        log("PROCESSOR", "os.execute returned: %s", tostring(result))
+        log.debug("PROCESSOR", "os.execute returned: %s", tostring(result))
 
         return 1
     end
@@ -162,7 +301,7 @@ function M.func(key, env)
                 
                 if candidate_index >= 0 and candidate_index < candidate_count then
                     current_candidate = menu:get_candidate_at(candidate_index)
-                    log("PROCESSOR", "digit %s: selected candidate %d='%s'", digit, candidate_index, current_candidate.text)
+                    log.debug("PROCESSOR", "digit %s: selected candidate %d='%s'", digit, candidate_index, current_candidate.text)
                 end
             end
         end
@@ -176,27 +315,27 @@ function M.func(key, env)
                 local segment = composition:back()
                 -- 计算 Segment 的长度（原始拼音输入的长度）
                 segment_length = segment._end - segment.start
-                log("PROCESSOR", "segment_length=%d (from segment [%d,%d])", segment_length, segment.start, segment._end)
+                log.debug("PROCESSOR", "segment_length=%d (from segment [%d,%d])", segment_length, segment.start, segment._end)
                 -- 移除包含原始拼音输入的 Segment
                 -- composition:pop_back()
                 -- log("PROCESSOR", "popped back segment")
             else
                 -- 如果无法获取 Segment，尝试从输入中提取前缀
-                prefix = input:match("^(ai:)") or input:match("^(@ai%s+)") or ""
+                prefix = env.ai_cmds:prefix_of(input) or ""
                 -- 估算 Segment 长度（输入长度减去前缀长度）
                 segment_length = #input - #prefix
-                log("PROCESSOR", "prefix='%s' (extracted from input), segment_length=%d", prefix, segment_length)
+                log.debug("PROCESSOR", "prefix='%s' (extracted from input), segment_length=%d", prefix, segment_length)
             end
             
             -- 尝试使用 pop_input 移除原始拼音输入（从光标位置向左删除 segment_length 个字符）
             if segment_length > 0 then
                 context:pop_input(segment_length)
-                log("PROCESSOR", "popped %d characters from input", segment_length)
+                log.debug("PROCESSOR", "popped %d characters from input", segment_length)
             end
             
             -- 推入候选词文本
             context:push_input(current_candidate.text)
-            log("PROCESSOR", "pushed candidate='%s' (index %d)", current_candidate.text, candidate_index)
+            log.debug("PROCESSOR", "pushed candidate='%s' (index %d)", current_candidate.text, candidate_index)
             segmentation:forward() -- 新增一个 Segment，防止候选词再出来
             return 1 -- ✅ 已处理，阻止默认行为（默认行为会上屏并终止 compose）
         end
@@ -205,7 +344,7 @@ function M.func(key, env)
         local char_code = key.keycode
         if char_code >= 32 and char_code <= 126 then
             context:push_input(char)
-            log("PROCESSOR", "pushed '%s' -> '%s'", char, context.input)
+            log.debug("PROCESSOR", "pushed '%s' -> '%s'", char, context.input)
             return 1 -- 已处理，阻止默认行为
         end
 
@@ -230,15 +369,15 @@ function M.func(key, env)
     -- 127+：扩展字符 
     if char_code >= 32 and char_code <= 126 then
         context:push_input(char)
-        log("PROCESSOR", "pushed '%s'->'%s'", char, context.input)
+        log.debug("PROCESSOR", "pushed '%s'->'%s'", char, context.input)
         return 1 -- 已处理，阻止默认行为
     end
 
     -- 退格键
     if key_repr == "BackSpace" then
-        chat_len = #context.input - utf8.offset(context.input, -1) + 1
+        local chat_len = #context.input - utf8.offset(context.input, -1) + 1
         context:pop_input(chat_len)
-        log("PROCESSOR", "popped %d characters from input", chat_len)
+        log.debug("PROCESSOR", "popped %d characters from input", chat_len)
         return 1 -- 已处理，阻止默认行为
     end
 
@@ -1,84 +1,66 @@
 -- ================================
 -- AI Translator: 生成提示候选词
--- 功能：在输入为 @ai 或 ai: 时给出提示
+-- 功能：在输入为 @ai 或 ai: 时给出提示；
+--       候选词输出模式下把 AI 的部分回答显示为候选词
 -- ================================
-local LOG_PATH = "/tmp/rime_ai.log"
-
-local function log(kind, fmt, ...)
-    local f = io.open(LOG_PATH, "a")
-    if not f then return end
-    local ok, msg = pcall(string.format, fmt, ...)
-    if not ok then msg = fmt end
-    f:write(string.format("[%s][%s] %s\n", os.date("%H:%M:%S"), kind, msg))
-    f:close()
-end
-
-local ai_commands = {
-    ["ai:"] = "🤖",
-    ["chat:"] = "💬",
-    ["tr:"] = "🌐",
-}
+local ai_buffer = require("ai_buffer")
+local ai_commands = require("ai_commands")
+local log = require("ai_log")
 
 local M = {}
 
--- 初始化
+-- 初始化：命令表由 ai_commands 从 recognizer/patterns/ai_cmd 解析（同一配置只解析一次）
 function M.init(env)
-    -- 检查环境
     local config = env.engine.schema.config
-    local schema = config:get_string("schema/name") or "unknown"
-    log("TRANSLATOR", "initialized, schema: %s", schema)
-
-    -- 检查 recognizer 配置
-    local recognizer = config:get_map("recognizer")
-    if recognizer then
-        local patterns = recognizer:get_map("patterns")
-        log("TRANSLATOR", "patterns: %s", tostring(patterns))
-        if patterns then
-            local ai_cmd_pattern = patterns:get_string("ai_cmd")
-            log("TRANSLATOR", "recognizer.patterns.ai_cmd: %s",
-                tostring(ai_cmd_pattern))
-        else
-            log("TRANSLATOR", "WARNING: recognizer.patterns not found")
-        end
-    else
-        log("TRANSLATOR", "WARNING: recognizer not found in config")
-    end
+    log.configure(config)
+    env.ai_cmds = ai_commands.load(config)
+    -- 与 ai_processor 使用同一开关：未开启候选词输出时不读取回答缓冲区
+    env.candidate_output = config:get_bool("ai_streamer/candidate_output") or false
+    log.info("TRANSLATOR", "initialized, schema: %s, ai_cmd: %s, candidate_output: %s",
+        config:get_string("schema/name") or "unknown", env.ai_cmds.pattern, tostring(env.candidate_output))
 end
 
 -- Translator 函数：生成候选词
 -- 注意：translator 使用 M.func(input, seg, env)
 function M.func(input, seg, env)
-    -- 获取完整的输入上下文
+    -- 获取完整的输入上下文（segmentor 可能把输入分成片段，所以看完整输入）
     local context = env.engine.context
     local full_input = context.input or ""
-    local cmd = ai_commands[full_input]
+    local name, query, prefix = env.ai_cmds:match(full_input)
+    if not name then return end
 
-    -- 优先检查完整输入（因为 segmentor 可能把输入分成片段）
-    if cmd then
-        log("TRANSLATOR",
+    -- 只输入了命令前缀：给出提示
+    if query == "" then
+        log.debug("TRANSLATOR",
             "matched tag:%s, full_input='%s', segment_input='%s', seg=[%d,%d]",
-            cmd, full_input, input, seg.start, seg._end)
-        local cand = Candidate("ai", seg.start, seg._end, cmd, "输入问题后回车")
+            name, full_input, input, seg.start, seg._end)
+        local cand = Candidate("ai", seg.start, seg._end, env.ai_cmds.icons[prefix], "输入问题后回车")
         cand.quality = 99999
         yield(cand)
         return
     end
 
-    if input == "aitext" then
-        local chunk = ""
-        local TEXT = "台湾位于东亚、东海与南海之间，主岛（台湾岛）面积约3.6万平方公里，人口约2300万。"
-        for i = 2, utf8.len(TEXT), 5 do
-            local pos = utf8.offset(TEXT, i)
-            chunk = TEXT:sub(1, pos-1)
-            log("TRANSLATOR", "candidate:%s", chunk)
-            local comment = (i < utf8.len(TEXT)+1) and '...' or '✅️'
-            local cand = Candidate("ai", seg.start, seg._end, chunk, comment)
-            cand.quality = i
-            yield(cand)
-            -- 延迟 0.1 秒
-            os.execute("sleep 0.1")
-        end
+    -- 候选词输出模式：读取回答缓冲区（不等待），回答属于当前命令和查询时显示为候选词
+    -- 回答中每次按键都会重新读取，ai_processor 在回车时刷新
+    -- 其他输出模式下不读取：避免每次按键读文件，也不会显示之前候选词模式留下的旧回答
+    if not env.candidate_output then return end
+    local answer = ai_buffer.read()
+    if not answer or answer.cmd ~= name or answer.query ~= query then return end
+    local text = answer.text:gsub("\n", " ")
+    local comment
+    if answer.state == "done" then
+        comment = "✅ 回车上屏"
+    else
+        comment = "⏳ 回答中…回车刷新"
+        if text == "" then text = "⏳" end
     end
+    local cand = Candidate("ai", seg.start, seg._end, text, comment)
+    cand.quality = 99999
+    yield(cand)
+end
+
+function M.fini(env)
+    log.flush()
 end
 
 return M
@@ -5,11 +5,19 @@
 直接解析搜狗词库.bin文件并导出为带词频的文本格式
 """
 
+import heapq
 import struct
 import sys
 import os
+from collections import Counter
+from operator import itemgetter
 from pathlib import Path
 
+from dict_binary import BINARY_SUFFIX, write_binary_dict
+
+# top_k 不超过总数的 1/HEAP_TOP_K_RATIO 时用堆选取，否则先按词频计数找出阈值再排序
+HEAP_TOP_K_RATIO = 64
+
 
 def read_uint32(data, offset):
     """读取32位无符号整数（小端）"""
@@ -150,21 +158,57 @@ def parse_sogou_bin_with_freq(bin_file):
     return words_with_freq
 
 
-def export_with_freq(words_with_freq, output_file, include_pinyin=False):
+def sort_by_freq(words_with_freq, top_k=None):
+    """
+    按词频降序排列，返回新列表（不修改传入的列表），词频相同的词条保持原顺序
+
+    Args:
+        words_with_freq: 词条列表，格式为 (词条, 词频, 拼音) 或 (词条, 词频)
+        top_k: 只返回词频最高的 top_k 个词条（默认全部）
     """
-    导出带词频的词库
+    freq_of = itemgetter(1)
+    if top_k is None or top_k >= len(words_with_freq):
+        return sorted(words_with_freq, key=freq_of, reverse=True)
+    if top_k <= 0:
+        return []
+    if top_k * HEAP_TOP_K_RATIO <= len(words_with_freq):
+        # 只要少量高频词：堆选取，不排序全部词条
+        return heapq.nlargest(top_k, words_with_freq, key=freq_of)
+    # 词频是 16 位整数，取值有限：先计数找出第 top_k 个词条的词频，只排序不低于它的词条
+    counts = Counter(map(freq_of, words_with_freq))
+    seen = 0
+    for threshold in sorted(counts, reverse=True):
+        seen += counts[threshold]
+        if seen >= top_k:
+            break
+    candidates = [item for item in words_with_freq if item[1] >= threshold]
+    candidates.sort(key=freq_of, reverse=True)
+    return candidates[:top_k]
+
+
+def export_with_freq(words_with_freq, output_file, include_pinyin=False, top_k=None):
+    """
+    导出带词频的词库（按词频降序，不修改传入的列表）
     
     Args:
         words_with_freq: 词条列表，格式为 (词条, 词频, 拼音) 或 (词条, 词频)
-        output_file: 输出文件路径
+        output_file: 输出文件路径（扩展名为 .rdict 时写入二进制词库，见 dict_binary.py）
         include_pinyin: 是否包含拼音（默认False，保持向后兼容）
+        top_k: 只导出词频最高的 top_k 个词条（默认全部）
+    
+    Returns:
+        导出的词条数
     """
-    # 按词频降序排序
-    words_with_freq.sort(key=lambda x: x[1], reverse=True)
+    ranked = sort_by_freq(words_with_freq, top_k)
+    
+    if Path(output_file).suffix == BINARY_SUFFIX:
+        if not include_pinyin:
+            ranked = [item[:2] for item in ranked]
+        return write_binary_dict(ranked, output_file)
     
     # 写入文件
     with open(output_file, 'w', encoding='utf-8') as f:
-        for item in words_with_freq:
+        for item in ranked:
             if len(item) == 3:
                 # 包含拼音: (词条, 词频, 拼音)
                 word, freq, pinyin = item
@@ -178,20 +222,34 @@ def export_with_freq(words_with_freq, output_file, include_pinyin=False):
                 word, freq = item
                 f.write(f"{word}\t{freq}\n")
     
-    return len(words_with_freq)
+    return len(ranked)
 
 
 def main():
-    if len(sys.argv) < 2:
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    top_k = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--top='):
+            try:
+                top_k = int(arg.split('=', 1)[1])
+            except ValueError:
+                print(f"错误: 无效的 --top 参数: {arg}")
+                sys.exit(1)
+    
+    if len(args) < 1:
         print("搜狗拼音词库导出工具（带词频）")
         print("=" * 50)
-        print("用法: python3 sogou_export_with_freq.py <搜狗词库.bin文件> [输出文件.txt]")
+        print("用法: python3 sogou_export_with_freq.py <搜狗词库.bin文件> [输出文件.txt] [--top=N]")
+        print("\n选项:")
+        print("  --top=N    只导出词频最高的 N 个词条")
         print("\n示例:")
         print("  python3 sogou_export_with_freq.py data/搜狗词库备份_2025_11_27.bin")
         print("  python3 sogou_export_with_freq.py data/搜狗词库备份_2025_11_27.bin output.txt")
+        print("  python3 sogou_export_with_freq.py data/搜狗词库备份_2025_11_27.bin --top=50000")
+        print("  python3 sogou_export_with_freq.py data/搜狗词库备份_2025_11_27.bin output.rdict  # 二进制格式")
         sys.exit(1)
     
-    bin_file = sys.argv[1]
+    bin_file = args[0]
     if not os.path.exists(bin_file):
         print(f"错误: 文件不存在: {bin_file}")
         sys.exit(1)
@@ -200,8 +258,8 @@ def main():
     data_dir = Path(__file__).parent / "data"
     data_dir.mkdir(exist_ok=True)
     
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
+    if len(args) > 1:
+        output_file = args[1]
     else:
         # 基于bin文件名生成输出文件名
         bin_path = Path(bin_file)
@@ -213,37 +271,33 @@ def main():
     
     print(f"输入文件: {bin_file}")
     print(f"输出文件: {output_file}")
+    if top_k is not None:
+        print(f"只导出前 {top_k:,} 个高频词")
     print("-" * 50)
     
     try:
         words_with_freq = parse_sogou_bin_with_freq(bin_file)
         # 默认包含拼音（如果bin文件中有）
-        count = export_with_freq(words_with_freq, output_file, include_pinyin=True)
+        count = export_with_freq(words_with_freq, output_file, include_pinyin=True, top_k=top_k)
         
         print(f"\n✅ 成功! 共导出 {count:,} 个词条（带词频）")
         print(f"文件已保存到: {output_file}")
         
         if words_with_freq:
+            freqs = [item[1] for item in words_with_freq]
             print(f"\n词频统计:")
-            # 兼容新旧格式
-            if len(words_with_freq[0]) == 3:
-                print(f"  最高词频: {words_with_freq[0][1]:,}")
-                print(f"  最低词频: {words_with_freq[-1][1]:,}")
-                print(f"  平均词频: {sum(f for _, f, _ in words_with_freq) // len(words_with_freq):,}")
-                
-                print(f"\n前10个高频词:")
-                for i, (word, freq, pinyin) in enumerate(words_with_freq[:10], 1):
-                    if pinyin:
-                        print(f"  {i}. {word}\t{freq:,}\t{pinyin}")
-                    else:
-                        print(f"  {i}. {word}\t{freq:,}")
-            else:
-                print(f"  最高词频: {words_with_freq[0][1]:,}")
-                print(f"  最低词频: {words_with_freq[-1][1]:,}")
-                print(f"  平均词频: {sum(f for _, f in words_with_freq) // len(words_with_freq):,}")
-                
-                print(f"\n前10个高频词:")
-                for i, (word, freq) in enumerate(words_with_freq[:10], 1):
+            print(f"  最高词频: {max(freqs):,}")
+            print(f"  最低词频: {min(freqs):,}")
+            print(f"  平均词频: {sum(freqs) // len(freqs):,}")
+            
+            print(f"\n前10个高频词:")
+            # 兼容新旧格式：(词条, 词频, 拼音) 或 (词条, 词频)
+            for i, item in enumerate(sort_by_freq(words_with_freq, 10), 1):
+                word, freq = item[0], item[1]
+                pinyin = item[2] if len(item) == 3 else ""
+                if pinyin:
+                    print(f"  {i}. {word}\t{freq:,}\t{pinyin}")
+                else:
                     print(f"  {i}. {word}\t{freq:,}")
     except Exception as e:
         print(f"\n❌ 错误: {e}")